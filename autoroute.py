@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Autorouting with Freerouting, cached and with several configurations at once.
+
+Every router configuration (jar or docker image, pass count, rules file) is
+keyed by the hash of the normalized DSN (the file name and KiCad version in
+it left out), the router version and its arguments. Sessions already routed
+for a key are taken from .pipeline/routes instead of running the router
+again. The configurations that are not cached run in parallel processes and
+the best session wins: fewest unrouted connections, then fewest vias, then
+the shortest total trace length (scored by specctra.py).
+
+Usage:
+    python autoroute.py ergogen/output/pcbs/left_pcb.dsn ergogen/output/pcbs/left_pcb.ses
+    python autoroute.py left_pcb.dsn left_pcb.ses --passes 20 40 --rules none freerouting/freerouting.rules -j 4
+    python autoroute.py left_pcb.dsn left_pcb.ses --router freerouting/freerouting-1.9.0.jar docker
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from specctra import Design, Session, analyze, score
+
+ROUTES_DIR = os.path.join('.pipeline', 'routes')
+
+CONTAINER_CMD = 'docker'
+FREEROUTING_CLI_IMAGE = 'soundmonster/freerouting_cli:v0.1.0'
+DEFAULT_PASSES = 20
+
+# (pcb <name> ... and (host_version ...) change with the file location and KiCad build, not the design
+DSN_VOLATILE_PATTERN = re.compile(r'^\(pcb\s+("[^"]*"|\S+)|\(host_version\s+("[^"]*"|[^)]*)\)')
+
+
+class RouterConfig:
+    """
+    One way to run Freerouting. router is 'docker' (the freerouting_cli
+    image of the build scripts) or the path of a Freerouting jar.
+    """
+
+    def __init__(self, router='docker', passes=DEFAULT_PASSES, rules=None):
+        self.router = router
+        self.passes = passes
+        self.rules = rules
+
+    @property
+    def name(self):
+        rules = os.path.splitext(os.path.basename(self.rules))[0] if self.rules else 'no-rules'
+        router = 'docker' if self.router == 'docker' else os.path.splitext(os.path.basename(self.router))[0]
+        return f'{router}-mp{self.passes}-{rules}'
+
+    def version(self):
+        """The image tag, or the hash of the jar file."""
+        if self.router == 'docker':
+            return FREEROUTING_CLI_IMAGE
+        with open(self.router, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def arguments(self, dsn_path, ses_path, rules_path=None):
+        args = ['-de', dsn_path, '-do', ses_path, '-mp', str(self.passes)]
+        if self.rules:
+            args += ['-dr', rules_path or self.rules]
+        return args
+
+    def command(self, dsn_path, ses_path):
+        if self.router == 'docker':
+            # The container only sees the checkout, mounted on /board (its working directory)
+            args = self.arguments(
+                container_path(dsn_path), container_path(ses_path), self.rules and container_path(self.rules)
+            )
+            return [
+                CONTAINER_CMD, 'run', '-w', '/board', '-v', f'{os.getcwd()}:/board', '--rm', FREEROUTING_CLI_IMAGE,
+                'java', '-Dlog4j.configurationFile=file:./freerouting/log4j2.xml', '-jar', '/opt/freerouting_cli.jar',
+                *args
+            ]
+        return ['java', '-Djava.awt.headless=true', '-jar', self.router, *self.arguments(dsn_path, ses_path)]
+
+    def key(self, dsn_digest):
+        """Cache key: normalized DSN, router version and arguments (the file paths left out)."""
+        rules_digest = ''
+        if self.rules:
+            with open(self.rules, 'rb') as f:
+                rules_digest = hashlib.sha256(f.read()).hexdigest()
+        description = json.dumps({
+            'dsn': dsn_digest,
+            'router': self.version(),
+            'args': self.arguments('<dsn>', '<ses>'),
+            'rules': rules_digest,
+        }, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+
+def container_path(path):
+    """path as the router container sees it: relative to the checkout mounted on /board."""
+    relative = os.path.relpath(os.path.abspath(path), os.getcwd())
+    if relative == '..' or relative.startswith('..' + os.sep):
+        raise ValueError(f"{path} is outside {os.getcwd()}, the directory mounted in the router container")
+    return relative.replace(os.sep, '/')
+
+
+def normalize_dsn(text):
+    """The DSN without the parts that do not change the routing, whitespace collapsed."""
+    return ' '.join(DSN_VOLATILE_PATTERN.sub('', text.strip()).split())
+
+
+def dsn_digest(dsn_path):
+    with open(dsn_path, encoding='utf-8') as f:
+        return hashlib.sha256(normalize_dsn(f.read()).encode()).hexdigest()
+
+
+def session_score(ses_path, design):
+    """(unrouted connections, vias, total wire length in mm) of a session, lower is better in that order."""
+    _, totals = analyze(design, Session.read(ses_path))
+    return list(score(totals))
+
+
+def run_router(config, dsn_path, work_dir):
+    """Route into work_dir. Returns (ses path or None, seconds, log path)."""
+    ses_path = os.path.join(work_dir, f'{config.name}.ses')
+    log_path = os.path.join(work_dir, f'{config.name}.log')
+    start_time = time.perf_counter()
+    with open(log_path, 'w') as log:
+        result = subprocess.run(config.command(dsn_path, ses_path), stdout=log, stderr=subprocess.STDOUT)
+    runtime = time.perf_counter() - start_time
+    if result.returncode != 0 or not os.path.exists(ses_path):
+        return None, runtime, log_path
+    return ses_path, runtime, log_path
+
+
+def route(dsn_path, ses_path, configs, jobs=None, routes_dir=ROUTES_DIR):
+    """
+    Route the DSN with every configuration (from the cache when possible)
+    and copy the best session to ses_path. Returns the results, best first:
+    dicts with config, key, score, cached and seconds.
+    """
+    os.makedirs(routes_dir, exist_ok=True)
+    digest = dsn_digest(dsn_path)
+    design = Design.read(dsn_path)
+    results, to_run = [], []
+    for config in configs:
+        key = config.key(digest)
+        cached = os.path.join(routes_dir, f'{key}.ses')
+        if os.path.exists(cached):
+            results.append({'config': config.name, 'key': key, 'cached': True, 'seconds': 0.0,
+                            'score': session_score(cached, design)})
+        else:
+            to_run.append((config, key))
+
+    if to_run:
+        # Inside the checkout, so the docker router sees it through the /board mount
+        work_dir = tempfile.mkdtemp(prefix='tmp-', dir=routes_dir)
+        try:
+            with ThreadPoolExecutor(max_workers=jobs or len(to_run)) as executor:
+                runs = executor.map(lambda item: run_router(item[0], dsn_path, work_dir), to_run)
+                for (config, key), (routed_path, runtime, log_path) in zip(to_run, runs):
+                    if routed_path is None:
+                        print(f"✗ {config.name} failed after {runtime:.0f}s, log:")
+                        with open(log_path) as log:
+                            print(log.read()[-2000:])
+                        continue
+                    os.replace(routed_path, os.path.join(routes_dir, f'{key}.ses'))
+                    results.append({'config': config.name, 'key': key, 'cached': False, 'seconds': round(runtime, 1),
+                                    'score': session_score(os.path.join(routes_dir, f'{key}.ses'), design)})
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results.sort(key=lambda result: tuple(result['score']))
+    if results:
+        shutil.copyfile(os.path.join(routes_dir, f"{results[0]['key']}.ses"), ses_path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Autoroute a DSN with Freerouting, cached, keeping the best of several configurations')
+    parser.add_argument('dsn', help='Specctra DSN file exported from KiCad')
+    parser.add_argument('ses', help='Session file to write')
+    parser.add_argument(
+        '--router',
+        nargs='+',
+        default=['docker'],
+        help=f'"docker" ({FREEROUTING_CLI_IMAGE}) and/or Freerouting jar files (default: docker)'
+    )
+    parser.add_argument('--passes', nargs='+', type=int, default=[DEFAULT_PASSES], help='Max passes (-mp) to try')
+    parser.add_argument(
+        '--rules',
+        nargs='+',
+        default=['none'],
+        help='Rules files to try, "none" for no rules file (e.g. none freerouting/freerouting.rules)'
+    )
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Routers running at the same time (default: all)')
+    args = parser.parse_args()
+
+    configs = [
+        RouterConfig(router, passes, None if rules == 'none' else rules)
+        for router, passes, rules in itertools.product(args.router, args.passes, args.rules)
+    ]
+    results = route(args.dsn, args.ses, configs, args.jobs)
+    for result in results:
+        unrouted, vias, length = result['score']
+        source = 'cached' if result['cached'] else f"{result['seconds']:.0f}s"
+        print(f"  {result['config']}: {unrouted} unrouted, {vias} vias, {length:.1f} mm ({source})")
+    if not results:
+        print("Error: No configuration produced a session")
+        sys.exit(1)
+    print(f"✓ {args.ses} from {results[0]['config']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of build stage outputs.
+
+A stage key is the hash of everything that decides what a stage produces:
+its name, its command (tool image tags included), extra parameters and the
+content of every input file. After a stage runs, its output files are
+copied into a store addressed by their own content hash and a manifest
+(key -> output paths and hashes) is written. When the same key comes up
+again the outputs are restored from the store instead of running the stage,
+so e.g. changing a case outline does not rerun autorouting as long as the
+DSN file comes out the same.
+
+Layout of the cache directory:
+    objects/<2 hex>/<sha256>    file contents
+    stages/<key>.json           outputs of a stage run
+
+Usage:
+    python build_cache.py           # size of the cache
+    python build_cache.py --clear   # empty it
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+CACHE_DIR = os.path.join('.pipeline', 'cache')
+
+# Hashes of files already read in this process, keyed by (path, size, mtime)
+_FILE_HASHES = {}
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _FILE_HASHES:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _FILE_HASHES[memo_key] = digest.hexdigest()
+    return _FILE_HASHES[memo_key]
+
+
+def expand_paths(patterns):
+    """Files of a list of files, directories (recursively) and glob patterns, sorted."""
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.update(os.path.join(root, name) for name in names)
+            elif os.path.isfile(path):
+                files.add(path)
+    return sorted(os.path.normpath(path) for path in files)
+
+
+def stage_key(name, command, inputs, params=None, known_hashes=None):
+    """
+    Hash of a stage: name, command, parameters and the path and content of
+    each input file. known_hashes ({path: hash}) is used instead of the
+    current content for the files in it.
+    """
+    known_hashes = known_hashes or {}
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'name': name, 'command': command, 'params': params or {}}, sort_keys=True).encode())
+    for path in expand_paths(inputs):
+        digest.update(f'\0{path}\0{known_hashes.get(path) or file_hash(path)}'.encode())
+    return digest.hexdigest()
+
+
+def output_hashes(outputs):
+    """{path: hash} of the files of outputs (files, directories or glob patterns)."""
+    return {path: file_hash(path) for path in expand_paths(outputs)}
+
+
+class BuildCache:
+    """Stage outputs stored by content hash, with one manifest per stage key."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.stages_dir = os.path.join(cache_dir, 'stages')
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def manifest_path(self, key):
+        return os.path.join(self.stages_dir, f'{key}.json')
+
+    def add_object(self, path):
+        """
+        Copy a file into the store, hashing the bytes as they are copied, so
+        the object always holds what its hash says even when the file is
+        being rewritten meanwhile. Returns (hash, mode).
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        tmp_path = os.path.join(self.objects_dir, f'tmp-{os.getpid()}-{threading.get_ident()}')
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source, open(tmp_path, 'wb') as target:
+            mode = os.fstat(source.fileno()).st_mode & 0o777
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+                target.write(block)
+        object_path = self.object_path(digest.hexdigest())
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            # Renamed into place, so a parallel stage never sees half an object
+            os.replace(tmp_path, object_path)
+        return digest.hexdigest(), mode
+
+    def store(self, key, outputs):
+        """
+        Save the files of outputs (files, directories or glob patterns) under
+        key. Returns the number of files stored.
+        """
+        manifest = {}
+        for path in expand_paths(outputs):
+            digest, mode = self.add_object(path)
+            manifest[path] = {'hash': digest, 'mode': mode}
+
+        os.makedirs(self.stages_dir, exist_ok=True)
+        tmp_path = f'{self.manifest_path(key)}.{os.getpid()}-{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path(key))
+        return len(manifest)
+
+    def restore(self, key):
+        """
+        Put back the outputs saved under key. Returns the number of files
+        restored, or None when the key is unknown or an object is missing.
+        """
+        try:
+            with open(self.manifest_path(key)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        if not all(os.path.exists(self.object_path(entry['hash'])) for entry in manifest.values()):
+            return None
+
+        for path, entry in manifest.items():
+            # Files already holding the right content are left alone (and keep their mtime)
+            if os.path.isfile(path) and file_hash(path) == entry['hash']:
+                continue
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            shutil.copyfile(self.object_path(entry['hash']), path)
+            os.chmod(path, entry['mode'])
+        return len(manifest)
+
+    def size(self):
+        """(number of objects, total bytes, number of stage manifests)."""
+        objects = expand_paths([self.objects_dir])
+        manifests = glob.glob(os.path.join(self.stages_dir, '*.json'))
+        return len(objects), sum(os.path.getsize(path) for path in objects), len(manifests)
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or clear the build stage cache')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help=f'Cache directory (default: {CACHE_DIR})')
+    parser.add_argument('--clear', action='store_true', help='Delete every cached output')
+    args = parser.parse_args()
+
+    cache = BuildCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.cache_dir}")
+        return
+    objects, size, manifests = cache.size()
+    print(f"{manifests} cached stage runs, {objects} files, {size / 1e6:.1f} MB in {args.cache_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,87 +4,139 @@ Post-processing script to replace footprint package names with JLCPCB part numbe
 in KiCad position files for PCB assembly.
 
 This script reads a position file and replaces specific footprint names with
-their corresponding JLCPCB part numbers.
+their corresponding JLCPCB part numbers. The mapping is read from a CSV file
+with package and part columns (kibot/jlcpcb_parts.csv by default).
 """
 
-import sys
+import argparse
+import csv
+import os
 import re
+import shutil
+import sys
+import tempfile
+from collections import Counter
 from pathlib import Path
 
 
-# Mapping of footprint names to JLCPCB part numbers
-PACKAGE_REPLACEMENTS = {
-    'switch_choc_v1_v2': 'CPG135001S30',  # Kailh Choc V1 Hotswap Socket
-    # Add more mappings here as needed
-}
+# CSV with the mapping of footprint names to JLCPCB part numbers (columns: package, part)
+DEFAULT_PARTS_CSV = Path(__file__).with_name('jlcpcb_parts.csv')
+
+
+def load_replacements(csv_file=DEFAULT_PARTS_CSV):
+    """
+    Read the package -> part number mapping from a CSV file with package and
+    part columns. Extra columns (e.g. a description) are ignored.
+    """
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = {'package', 'part'} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"{csv_file} is missing the column(s): {', '.join(sorted(missing))}")
+        return {row['package'].strip(): row['part'].strip() for row in reader if row['package'].strip()}
+
+
+# A whitespace separated field of a position file line
+FIELD_PATTERN = re.compile(r'\S+')
+
+
+def package_column(header):
+    """Where the Package column starts in the column header line of a position file."""
+    match = re.search(r'\bPackage\b', header)
+    if match is None:
+        raise ValueError(f"No Package column in the header line: {header.strip()!r}")
+    return match.start()
+
+
+def replace_package(line, replacements, package_start):
+    """
+    Replace the package of a placement line when it is a known package name.
+    The package is what lies between package_start (from the header) and
+    the 4 trailing columns (x, y, rotation, side), so a value that happens
+    to be a package name is left alone.
+    Returns (line, replaced package name or None).
+    """
+    fields = list(FIELD_PATTERN.finditer(line))
+    package_fields = [match for match in fields[1:-4] if match.start() >= package_start]
+    if not package_fields:
+        return line, None
+    start, end = package_fields[0].start(), package_fields[-1].end()
+    part = replacements.get(line[start:end])
+    if part is None:
+        return line, None
+    return line[:start] + part + line[end:], line[start:end]
 
 
 def process_pos_file(input_file, output_file=None, replacements=None):
     """
     Process a KiCad position file and replace package names.
-    
+
+    The file is streamed line by line, so its size does not matter, and
+    the original spacing is preserved.
+
     Args:
         input_file: Path to the input position file
         output_file: Path to the output file (defaults to input_file)
         replacements: Dictionary mapping footprint names to part numbers
+            (defaults to the ones in kibot/jlcpcb_parts.csv)
+
+    Returns:
+        Counter with the number of replacements per package name
     """
     if replacements is None:
-        replacements = PACKAGE_REPLACEMENTS
-    
+        replacements = load_replacements()
+
     input_path = Path(input_file)
     if output_file is None:
         output_path = input_path
     else:
         output_path = Path(output_file)
-    
-    # Read the input file
-    with open(input_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    # Process each line
-    processed_lines = []
-    for line in lines:
-        # Skip header lines and comments
-        if line.strip().startswith('#') or line.strip().startswith('##') or not line.strip():
-            processed_lines.append(line)
-            continue
-        
-        # Check if any package name in our replacements exists in the line
-        for old_package, new_package in replacements.items():
-            if old_package in line:
-                # Replace the package name in the line
-                # Use regex to preserve the original spacing
-                line = re.sub(
-                    r'(\s+)' + re.escape(old_package) + r'(\s+)',
-                    r'\1' + new_package + r'\2',
-                    line
-                )
-                print(f"Replaced '{old_package}' with '{new_package}'")
-                break  # Only replace once per line
-        
-        processed_lines.append(line)
-    
-    # Write the output file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.writelines(processed_lines)
-    
-    print(f"\nProcessed file: {output_path}")
+
+    counts = Counter()
+    package_start = None
+
+    # Write next to the output and move it in place at the end, so the input can be the output
+    fd, tmp_path = tempfile.mkstemp(dir=output_path.parent, prefix=f'.{output_path.name}.')
+    try:
+        with open(input_path, 'r', encoding='utf-8') as src, os.fdopen(fd, 'w', encoding='utf-8') as dst:
+            for line in src:
+                if line.startswith('# '):
+                    # The column header line
+                    package_start = package_column(line)
+                elif line.strip() and not line.lstrip().startswith('#'):
+                    if package_start is None:
+                        raise ValueError(f"{input_path} has placements before its column header line")
+                    # One dict lookup per line, the cost does not grow with the number of mappings
+                    line, package = replace_package(line, replacements, package_start)
+                    if package is not None:
+                        counts[package] += 1
+                dst.write(line)
+        shutil.copymode(input_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return counts
 
 
 def main():
     """Main entry point for the script."""
-    if len(sys.argv) < 2:
-        print("Usage: python fix_pos_package_name.py <input_file> [output_file]")
-        print("\nExample:")
-        print("  python fix_pos_package_name.py left_pcb-bottom.pos")
-        print("  python fix_pos_package_name.py left_pcb-bottom.pos left_pcb-bottom-fixed.pos")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    
+    parser = argparse.ArgumentParser(
+        description='Replace footprint package names with JLCPCB part numbers in a KiCad position file',
+        epilog='Example: python fix_pos_package_name.py left_pcb-bottom.pos left_pcb-bottom-fixed.pos'
+    )
+    parser.add_argument('input_file', help='KiCad position file')
+    parser.add_argument('output_file', nargs='?', help='Output file (default: overwrite the input file)')
+    parser.add_argument(
+        '--parts',
+        default=DEFAULT_PARTS_CSV,
+        help='CSV file with package and part columns (default: kibot/jlcpcb_parts.csv)'
+    )
+    args = parser.parse_args()
+
     try:
-        process_pos_file(input_file, output_file)
+        counts = process_pos_file(args.input_file, args.output_file, load_replacements(args.parts))
     except FileNotFoundError as e:
         print(f"Error: File not found: {e}")
         sys.exit(1)
@@ -92,6 +144,9 @@ def main():
         print(f"Error: {e}")
         sys.exit(1)
 
+    print(f"Replaced {sum(counts.values())} package names ({len(counts)} different packages) "
+          f"in {args.output_file or args.input_file}")
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+JLCPCB assembly files (CPL and BOM) straight from KiCad position or board files.
+
+Replaces the kibot runs of jlpcb_pos*.kibot.yaml / jlpcb_bom.kibot.yaml
+followed by fix_pos_package_name.py: the .pos files of each board (top and
+bottom) are read with pos_table (or the footprints of a .kicad_pcb with
+kicad_pcb, no KiCad needed), the package -> part number mapping and the
+rotation corrections of the parts CSV are applied in one vectorized pass and
+two CSV files per board are written:
+
+    <board>_cpl_jlc.csv   Designator, Mid X, Mid Y, Layer, Rotation
+    <board>_bom_jlc.csv   Comment, Designator, Footprint, LCSC Part #
+
+Only placements whose package has a part number are assembled, like the
+only_jlc_parts filter of the kibot configuration.
+
+Usage:
+    python kibot/jlc_assembly.py filtered-output/pcbs/pos -o filtered-output/jlc
+    python kibot/jlc_assembly.py manualboms/left_pcb-top.pos manualboms/left_pcb-bottom.pos
+    python kibot/jlc_assembly.py filtered-output/pcbs/cad/left_pcb.kicad_pcb
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from fix_pos_package_name import DEFAULT_PARTS_CSV
+from kicad_pcb import KicadBoard
+from pos_table import POS_NAME_PATTERN, find_pos_files, load_parts, read_pos, rotate_packages
+
+CPL_COLUMNS = ['Designator', 'Mid X', 'Mid Y', 'Layer', 'Rotation']
+BOM_COLUMNS = ['Comment', 'Designator', 'Footprint', 'LCSC Part #']
+
+
+def natural_key(ref):
+    """Sort key so that D2 comes before D10."""
+    return [int(token) if token.isdigit() else token for token in re.split(r'(\d+)', ref)]
+
+
+def group_boards(paths):
+    """
+    The .pos files found in paths grouped by directory and board name,
+    e.g. {('pos/left_pcb', 'left_pcb'): [bottom, top]}. A .kicad_pcb file
+    is a board of its own, unless the .pos files of that board are next to
+    it: those are used then, so no placement is read twice.
+    """
+    pos_boards = {}
+    for path in find_pos_files(paths):
+        match = POS_NAME_PATTERN.match(os.path.basename(path))
+        if match:
+            pos_boards.setdefault((os.path.dirname(path), match.group('board')), []).append(path)
+    boards = {}
+    for path in paths:
+        board_files = glob.glob(os.path.join(path, '*.kicad_pcb')) if os.path.isdir(path) else [path]
+        for board_file in sorted(board_files):
+            if board_file.endswith('.kicad_pcb'):
+                boards[(os.path.dirname(board_file), os.path.basename(board_file)[:-len('.kicad_pcb')])] = [board_file]
+    boards.update(pos_boards)
+    return boards
+
+
+def read_board(paths):
+    """All placements of a board's .pos (or .kicad_pcb) files in one DataFrame."""
+    tables = [
+        KicadBoard.read(path).placements() if path.endswith('.kicad_pcb') else read_pos(path).data
+        for path in paths
+    ]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def assembly_placements(data, parts):
+    """
+    Placements with a part number, with the rotation corrections applied
+    and a 'part' column added. The package column keeps the footprint name.
+    """
+    if 'part' not in parts:
+        raise ValueError("The parts table has no part column")
+    if 'rotation' in parts:
+        data = rotate_packages(data, parts['rotation'].dropna())
+    data = data.assign(part=data['package'].map(parts['part'].dropna()))
+    data = data[data['part'].notna()]
+    refs = data['ref'].tolist()
+    order = sorted(range(len(refs)), key=lambda i: natural_key(refs[i]))
+    return data.iloc[order].reset_index(drop=True)
+
+
+def cpl_table(data):
+    return pd.DataFrame({
+        'Designator': data['ref'],
+        'Mid X': data['x'].map('{:.4f}'.format),
+        'Mid Y': data['y'].map('{:.4f}'.format),
+        'Layer': data['side'].str.capitalize(),
+        'Rotation': data['rot'].map('{:.4f}'.format),
+    }, columns=CPL_COLUMNS)
+
+
+def bom_table(data):
+    """One row per value, footprint and part number, with the designators joined by commas."""
+    # Parts without a value (e.g. the hotswap sockets) are commented by their footprint
+    comment = data['val'].where(data['val'] != '', data['package'])
+    grouped = (
+        data.assign(comment=comment)
+        .groupby(['comment', 'package', 'part'], sort=False)['ref']
+        .agg(','.join)
+        .reset_index()
+    )
+    grouped.columns = BOM_COLUMNS[:1] + ['Footprint', 'LCSC Part #', 'Designator']
+    return grouped[BOM_COLUMNS]
+
+
+def output_dirs(boards, output_dir=None):
+    """
+    Directory the CSV files of each board go to: output_dir, or the board's
+    own directory without it. Raises ValueError when two boards of the same
+    name would write the same files.
+    """
+    dirs = {key: output_dir or key[0] for key in boards}
+    seen = {}
+    for (directory, board), target in dirs.items():
+        name = os.path.join(os.path.normpath(target), board)
+        if name in seen:
+            raise ValueError(f"Boards {os.path.join(seen[name], board)} and {os.path.join(directory, board)} "
+                             f"would both write {name}_cpl_jlc.csv and {name}_bom_jlc.csv")
+        seen[name] = directory
+    return dirs
+
+
+def write_board(board, paths, parts, output_dir):
+    """
+    Write the CPL and BOM of a board. Returns (cpl path, bom path, assembled
+    placements, placements without part number).
+    """
+    data = read_board(paths)
+    placements = assembly_placements(data, parts)
+    os.makedirs(output_dir, exist_ok=True)
+    cpl_path = os.path.join(output_dir, f'{board}_cpl_jlc.csv')
+    bom_path = os.path.join(output_dir, f'{board}_bom_jlc.csv')
+    cpl_table(placements).to_csv(cpl_path, index=False)
+    bom_table(placements).to_csv(bom_path, index=False)
+    return cpl_path, bom_path, len(placements), len(data) - len(placements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate JLCPCB CPL and BOM files from KiCad .pos files')
+    parser.add_argument('paths', nargs='+', help='.kicad_pcb files, .pos files or directories with the top and bottom .pos files of each board')
+    parser.add_argument(
+        '--parts',
+        default=DEFAULT_PARTS_CSV,
+        help='CSV with package and part (and optionally rotation) columns (default: kibot/jlcpcb_parts.csv)'
+    )
+    parser.add_argument(
+        '--output-dir', '-o',
+        help='Directory for the CSV files (default: next to the .pos files of each board)'
+    )
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    parts = load_parts(args.parts)
+    boards = group_boards(args.paths)
+    if not boards:
+        print(f"Error: No .kicad_pcb or <board>-top/bottom .pos files found in {', '.join(args.paths)}")
+        sys.exit(1)
+    try:
+        dirs = output_dirs(boards, args.output_dir)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    for (directory, board), paths in boards.items():
+        cpl_path, bom_path, assembled, skipped = write_board(board, paths, parts, dirs[(directory, board)])
+        print(f"✓ {board}: {assembled} placements in {cpl_path} and {bom_path}"
+              + (f" ({skipped} without part number skipped)" if skipped else ""))
+    print(f"Generated {len(boards)} boards in {time.perf_counter() - start_time:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Read-only access to .kicad_pcb files without pcbnew.
+
+The board file is tokenized with a single regular expression and walked as a
+token stream; only the top level items that are asked for (footprints,
+Edge.Cuts graphics, nets) are built into nested lists, everything else
+(tracks, zones, setup, ...) is skipped by depth counting. The results are
+NumPy structured arrays, so questions about a board no longer need a
+setsoft/kicad_auto container run.
+
+Coordinates are board coordinates as KiCad stores them (mm, y pointing down).
+
+Usage:
+    python kibot/kicad_pcb.py filtered-output/pcbs/cad/left_pcb.kicad_pcb
+    python kibot/kicad_pcb.py filtered-output/pcbs/cad/*.kicad_pcb --footprints
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+# Parentheses, bare atoms and quoted strings (with escapes)
+TOKEN_PATTERN = re.compile(r'[()]|[^\s()"]+|"[^"\\]*(?:\\.[^"\\]*)*"')
+
+EDGE_LAYER = 'Edge.Cuts'
+EDGE_KINDS = ('gr_line', 'gr_arc', 'gr_circle', 'gr_rect', 'gr_poly')
+
+# The only parts of a footprint that are read, pads and graphics are skipped
+FOOTPRINT_CHILDREN = {'at', 'layer', 'property', 'fp_text', 'attr', 'model'}
+
+EDGE_DTYPE = np.dtype([
+    ('kind', 'U6'),         # line, arc, circle or rect
+    ('start', 'f8', (2,)),  # circle: center
+    ('mid', 'f8', (2,)),    # arc only, NaN otherwise
+    ('end', 'f8', (2,)),    # circle: a point on the circle
+    ('width', 'f8'),
+])
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text)
+
+
+def unquote(token):
+    if token.startswith('"'):
+        return token[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return token
+
+
+def skip(tokens, index):
+    """Index after the expression starting at tokens[index] (an opening parenthesis)."""
+    depth = 0
+    while True:
+        token = tokens[index]
+        index += 1
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if depth == 0:
+                return index
+
+
+def build(tokens, index, keep=None):
+    """
+    Nested lists of the expression starting at tokens[index] (an opening
+    parenthesis). Returns (expression, index after it). Strings are unquoted.
+    With keep, only the direct children with one of those names are built.
+    """
+    stack = [[]]
+    while True:
+        token = tokens[index]
+        index += 1
+        if token == '(':
+            if keep is not None and len(stack) == 2 and tokens[index] not in keep:
+                index = skip(tokens, index - 1)
+                continue
+            stack.append([])
+        elif token == ')':
+            expression = stack.pop()
+            stack[-1].append(expression)
+            if len(stack) == 1:
+                return expression, index
+        else:
+            stack[-1].append(unquote(token))
+
+
+def iter_items(tokens, kinds):
+    """
+    (kind, expression) of the top level items of a board whose kind is one
+    of kinds. The other items are skipped without being built. kinds maps
+    each kind to the names of the children to build (None for all).
+    """
+    if tokens[:2] != ['(', 'kicad_pcb']:
+        raise ValueError("Not a .kicad_pcb file")
+    depth = 1
+    index = 2
+    count = len(tokens)
+    while index < count:
+        token = tokens[index]
+        if token == '(':
+            if depth == 1 and tokens[index + 1] in kinds:
+                expression, index = build(tokens, index, kinds[tokens[index + 1]])
+                yield expression[0], expression
+                continue
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        index += 1
+
+
+def children(expression, name):
+    """The sub-expressions of an expression named name."""
+    return [child for child in expression if isinstance(child, list) and child and child[0] == name]
+
+
+def child(expression, name, default=None):
+    found = children(expression, name)
+    return found[0] if found else default
+
+
+def footprint_fields(expression):
+    """ref, value, lib id, x, y, rot, layer, attributes and model paths of a footprint expression."""
+    fields = {'Reference': '', 'Value': ''}
+    for item in children(expression, 'property'):
+        if len(item) > 2:
+            fields[item[1]] = item[2]
+    # Boards from KiCad 7 and older keep reference and value in fp_text
+    for item in children(expression, 'fp_text'):
+        if item[1] in ('reference', 'value'):
+            fields[item[1].capitalize()] = item[2]
+    at = child(expression, 'at', ['at', 0, 0])
+    attributes = child(expression, 'attr', ['attr'])
+    return {
+        'ref': fields['Reference'],
+        'value': fields['Value'],
+        'lib_id': expression[1],
+        'x': float(at[1]),
+        'y': float(at[2]),
+        'rot': float(at[3]) if len(at) > 3 else 0.0,
+        'layer': child(expression, 'layer', ['layer', ''])[1],
+        'attributes': ' '.join(attributes[1:]),
+        'models': [model[1] for model in children(expression, 'model')],
+    }
+
+
+def point(expression, name):
+    found = child(expression, name)
+    return (float(found[1]), float(found[2])) if found else (np.nan, np.nan)
+
+
+def edge_rows(expression):
+    """EDGE_DTYPE rows of one Edge.Cuts graphic item; polygons become their line segments."""
+    kind = expression[0][3:]
+    width = float(child(child(expression, 'stroke', []), 'width', ['width', 0])[1])
+    if kind == 'poly':
+        points = [(float(xy[1]), float(xy[2])) for xy in children(child(expression, 'pts', []), 'xy')]
+        return [
+            ('line', start, (np.nan, np.nan), end, width)
+            for start, end in zip(points, points[1:] + points[:1])
+        ]
+    if kind == 'circle':
+        return [(kind, point(expression, 'center'), (np.nan, np.nan), point(expression, 'end'), width)]
+    return [(kind, point(expression, 'start'), point(expression, 'mid'), point(expression, 'end'), width)]
+
+
+def text_dtype(rows, fields):
+    """(name, 'U<longest>') entries for string fields, so no value is truncated."""
+    return [(field, f'U{max([1] + [len(row[field]) for row in rows])}') for field in fields]
+
+
+class KicadBoard:
+    """
+    Footprints, Edge.Cuts graphics and nets of a .kicad_pcb file.
+
+    footprints: structured array with ref, value, lib_id, x, y, rot, layer, attributes
+    models:     structured array with footprint (row in footprints) and path
+    edges:      EDGE_DTYPE structured array of the top level Edge.Cuts graphics
+    nets:       {net number: name}
+    """
+
+    def __init__(self, footprints, models, edges, nets):
+        self.footprints = footprints
+        self.models = models
+        self.edges = edges
+        self.nets = nets
+
+    @classmethod
+    def read(cls, path):
+        with open(path, encoding='utf-8') as f:
+            tokens = tokenize(f.read())
+
+        footprints, edges, nets = [], [], {}
+        kinds = {'footprint': FOOTPRINT_CHILDREN, 'module': FOOTPRINT_CHILDREN, 'net': None}
+        kinds.update(dict.fromkeys(EDGE_KINDS))
+        for kind, expression in iter_items(tokens, kinds):
+            if kind in ('footprint', 'module'):
+                footprints.append(footprint_fields(expression))
+            elif kind == 'net':
+                nets[int(expression[1])] = expression[2]
+            elif child(expression, 'layer', ['layer', ''])[1] == EDGE_LAYER:
+                edges += edge_rows(expression)
+
+        text_fields = ['ref', 'value', 'lib_id', 'layer', 'attributes']
+        footprint_table = np.array(
+            [tuple(row[field] for field in ['ref', 'value', 'lib_id', 'x', 'y', 'rot', 'layer', 'attributes'])
+             for row in footprints],
+            dtype=text_dtype(footprints, text_fields[:3]) + [('x', 'f8'), ('y', 'f8'), ('rot', 'f8')]
+            + text_dtype(footprints, text_fields[3:])
+        )
+        model_rows = [(i, path) for i, row in enumerate(footprints) for path in row['models']]
+        models = np.array(
+            model_rows,
+            dtype=[('footprint', 'i4'), ('path', f'U{max([1] + [len(path) for _, path in model_rows])}')]
+        )
+        return cls(footprint_table, models, np.array(edges, dtype=EDGE_DTYPE), nets)
+
+    def has_attribute(self, name):
+        """Boolean mask of the footprints with the attribute name (smd, through_hole, dnp, ...)."""
+        return np.array([name in attributes.split() for attributes in self.footprints['attributes']], dtype=bool)
+
+    def placements(self, only_smd=True):
+        """
+        Footprints as a pos_table DataFrame (ref, val, package, x, y, rot, side),
+        with y pointing up like KiCad's position files. Like the position
+        output of jlpcb_pos.kibot.yaml, footprints excluded from position
+        files, DNP ones and (with only_smd) the ones that are not SMD are
+        left out.
+        """
+        keep = ~self.has_attribute('exclude_from_pos_files') & ~self.has_attribute('dnp')
+        if only_smd:
+            keep &= self.has_attribute('smd')
+        footprints = self.footprints[keep]
+        return pd.DataFrame({
+            'ref': footprints['ref'],
+            'val': footprints['value'],
+            'package': [lib_id.split(':')[-1] for lib_id in footprints['lib_id']],
+            'x': footprints['x'],
+            'y': -footprints['y'],
+            'rot': footprints['rot'],
+            'side': np.where(footprints['layer'] == 'B.Cu', 'bottom', 'top'),
+        })
+
+    def outline_bounds(self):
+        """(min x, min y, max x, max y) of the Edge.Cuts end points."""
+        points = np.concatenate([self.edges['start'], self.edges['mid'], self.edges['end']])
+        return tuple(np.nanmin(points, axis=0)) + tuple(np.nanmax(points, axis=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize .kicad_pcb files without pcbnew')
+    parser.add_argument('boards', nargs='+', help='.kicad_pcb files')
+    parser.add_argument('--footprints', action='store_true', help='List every footprint')
+    args = parser.parse_args()
+
+    for path in args.boards:
+        start_time = time.perf_counter()
+        board = KicadBoard.read(path)
+        runtime = time.perf_counter() - start_time
+        print(f"✓ {path}: {len(board.footprints)} footprints, {len(board.models)} 3D models, "
+              f"{len(board.edges)} Edge.Cuts items, {len(board.nets)} nets in {runtime * 1000:.1f} ms")
+        if len(board.edges):
+            print("  Outline bounds: ({:.2f}, {:.2f}) - ({:.2f}, {:.2f})".format(*board.outline_bounds()))
+        if args.footprints:
+            for row in board.footprints:
+                print(f"  {row['ref']:<8} {row['lib_id']:<40} {row['x']:9.4f} {row['y']:9.4f} "
+                      f"{row['rot']:9.4f}  {row['layer']}")
+
+
+if __name__ == '__main__':
+    main()
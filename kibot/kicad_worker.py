@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Long-lived KiCad worker for the kicad_auto container.
+
+Instead of one `docker run --rm setsoft/kicad_auto:ki8 ...` per step (each
+paying container startup, the pcbnew and kibot imports and the board load),
+one container runs this script for the whole build and takes jobs from a
+job directory on the /board mount:
+
+    <jobs dir>/<id>.json      job written by the client (written elsewhere, then renamed in)
+    <id>.running              taken by the worker
+    <id>.result               {"returncode": ..., "seconds": ...} once done
+
+Jobs are JSON objects with a kind and its arguments, relative to /board, and
+an optional timeout in seconds (default: --job-timeout):
+
+    {"kind": "export_dsn", "board": "...kicad_pcb", "output": "...dsn", "log": "..."}
+    {"kind": "import_ses", "board": "...kicad_pcb", "session": "...ses", "output": "...kicad_pcb", "log": "..."}
+    {"kind": "kibot", "args": ["-b", "...", "-c", "..."], "env": {...}, "log": "..."}
+    {"kind": "stop"}
+
+pcbnew and kibot are imported once. Every job runs in a process forked from
+the worker, so jobs run concurrently, a crash or sys.exit in one (kibot
+exits on errors) does not take the worker down and changes a job makes to a
+board (importing a session) do not leak into the next one. A job still
+running after its timeout is killed (with the processes it started) and
+fails. A job file that is not a valid job fails without stopping the worker.
+
+The boards of export_dsn and import_ses jobs are loaded by the worker and
+kept until their file changes, so the forked job finds them already in
+memory. kibot jobs load their board themselves, like a kibot run does.
+
+Usage (inside the container, pipeline.py --kicad-workers starts these):
+    python3 kibot/kicad_worker.py .pipeline/jobs/worker-0
+"""
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import runpy
+import signal
+import sys
+import time
+import traceback
+
+import pcbnew
+
+POLL_INTERVAL = 0.02
+IDLE_TIMEOUT = 3600
+JOB_TIMEOUT = 1800
+
+
+class BoardCache:
+    """Boards loaded with pcbnew, reloaded when their file changes."""
+
+    def __init__(self):
+        self.boards = {}
+
+    def get(self, path):
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        if path not in self.boards or self.boards[path][0] != version:
+            self.boards[path] = (version, pcbnew.LoadBoard(path))
+        return self.boards[path][1]
+
+
+def export_dsn(job, board):
+    print('Exporting Specctra DSN for ', job['board'], ' at ', job['output'])
+    return 0 if pcbnew.ExportSpecctraDSN(board, job['output']) else 1
+
+
+def import_ses(job, board):
+    print('Importing Specctra SES ', job['session'], ' for ', job['board'])
+    if not pcbnew.ImportSpecctraSES(board, job['session']):
+        print('Couldn\'t import ', job['session'])
+        return 1
+    if not pcbnew.SaveBoard(job['output'], board, True):
+        print('Couldn\'t save output to ', job['output'])
+        return 1
+    print('Saved output to ', job['output'])
+    return 0
+
+
+def kibot(job, board):
+    sys.argv = ['kibot', *job['args']]
+    runpy.run_module('kibot', run_name='__main__', alter_sys=True)
+    return 0
+
+
+JOB_KINDS = {
+    'export_dsn': export_dsn,
+    'import_ses': import_ses,
+    'kibot': kibot,
+}
+
+
+def run_child(job, board):
+    """Body of the forked job process: output to the job log, never returns."""
+    returncode = 1
+    try:
+        # Its own process group, so a timeout kills what the job started too
+        os.setpgid(0, 0)
+        log = os.open(job['log'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(log, 1)
+        os.dup2(log, 2)
+        os.environ.update(job.get('env', {}))
+        returncode = JOB_KINDS[job['kind']](job, board)
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(returncode)
+
+
+def start_job(job, boards):
+    """Fork the process of a job. Returns its pid, or None when the job could not be started."""
+    if (job.get('kind') not in JOB_KINDS or 'log' not in job
+            or not isinstance(job.get('timeout', 0), (int, float))):
+        print(f"✗ Invalid job: {job}")
+        return None
+    try:
+        # Loaded here, not in the job process, so the next job on this board finds it in memory
+        board = boards.get(job['board']) if 'board' in job else None
+    except Exception:
+        with open(job['log'], 'w') as log:
+            traceback.print_exc(file=log)
+        return None
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid == 0:
+        run_child(job, board)
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        # The child did it first (or already exited)
+        pass
+    return pid
+
+
+def kill_job(pid, log_path, timeout):
+    """Kill a job process and its process group, noting why in its log."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    with open(log_path, 'a') as log:
+        log.write(f"\nKilled after the job timeout of {timeout:g}s\n")
+
+
+def write_result(jobs_dir, job_id, returncode, seconds):
+    path = os.path.join(jobs_dir, f'{job_id}.result')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'returncode': returncode, 'seconds': round(seconds, 3)}, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def read_job(path):
+    """The job of a job file, or None when it is not a JSON object."""
+    try:
+        with open(path) as f:
+            job = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"✗ Unreadable job {path}: {e}")
+        return None
+    if not isinstance(job, dict):
+        print(f"✗ Invalid job: {job}")
+        return None
+    return job
+
+
+def serve(jobs_dir, poll_interval=POLL_INTERVAL, idle_timeout=IDLE_TIMEOUT, job_timeout=JOB_TIMEOUT):
+    """
+    Run the jobs put in jobs_dir until a stop job, or idle_timeout seconds
+    without jobs. Jobs running longer than their timeout are killed.
+    """
+    os.makedirs(jobs_dir, exist_ok=True)
+    try:
+        # What kibot imports on every run, done once here
+        importlib.import_module('kibot.kiplot')
+    except ImportError:
+        pass
+    boards = BoardCache()
+    running = {}
+    killed = set()
+    stopping = False
+    last_activity = time.monotonic()
+    print(f"✓ Worker {os.getpid()} waiting for jobs in {jobs_dir}")
+    sys.stdout.flush()
+
+    while running or not stopping:
+        busy = False
+        for path in [] if stopping else sorted(glob.glob(os.path.join(jobs_dir, '*.json'))):
+            busy = True
+            job_id = os.path.basename(path)[:-len('.json')]
+            running_path = os.path.join(jobs_dir, f'{job_id}.running')
+            os.replace(path, running_path)
+            job = read_job(running_path)
+            if job is None:
+                write_result(jobs_dir, job_id, 1, 0.0)
+                continue
+            if job.get('kind') == 'stop':
+                os.remove(running_path)
+                stopping = True
+                break
+            pid = start_job(job, boards)
+            if pid is None:
+                write_result(jobs_dir, job_id, 1, 0.0)
+            else:
+                running[pid] = (job_id, time.perf_counter(), job.get('timeout', job_timeout), job['log'])
+
+        now = time.perf_counter()
+        for pid, (job_id, start_time, timeout, log_path) in running.items():
+            if pid not in killed and now - start_time > timeout:
+                killed.add(pid)
+                print(f"✗ Job {job_id} still running after {timeout:g}s, killing it")
+                kill_job(pid, log_path, timeout)
+
+        while running:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            busy = True
+            job_id, start_time, _, _ = running.pop(pid)
+            killed.discard(pid)
+            write_result(jobs_dir, job_id, os.waitstatus_to_exitcode(status), time.perf_counter() - start_time)
+
+        if busy:
+            last_activity = time.monotonic()
+        elif not running and time.monotonic() - last_activity > idle_timeout:
+            print(f"Worker idle for {idle_timeout}s, stopping")
+            break
+        else:
+            time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run KiCad jobs (DSN export, SES import, kibot) from a job directory')
+    parser.add_argument('jobs_dir', help='Directory the job files are put in')
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=POLL_INTERVAL,
+        help=f'Seconds between looks at the job directory (default: {POLL_INTERVAL})'
+    )
+    parser.add_argument(
+        '--idle-timeout',
+        type=float,
+        default=IDLE_TIMEOUT,
+        help=f'Stop after this many seconds without jobs (default: {IDLE_TIMEOUT})'
+    )
+    parser.add_argument(
+        '--job-timeout',
+        type=float,
+        default=JOB_TIMEOUT,
+        help=f'Kill jobs without their own timeout after this many seconds (default: {JOB_TIMEOUT})'
+    )
+    args = parser.parse_args()
+
+    serve(args.jobs_dir, args.poll_interval, args.idle_timeout, args.job_timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Placement diff between two sets of KiCad / KiBot position files.
+
+Components are matched by board and reference first (the board is the .pos
+file name without its -top/-bottom suffix, so the boards of one directory
+keep their own D1). The ones left over on both sides are matched by nearest
+position (cKDTree, same board, package and side) so renumbered
+references show up as renamed instead of removed + added. Every matched pair
+is compared in one vectorized pass and reported as moved, rotated, flipped
+(changed side) or renamed; unmatched ones as added or removed.
+
+The exit code is 1 when anything changed, so CI can fail on it.
+
+Usage:
+    python kibot/pos_diff.py "manualboms/manualpos 2026-02-01" "manualboms/left_pcb-*.pos"
+    python kibot/pos_diff.py old/left_pcb-top.pos new/left_pcb-top.pos -o pos_diff.json
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from pos_table import COLUMNS, board_name, find_pos_files, normalize_angle, read_pos
+
+# Differences below these are formatting noise (.pos files have 4 decimals)
+POSITION_TOLERANCE = 0.001
+ROTATION_TOLERANCE = 0.01
+
+# Max distance (mm) at which two leftover parts are taken for the same, renumbered one
+DEFAULT_MATCH_DISTANCE = 0.5
+
+CHANGES = ['moved', 'rotated', 'flipped', 'renamed']
+
+
+def read_placements(paths):
+    """
+    Placements of all .pos files found in paths, with a board column, one
+    row per board and reference. Files processed for JLCPCB (-jlcpcb.pos)
+    are left out, they repeat the placements of the file they were made from.
+    """
+    files = [path for path in find_pos_files(paths) if not path.endswith('-jlcpcb.pos')]
+    if not files:
+        raise ValueError(f"No .pos files found in {', '.join(paths)}")
+    data = pd.concat([read_pos(path).data.assign(board=board_name(path)) for path in files], ignore_index=True)
+    return data.drop_duplicates(['board', 'ref'], keep='last').reset_index(drop=True)
+
+
+def match_by_position(old, new, max_distance=DEFAULT_MATCH_DISTANCE):
+    """
+    Pairs (old index, new index) of parts with the same board, package and
+    side whose positions are within max_distance, each part used at most once (closest
+    pairs first).
+    """
+    if old.empty or new.empty:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    # Every pair within max_distance, not only a few nearest: a part's next-nearest
+    # candidate is needed when its nearest one is taken by a closer pair
+    candidates = cKDTree(old[['x', 'y']].to_numpy()).sparse_distance_matrix(
+        cKDTree(new[['x', 'y']].to_numpy()), max_distance, output_type='ndarray'
+    )
+    same_part = (
+        (old['board'].to_numpy()[candidates['i']] == new['board'].to_numpy()[candidates['j']])
+        & (old['package'].to_numpy()[candidates['i']] == new['package'].to_numpy()[candidates['j']])
+        & (old['side'].to_numpy()[candidates['i']] == new['side'].to_numpy()[candidates['j']])
+    )
+    candidates = candidates[same_part]
+    candidates = candidates[np.lexsort((candidates['j'], candidates['i'], candidates['v']))]
+
+    # Greedy one to one assignment, closest first
+    old_used, new_used = set(), set()
+    old_index, new_index = [], []
+    for old_row, new_row, _ in candidates.tolist():
+        if old_row not in old_used and new_row not in new_used:
+            old_used.add(old_row)
+            new_used.add(new_row)
+            old_index.append(old_row)
+            new_index.append(new_row)
+    return np.array(old_index, dtype=int), np.array(new_index, dtype=int)
+
+
+def diff_placements(old, new, max_distance=DEFAULT_MATCH_DISTANCE):
+    """
+    Compare two placement tables (with a board column). Returns (pairs,
+    added, removed): pairs has the old_* and new_* columns of every matched
+    part plus dx, dy, distance, drot and one boolean column per kind of
+    change.
+    """
+    by_ref = old.merge(new, on=['board', 'ref'], suffixes=('_old', '_new'))
+    by_ref = by_ref.rename(columns={'board': 'board_old', 'ref': 'ref_old'}).assign(
+        board_new=by_ref['board'], ref_new=by_ref['ref']
+    )
+
+    matched = pd.MultiIndex.from_frame(by_ref[['board_old', 'ref_old']])
+    old_left = old[~pd.MultiIndex.from_frame(old[['board', 'ref']]).isin(matched)].reset_index(drop=True)
+    new_left = new[~pd.MultiIndex.from_frame(new[['board', 'ref']]).isin(matched)].reset_index(drop=True)
+    old_index, new_index = match_by_position(old_left, new_left, max_distance)
+    by_position = pd.concat([
+        old_left.iloc[old_index].reset_index(drop=True).add_suffix('_old'),
+        new_left.iloc[new_index].reset_index(drop=True).add_suffix('_new'),
+    ], axis=1)
+
+    pairs = pd.concat([by_ref, by_position], ignore_index=True)
+    pairs['dx'] = pairs['x_new'] - pairs['x_old']
+    pairs['dy'] = pairs['y_new'] - pairs['y_old']
+    pairs['distance'] = np.hypot(pairs['dx'], pairs['dy'])
+    pairs['drot'] = normalize_angle(pairs['rot_new'] - pairs['rot_old'])
+    pairs['moved'] = pairs['distance'] > POSITION_TOLERANCE
+    pairs['rotated'] = np.abs(pairs['drot']) > ROTATION_TOLERANCE
+    pairs['flipped'] = pairs['side_old'] != pairs['side_new']
+    pairs['renamed'] = pairs['ref_old'] != pairs['ref_new']
+
+    added = new_left.drop(new_left.index[new_index])
+    removed = old_left.drop(old_left.index[old_index])
+    return pairs, added, removed
+
+
+def build_report(pairs, added, removed):
+    """JSON serializable report: counts plus the details of every change."""
+    changed = pairs[pairs[CHANGES].any(axis=1)]
+    details = [
+        {
+            'board': row.board_new,
+            'ref': row.ref_new,
+            'old_ref': row.ref_old,
+            'package': row.package_new,
+            'changes': [change for change in CHANGES if getattr(row, change)],
+            'old': {'x': row.x_old, 'y': row.y_old, 'rot': row.rot_old, 'side': row.side_old},
+            'new': {'x': row.x_new, 'y': row.y_new, 'rot': row.rot_new, 'side': row.side_new},
+            'dx': round(row.dx, 4),
+            'dy': round(row.dy, 4),
+            'distance': round(row.distance, 4),
+            'drot': round(row.drot, 4),
+        }
+        for row in changed.itertuples(index=False)
+    ]
+    return {
+        'summary': {
+            'matched': len(pairs),
+            **{change: int(pairs[change].sum()) for change in CHANGES},
+            'added': len(added),
+            'removed': len(removed),
+        },
+        'changed': details,
+        'added': added[['board', *COLUMNS]].to_dict('records'),
+        'removed': removed[['board', *COLUMNS]].to_dict('records'),
+    }
+
+
+def print_report(report):
+    for part in report['changed']:
+        ref = part['ref'] if part['ref'] == part['old_ref'] else f"{part['old_ref']} -> {part['ref']}"
+        print(f"  ~ {part['board']} {ref} ({part['package']}): {', '.join(part['changes'])}, "
+              f"dx {part['dx']:+.4f} dy {part['dy']:+.4f} drot {part['drot']:+.2f}")
+    for part in report['added']:
+        print(f"  + {part['board']} {part['ref']} ({part['package']}) at {part['x']:.4f}, {part['y']:.4f} {part['side']}")
+    for part in report['removed']:
+        print(f"  - {part['board']} {part['ref']} ({part['package']}) at {part['x']:.4f}, {part['y']:.4f} {part['side']}")
+    summary = report['summary']
+    print(f"{summary['matched']} matched, " + ', '.join(
+        f"{summary[key]} {key}" for key in CHANGES + ['added', 'removed']
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the placements of two sets of .pos files')
+    parser.add_argument('old', help='.pos file, directory or glob pattern of the reference placements')
+    parser.add_argument('new', help='.pos file, directory or glob pattern of the placements to check')
+    parser.add_argument(
+        '--match-distance',
+        type=float,
+        default=DEFAULT_MATCH_DISTANCE,
+        help=f'Max distance (mm) to match renumbered parts by position (default: {DEFAULT_MATCH_DISTANCE})'
+    )
+    parser.add_argument('--output', '-o', help='Write the JSON report to this file ("-" for stdout)')
+    args = parser.parse_args()
+
+    try:
+        old = read_placements([args.old])
+        new = read_placements([args.new])
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    report = build_report(*diff_placements(old, new, args.match_distance))
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report saved to {args.output}")
+
+    summary = report['summary']
+    sys.exit(1 if any(summary[key] for key in CHANGES + ['added', 'removed']) else 0)
+
+
+if __name__ == '__main__':
+    main()
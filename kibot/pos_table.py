@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Column-aware reader and writer for KiCad / KiBot position (.pos) files.
+
+A .pos file is loaded into a pandas DataFrame with typed columns
+(ref, val, package, x, y, rot, side) and written back with the same fixed
+width layout it was read with, so every tool that touches placement data can
+share one parser and apply its changes as vectorized column operations.
+
+Two layouts are understood:
+    KiCad:  # Ref     Val       Package        PosX       PosY       Rot  Side
+    KiBot:  # Designator   Val   Package       Mid X      Mid Y      Rotation   Layer
+
+Usage:
+    python pos_table.py filtered-output/pcbs/pos --parts kibot/jlcpcb_parts.csv -o out/
+    python pos_table.py manualboms/*.pos --mirror-bottom --suffix -mirrored
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS = ['ref', 'val', 'package', 'x', 'y', 'rot', 'side']
+TEXT_COLUMNS = ['ref', 'val', 'package', 'side']
+
+# Minimum field widths KiCad pads the text columns to
+KICAD_MIN_WIDTHS = {'ref': 8, 'val': 8, 'package': 16}
+
+# KiBot separates its left aligned columns with 3 spaces
+KIBOT_SEPARATOR = '   '
+
+# <board>-top.pos, <board>-bottom_pos.pos, ... (already processed -jlcpcb.pos files do not match)
+POS_NAME_PATTERN = re.compile(r'^(?P<board>.+)-(?P<side>top|bottom)(_pos)?\.pos$')
+
+
+class PosTable:
+    """
+    Placements of one .pos file plus what is needed to write it back: the
+    comment lines before and after the table, the original column titles
+    and header line, and the layout ('kicad' or 'kibot') with its column
+    widths (KiCad: {column: width} of the text columns as the rows use
+    them, KiBot: the width of every column).
+    """
+
+    def __init__(self, data, titles, layout='kicad', preamble=(), footer=('## End',), widths=None, header=None):
+        self.data = data
+        self.titles = list(titles)
+        self.layout = layout
+        self.preamble = list(preamble)
+        self.footer = list(footer)
+        self.widths = widths
+        self.header = header
+
+    def copy(self, data=None):
+        return PosTable(
+            self.data.copy() if data is None else data,
+            self.titles, self.layout, self.preamble, self.footer, self.widths, self.header
+        )
+
+    def to_text(self):
+        if self.layout == 'kicad':
+            lines = format_kicad(self.data, self.titles, self.widths, self.header)
+        else:
+            lines = format_kibot(self.data, self.titles, self.widths)
+        return '\n'.join(self.preamble + lines + self.footer) + '\n'
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_text())
+
+
+def split_titles(header):
+    """Column titles of a header line, e.g. '# Ref     Val ...' -> ['Ref', 'Val', ...]."""
+    return re.split(r'\s{2,}', header[1:].strip())
+
+
+def parse_row(line, package_start):
+    """
+    Split a data line into the 7 columns. The value may be empty, so the
+    tokens between the reference and the 4 trailing columns are told apart
+    by where the package column starts.
+    """
+    tokens = [(match.start(), match.group()) for match in re.finditer(r'\S+', line)]
+    if len(tokens) < 6:
+        raise ValueError(f"Invalid .pos line: {line!r}")
+    middle = tokens[1:-4]
+    val = ' '.join(token for start, token in middle if start < package_start)
+    package = ' '.join(token for start, token in middle if start >= package_start)
+    return [tokens[0][1], val, package] + [token for _, token in tokens[-4:]]
+
+
+def read_pos(path):
+    """
+    Load a .pos file into a PosTable.
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    header_index = next(
+        (i for i, line in enumerate(lines) if line.startswith('# ') and not line.startswith('##')), None
+    )
+    if header_index is None:
+        raise ValueError(f"{path} has no column header line")
+    header = lines[header_index]
+    titles = split_titles(header)
+    if len(titles) != len(COLUMNS):
+        raise ValueError(f"{path} has {len(titles)} columns, expected {len(COLUMNS)}: {titles}")
+
+    body = lines[header_index + 1:]
+    end = next((i for i, line in enumerate(body) if line.startswith('#')), len(body))
+    rows = [line for line in body[:end] if line.strip()]
+
+    starts = [header.index(title, 1) for title in titles]
+    data = pd.DataFrame(
+        [parse_row(line, starts[2]) for line in rows],
+        columns=COLUMNS
+    ).astype({'ref': str, 'val': str, 'package': str, 'x': float, 'y': float, 'rot': float, 'side': str})
+
+    layout = 'kicad' if titles[3] == 'PosX' else 'kibot'
+    if layout == 'kicad':
+        # Measured on the rows: files edited after KiCad wrote them (e.g. package
+        # names replaced in place) have rows narrower than their header
+        x_ends = [list(re.finditer(r'\S+', line))[-4].end() for line in rows] or [starts[3] + len(titles[3])]
+        widths = {
+            'ref': starts[1] - 2,
+            'val': starts[2] - starts[1] - 2,
+            'package': max(x_ends) - 9 - 2 - starts[2],
+        }
+    else:
+        # KiBot column widths come from the header (they may cover parts of the other side)
+        widths = [next_start - start - len(KIBOT_SEPARATOR) for start, next_start in zip(starts, starts[1:])]
+        widths.append(len(titles[-1]))
+
+    return PosTable(data, titles, layout, lines[:header_index], body[end:], widths, header)
+
+
+def format_kicad(data, titles, widths=None, header=None):
+    """
+    Lines of a table in the layout KiCad writes (text left aligned, numbers
+    right aligned). The text columns are at least as wide as widths (KiCad's
+    minimums by default); the header line is kept as it was read unless a
+    column had to grow.
+    """
+    widths = widths or KICAD_MIN_WIDTHS
+    width = {
+        column: max([widths[column]] + data[column].str.len().tolist())
+        for column in KICAD_MIN_WIDTHS
+    }
+    if header is None or width != widths:
+        header = (
+            '# ' + titles[0].ljust(width['ref']) + titles[1].ljust(width['val']) + '  '
+            + titles[2].ljust(width['package']) + '  '
+            + titles[3].rjust(9) + '  ' + titles[4].rjust(9) + '  ' + titles[5].rjust(8) + '  ' + titles[6]
+        )
+    rows = (
+        data['ref'].str.ljust(width['ref']) + '  '
+        + data['val'].str.ljust(width['val']) + '  '
+        + data['package'].str.ljust(width['package']) + '  '
+        + data['x'].map('{:9.4f}'.format).astype(str) + '  '
+        + data['y'].map('{:9.4f}'.format).astype(str) + '  '
+        + data['rot'].map('{:8.4f}'.format).astype(str) + '  '
+        + data['side']
+    )
+    return [header] + rows.tolist()
+
+
+def format_kibot(data, titles, widths=None):
+    """Lines of a table in the layout KiBot writes (every column left aligned)."""
+    cells = [
+        data[column] if column in TEXT_COLUMNS else data[column].map('{:.4f}'.format).astype(str)
+        for column in COLUMNS
+    ]
+    titles = ['# ' + titles[0]] + titles[1:]
+    widths = widths or [0] * len(titles)
+    widths = [
+        max([width, len(title)] + cell.str.len().tolist())
+        for width, title, cell in zip(widths, titles, cells)
+    ]
+    header = KIBOT_SEPARATOR.join(title.ljust(width) for title, width in zip(titles, widths)).rstrip()
+    rows = cells[0].str.ljust(widths[0])
+    for cell, width in zip(cells[1:], widths[1:]):
+        rows = rows + KIBOT_SEPARATOR + cell.str.ljust(width)
+    return [header] + rows.tolist()
+
+
+def normalize_angle(angles):
+    """Angles in degrees wrapped to (-180, 180], the range KiCad writes."""
+    angles = np.mod(angles, 360.0)
+    return np.where(angles > 180.0, angles - 360.0, angles)
+
+
+def load_parts(csv_file):
+    """
+    Package table from a CSV with a package column and optional part and
+    rotation (degrees added to the placement) columns.
+    """
+    parts = pd.read_csv(csv_file, dtype={'package': str, 'part': str}, skipinitialspace=True)
+    if 'package' not in parts:
+        raise ValueError(f"{csv_file} has no package column")
+    return parts.drop_duplicates('package', keep='last').set_index('package')
+
+
+def map_packages(data, mapping):
+    """Replace the package names found in mapping (e.g. by JLCPCB part numbers)."""
+    data = data.copy()
+    data['package'] = data['package'].map(mapping).fillna(data['package'])
+    return data
+
+
+def rotate_packages(data, offsets):
+    """Add a rotation offset (degrees) per package name; other rows are left as they are."""
+    data = data.copy()
+    offset = data['package'].map(offsets)
+    has_offset = offset.notna() & (offset != 0)
+    data.loc[has_offset, 'rot'] = normalize_angle(data.loc[has_offset, 'rot'] + offset[has_offset])
+    return data
+
+
+def mirror_bottom(data, axis_x=0.0):
+    """
+    Mirror the bottom side placements across the vertical line x = axis_x,
+    as seen from below: x is reflected and the rotation becomes 180 - rot.
+    """
+    data = data.copy()
+    bottom = data['side'].str.lower() == 'bottom'
+    data.loc[bottom, 'x'] = 2 * axis_x - data.loc[bottom, 'x']
+    data.loc[bottom, 'rot'] = normalize_angle(180.0 - data.loc[bottom, 'rot'])
+    return data
+
+
+def board_name(path):
+    """Board a .pos file belongs to: left_pcb for left_pcb-top.pos, else the file name without .pos."""
+    match = POS_NAME_PATTERN.match(os.path.basename(path))
+    return match.group('board') if match else os.path.splitext(os.path.basename(path))[0]
+
+
+def find_pos_files(paths):
+    """.pos files from files, directories (searched recursively) and glob patterns."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += glob.glob(os.path.join(path, '**', '*.pos'), recursive=True)
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            found += glob.glob(path, recursive=True)
+    return sorted(set(found))
+
+
+def read_pos_files(paths):
+    """
+    Load many .pos files at once. Returns the tables by path and all their
+    rows concatenated in one DataFrame with a 'file' column, so transforms
+    run once over every placement.
+    """
+    tables = {path: read_pos(path) for path in find_pos_files(paths)}
+    if not tables:
+        return tables, pd.DataFrame(columns=COLUMNS + ['file'])
+    combined = pd.concat(
+        [table.data.assign(file=path) for path, table in tables.items()], ignore_index=True
+    )
+    return tables, combined
+
+
+def transform_pos_files(paths, output_dir=None, suffix='', parts=None, mirror=False, axis_x=0.0):
+    """
+    Apply the rotation offsets and package mapping of the parts table (and
+    the bottom mirroring) to every .pos file found in paths in one pass, then
+    write each table back in its own layout. Returns the written paths.
+    """
+    tables, combined = read_pos_files(paths)
+    if parts is not None:
+        # Rotations are looked up by footprint name, before it is replaced by the part number
+        if 'rotation' in parts:
+            combined = rotate_packages(combined, parts['rotation'].dropna())
+        if 'part' in parts:
+            combined = map_packages(combined, parts['part'].dropna())
+    if mirror:
+        combined = mirror_bottom(combined, axis_x)
+
+    # With an output directory, the layout of the input folders is kept below it
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in tables]) if tables else ''
+
+    def output_path(path):
+        base, extension = os.path.splitext(path)
+        if output_dir is None:
+            return base + suffix + extension
+        relative = os.path.relpath(os.path.abspath(base), root) + suffix + extension
+        os.makedirs(os.path.dirname(os.path.join(output_dir, relative)), exist_ok=True)
+        return os.path.join(output_dir, relative)
+
+    written = []
+    rows_by_file = dict(tuple(combined.groupby('file', sort=False)))
+    for path, table in tables.items():
+        if path in rows_by_file:
+            table = table.copy(rows_by_file[path].drop(columns='file').reset_index(drop=True))
+        # Files without placements are written through unchanged
+        path = output_path(path)
+        table.write(path)
+        written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transform KiCad/KiBot .pos files, keeping their layout')
+    parser.add_argument('paths', nargs='+', help='.pos files, directories or glob patterns')
+    parser.add_argument(
+        '--parts',
+        help='CSV with package and part (and optionally rotation) columns, e.g. kibot/jlcpcb_parts.csv'
+    )
+    parser.add_argument('--mirror-bottom', action='store_true', help='Mirror the bottom side placements')
+    parser.add_argument('--axis-x', type=float, default=0.0, help='X of the mirror axis (default: 0)')
+    parser.add_argument('--output-dir', '-o', help='Write the results here instead of next to the inputs')
+    parser.add_argument('--suffix', default='', help='Added to the output file names, e.g. -jlcpcb')
+    args = parser.parse_args()
+
+    if args.output_dir is None and not args.suffix:
+        parser.error('give --output-dir or --suffix, the input files are not overwritten')
+
+    parts = load_parts(args.parts) if args.parts else None
+    written = transform_pos_files(args.paths, args.output_dir, args.suffix, parts, args.mirror_bottom, args.axis_x)
+    print(f"Wrote {len(written)} position files")
+    if not written:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,14 @@
 #!/usr/bin/env python3
 """
 Convert binary STL files to ASCII STL format for GitHub markdown rendering.
+
+Usage:
+    python stl2ascii.py <input.stl> [output.stl | -o output.stl] [--max-facets N] [--precision P]
+    python stl2ascii.py --batch filtered-output 'ergogen/output/**/*.stl'
+
+Batch mode converts every STL found in the given directories or globs to the
+other format (binary to ASCII and ASCII to binary) in parallel, skipping the
+outputs that are already newer than their input.
  
 GitHub renders STL files in markdown using the ASCII STL format:
 ```stl
@@ -15,115 +23,392 @@ solid Mesh
 endsolid Mesh
 """
 
+import argparse
+import glob
+import re
+import struct
 import sys
 import os
-import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# One binary STL facet: normal, 3 vertices and the attribute byte count (50 bytes)
+STL_FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attribute', '<u2'),
+])
+STL_HEADER_SIZE = 84
+
+# Suffixes of the files this script writes, batch mode does not convert them back
+OUTPUT_SUFFIXES = {'ascii': '-ascii.stl', 'binary': '-binary.stl'}
+
+ASCII_VALUES = re.compile(rb'(?:normal|vertex)\s+(\S+)\s+(\S+)\s+(\S+)')
+
+
+def detect_stl_format(filename):
+    """
+    'binary' or 'ascii'. A binary STL is exactly 84 + 50 * facet count bytes
+    long, which also holds when its header starts with "solid"; anything else
+    starting with "solid" is ASCII.
+    """
+    file_size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        start = f.read(STL_HEADER_SIZE)
+    if len(start) == STL_HEADER_SIZE:
+        num_facets = int(np.frombuffer(start, dtype='<u4', count=1, offset=80)[0])
+        if file_size == STL_HEADER_SIZE + num_facets * STL_FACET_DTYPE.itemsize:
+            return 'binary'
+    if start.lstrip().startswith(b'solid'):
+        return 'ascii'
+    raise ValueError(f"Invalid STL file: {filename} - neither binary nor ASCII STL")
 
 
 def read_binary_stl(filename):
-    """Read binary STL file and return list of facets."""
+    """
+    Read a binary STL file and return (normals, vertices) as float32 arrays
+    of shape (n, 3) and (n, 3, 3).
+
+    The facets are memory mapped, not parsed one by one, so the arrays are
+    only paged in as they are used.
+    """
+    file_size = os.path.getsize(filename)
+    if file_size < STL_HEADER_SIZE:
+        raise ValueError(f"Invalid STL file: {filename} - header is too short")
+
+    # Number of facets (4 bytes, little endian) after the 80 byte header
+    num_facets = int(np.fromfile(filename, dtype='<u4', count=1, offset=80)[0])
+
+    # The size has to match the facet count exactly, anything else is a corrupted (or ASCII) file
+    expected_size = STL_HEADER_SIZE + num_facets * STL_FACET_DTYPE.itemsize
+    if file_size != expected_size:
+        raise ValueError(
+            f"Invalid STL file: {filename} - {num_facets:,} facets need {expected_size:,} bytes, "
+            f"the file has {file_size:,}. File may be corrupted."
+        )
+
+    if num_facets == 0:
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3, 3), dtype=np.float32)
+
+    facets = np.memmap(filename, dtype=STL_FACET_DTYPE, mode='r', offset=STL_HEADER_SIZE, shape=(num_facets,))
+    return facets['normal'], facets['vertices']
+
+
+def read_ascii_stl(filename):
+    """
+    Read an ASCII STL file and return (normals, vertices) as float32 arrays
+    of shape (n, 3) and (n, 3, 3).
+    """
     with open(filename, 'rb') as f:
-        # Read header (80 bytes)
-        header = f.read(80)
-
-        # Check if header is empty
-        if len(header) < 80:
-            raise ValueError(f"Invalid STL file: {filename} - header is too short")
-
-        # Read number of facets (4 bytes, little endian)
-        num_facets_data = f.read(4)
-        if len(num_facets_data) < 4:
-            raise ValueError(f"Invalid STL file: {filename} - facet count is too short")
-        num_facets = struct.unpack('<I', num_facets_data)[0]
-
-        # Validate facet count - reasonable PCB models should have far fewer facets
-        # A typical PCB with 1000-5000 facets is normal. 3M+ facets indicates corruption.
-        MAX_REASONABLE_FACETS = 1000000
-        if num_facets > MAX_REASONABLE_FACETS:
-            raise ValueError(
-                f"Invalid STL file: {filename} - facet count {num_facets:,} is too high. "
-                f"Expected < {MAX_REASONABLE_FACETS:,}. File may be corrupted."
-            )
-
-        facets = []
-        for i in range(num_facets):
-            # Read normal (3 floats * 4 bytes = 12 bytes, little endian)
-            normal_data = f.read(12)
-            if len(normal_data) < 12:
-                raise ValueError(f"Invalid STL file: {filename} - normal data is too short at facet {i}")
-            normal = struct.unpack('<fff', normal_data)
-
-            # Read vertices (3 vertices * 3 floats * 4 bytes = 36 bytes, little endian)
-            v1_data = f.read(12)
-            v2_data = f.read(12)
-            v3_data = f.read(12)
-            if len(v1_data) < 12 or len(v2_data) < 12 or len(v3_data) < 12:
-                raise ValueError(f"Invalid STL file: {filename} - vertex data is too short at facet {i}")
-            v1 = struct.unpack('<fff', v1_data)
-            v2 = struct.unpack('<fff', v2_data)
-            v3 = struct.unpack('<fff', v3_data)
-
-            # Read attribute byte count (2 bytes, little endian)
-            attribute_data = f.read(2)
-            if len(attribute_data) < 2:
-                raise ValueError(f"Invalid STL file: {filename} - attribute data is too short at facet {i}")
-            attribute = struct.unpack('<H', attribute_data)[0]
-
-            facets.append((normal, v1, v2, v3))
-
-    return facets
-
-
-def write_ascii_stl(filename, facets):
-    """Write ASCII STL file."""
+        values = np.array(ASCII_VALUES.findall(f.read()), dtype=np.float64).astype(np.float32)
+    if len(values) % 4:
+        raise ValueError(f"Invalid STL file: {filename} - facets must have one normal and 3 vertices")
+    values = values.reshape(-1, 4, 3)
+    return values[:, 0], values[:, 1:]
+
+
+def read_stl(filename):
+    """(normals, vertices) of a binary or ASCII STL file."""
+    if detect_stl_format(filename) == 'binary':
+        return read_binary_stl(filename)
+    return read_ascii_stl(filename)
+
+
+# Facets formatted and written at once, bounds the memory used for the text
+WRITE_BLOCK_FACETS = 65536
+
+# Default number of decimals, the precision KiCad and most tools write
+DEFAULT_PRECISION = 6
+
+
+def facet_template(precision=DEFAULT_PRECISION):
+    """Text of one ASCII STL facet as a %-format for its 12 values."""
+    value = f"%.{precision}f"
+    return (
+        f"  facet normal {value} {value} {value}\n"
+        "    outer loop\n"
+        f"      vertex {value} {value} {value}\n"
+        f"      vertex {value} {value} {value}\n"
+        f"      vertex {value} {value} {value}\n"
+        "    endloop\n"
+        "  endfacet\n"
+    )
+
+
+def face_normals_unscaled(vertices):
+    """Normals of (n, 3, 3) triangles, twice as long as the triangle area."""
+    return np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0])
+
+
+def face_normals(vertices):
+    """Unit normals of (n, 3, 3) triangles, degenerate triangles get a zero normal."""
+    normals = face_normals_unscaled(vertices)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def weld_vertices(vertices):
+    """
+    Shared vertex positions and the (n, 3) faces indexing them, from the
+    (n, 3, 3) facet vertices of an STL.
+    """
+    points = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+    # Sort on the raw bits, a lexsort of three integer keys is much faster than a row-wise unique
+    bits = points.view(np.uint32)
+    order = np.lexsort((bits[:, 2], bits[:, 1], bits[:, 0]))
+    sorted_bits = bits[order]
+    new_point = np.empty(len(order), dtype=bool)
+    new_point[0] = True
+    new_point[1:] = (sorted_bits[1:] != sorted_bits[:-1]).any(axis=1)
+
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(new_point) - 1
+    return points[order[new_point]].astype(np.float64), inverse.reshape(-1, 3)
+
+
+def unique_faces(faces, num_points):
+    """Index of the first of every set of faces using the same three points."""
+    ordered = np.sort(faces, axis=1)
+    if num_points < 2 ** 21:
+        # The three indices fit in one int64 key, much faster than a row-wise unique
+        keys = (ordered[:, 0] * num_points + ordered[:, 1]) * num_points + ordered[:, 2]
+        _, first = np.unique(keys, return_index=True)
+    else:
+        _, first = np.unique(ordered, axis=0, return_index=True)
+    return np.sort(first)
+
+
+def cluster_facets(points, faces, cell_size):
+    """
+    Vertex clustering: snap every point to the mean of the points sharing
+    its grid cell, then drop the faces that collapsed or became duplicates.
+    Returns the (m, 3, 3) float64 vertices of the remaining faces.
+    """
+    cells = np.floor((points - points.min(axis=0)) / cell_size).astype(np.int64)
+    keys = np.ravel_multi_index(cells.T, cells.max(axis=0) + 1)
+    _, cluster = np.unique(keys, return_inverse=True)
+    cluster = cluster.ravel()
+
+    counts = np.bincount(cluster)
+    centers = np.column_stack([np.bincount(cluster, weights=points[:, axis]) for axis in range(3)]) / counts[:, None]
+
+    faces = cluster[faces]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    return centers[faces[unique_faces(faces, len(centers))]]
+
+
+def decimate(normals, vertices, max_facets):
+    """
+    Simplify the mesh to at most max_facets facets with vertex clustering.
+
+    The grid cell size is found with a binary search (in log scale) for the
+    finest grid that fits the budget, so as much detail as possible is kept.
+    Returns (normals, vertices) as float32 arrays.
+    """
+    if len(vertices) <= max_facets:
+        return normals, vertices
+
+    points, faces = weld_vertices(vertices)
+    diagonal = float(np.linalg.norm(points.max(axis=0) - points.min(axis=0)))
+
+    # A surface cut in cells of size h keeps about 2 * area / h^2 facets, search around that
+    area = np.linalg.norm(face_normals_unscaled(points[faces]), axis=1).sum() / 2
+    estimate = np.sqrt(2 * area / max_facets)
+    # Finest cell keeps the grid keys within int64, the coarsest one collapses everything
+    low = np.log(max(estimate / 16, diagonal / 2 ** 20))
+    high = np.log(diagonal)
+
+    best = None
+    for _ in range(30):
+        middle = (low + high) / 2
+        clustered = cluster_facets(points, faces, np.exp(middle))
+        if len(clustered) <= max_facets:
+            best, high = clustered, middle
+            if len(clustered) >= 0.9 * max_facets:
+                break
+        else:
+            low = middle
+
+    if best is None:
+        best = cluster_facets(points, faces, np.exp(high))
+    return face_normals(best).astype(np.float32), best.astype(np.float32)
+
+
+def write_ascii_stl(filename, normals, vertices, block_facets=WRITE_BLOCK_FACETS, precision=DEFAULT_PRECISION):
+    """
+    Write ASCII STL file.
+
+    Facets are formatted a block at a time with one %-format over the whole
+    block (a C loop instead of seven writes per facet) and each block is
+    written with a single call.
+    """
+    template = facet_template(precision)
     with open(filename, 'w') as f:
         f.write(f"solid Mesh\n")
 
-        for normal, v1, v2, v3 in facets:
-            f.write("  facet normal {:.6f} {:.6f} {:.6f}\n".format(
-                normal[0], normal[1], normal[2]))
-            f.write("    outer loop\n")
-            f.write("      vertex {:.6f} {:.6f} {:.6f}\n".format(*v1))
-            f.write("      vertex {:.6f} {:.6f} {:.6f}\n".format(*v2))
-            f.write("      vertex {:.6f} {:.6f} {:.6f}\n".format(*v3))
-            f.write("    endloop\n")
-            f.write("  endfacet\n")
+        for start in range(0, len(normals), block_facets):
+            block_normals = normals[start:start + block_facets]
+            block_vertices = vertices[start:start + block_facets]
+            values = np.concatenate(
+                (block_normals, block_vertices.reshape(-1, 9)), axis=1
+            ).astype(np.float64).ravel().tolist()
+            f.write((template * len(block_normals)) % tuple(values))
 
         f.write("endsolid Mesh\n")
 
 
-def convert_stl_to_ascii(input_file, output_file=None):
-    """Convert binary STL to ASCII STL."""
+def write_binary_stl(filename, normals, vertices):
+    """Write binary STL file."""
+    facets = np.zeros(len(normals), dtype=STL_FACET_DTYPE)
+    facets['normal'] = normals
+    facets['vertices'] = vertices
+    with open(filename, 'wb') as f:
+        # The header must not start with "solid", some readers would take the file for ASCII
+        f.write(b'Binary STL written by stl2ascii'.ljust(80, b'\0'))
+        f.write(np.array(len(facets), dtype='<u4').tobytes())
+        facets.tofile(f)
+
+
+def convert_stl_to_ascii(input_file, output_file=None, max_facets=None, precision=DEFAULT_PRECISION):
+    """Convert binary (or ASCII) STL to ASCII STL, decimated to max_facets when given."""
     if output_file is None:
-        output_file = input_file.replace('.stl', '-ascii.stl')
+        output_file = input_file.replace('.stl', OUTPUT_SUFFIXES['ascii'])
 
     print(f"Converting {input_file} to {output_file}...")
 
     # Read binary STL
-    facets = read_binary_stl(input_file)
+    normals, vertices = read_stl(input_file)
+
+    if max_facets is not None and len(normals) > max_facets:
+        original_facets = len(normals)
+        normals, vertices = decimate(normals, vertices, max_facets)
+        print(f"✓ Decimated {original_facets} facets to {len(normals)}")
 
     # Write ASCII STL
-    write_ascii_stl(output_file, facets)
+    write_ascii_stl(output_file, normals, vertices, precision=precision)
 
-    print(f"✓ Converted {len(facets)} facets")
+    print(f"✓ Converted {len(normals)} facets")
     print(f"✓ Saved to {output_file}")
     return output_file
 
 
+def find_stl_files(paths):
+    """
+    STL files from files, directories (searched recursively) and glob
+    patterns. Files written by this script are left out of directory and
+    glob results.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, '**', '*.stl'), recursive=True)
+        elif os.path.isfile(path):
+            found.append(path)
+            continue
+        else:
+            matches = glob.glob(path, recursive=True)
+        found += [
+            match for match in matches
+            if os.path.isfile(match) and not match.endswith(tuple(OUTPUT_SUFFIXES.values()))
+        ]
+    return sorted(set(found))
+
+
+def batch_output_path(input_file, input_format):
+    """The file an STL converts to: binary to <name>-ascii.stl, ASCII to <name>-binary.stl."""
+    output_format = 'binary' if input_format == 'ascii' else 'ascii'
+    return re.sub(r'\.stl$', OUTPUT_SUFFIXES[output_format], input_file, flags=re.IGNORECASE)
+
+
+def convert_batch_file(input_file, force=False, max_facets=None, precision=DEFAULT_PRECISION):
+    """
+    Convert one file of a batch to the other format. Returns a line for the
+    summary; up to date outputs are not written again unless force is set.
+    """
+    input_format = detect_stl_format(input_file)
+    output_file = batch_output_path(input_file, input_format)
+    if not force and os.path.exists(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(input_file):
+        return f"- {output_file} is up to date"
+
+    normals, vertices = read_stl(input_file)
+    if max_facets is not None and len(normals) > max_facets:
+        normals, vertices = decimate(normals, vertices, max_facets)
+
+    if input_format == 'binary':
+        write_ascii_stl(output_file, normals, vertices, precision=precision)
+    else:
+        write_binary_stl(output_file, normals, vertices)
+    return f"✓ {input_file} -> {output_file} ({len(normals)} facets)"
+
+
+def convert_batch(paths, force=False, max_facets=None, precision=DEFAULT_PRECISION, workers=None):
+    """Convert every STL found in paths, spread over a process pool. Returns the number of failures."""
+    files = find_stl_files(paths)
+    print(f"Converting {len(files)} STL files...")
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(convert_batch_file, input_file, force, max_facets, precision): input_file
+            for input_file in files
+        }
+        for future, input_file in futures.items():
+            try:
+                print(future.result())
+            except (OSError, ValueError, struct.error) as e:
+                # One unreadable or malformed file does not stop the batch
+                failures += 1
+                print(f"✗ {input_file}: {e}")
+    return failures
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python stl2ascii.py <input.stl> [output.stl]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Convert binary STL files to ASCII STL')
+    parser.add_argument(
+        'input_files',
+        nargs='+',
+        help='STL file and optionally the ASCII STL file (with --batch: files, directories or glob patterns)'
+    )
+    parser.add_argument('--output', '-o', help='ASCII STL file (default: <input>-ascii.stl, not with --batch)')
+    parser.add_argument(
+        '--max-facets',
+        type=int,
+        help='Simplify the mesh to at most this many facets (e.g. for models embedded in markdown)'
+    )
+    parser.add_argument(
+        '--precision',
+        type=int,
+        default=DEFAULT_PRECISION,
+        help=f'Decimals written per value (default: {DEFAULT_PRECISION})'
+    )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Convert every STL of the given files, directories and globs to the other format'
+    )
+    parser.add_argument('--force', action='store_true', help='With --batch, also rewrite up to date outputs')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='With --batch, number of worker processes')
+    args = parser.parse_args()
+
+    if args.batch:
+        if args.output:
+            parser.error('--output cannot be used with --batch, outputs are written next to their input')
+        failures = convert_batch(args.input_files, args.force, args.max_facets, args.precision, args.workers)
+        sys.exit(1 if failures else 0)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    # Without --batch, a second positional argument is the output file, as it always was
+    if len(args.input_files) > 2 or (len(args.input_files) == 2 and args.output):
+        parser.error('only one input and one output file can be given, use --batch to convert several files')
+    input_file = args.input_files[0]
+    output_file = args.input_files[1] if len(args.input_files) == 2 else args.output
 
     if not os.path.exists(input_file):
         print(f"Error: File not found: {input_file}")
         sys.exit(1)
 
-    convert_stl_to_ascii(input_file, output_file)
+    convert_stl_to_ascii(input_file, output_file, args.max_facets, args.precision)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
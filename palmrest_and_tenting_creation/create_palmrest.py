@@ -1,7 +1,18 @@
+import argparse
+import hashlib
+import os
+from functools import partial
+
 import trimesh
 import numpy as np
-from shapely.geometry import Polygon, Point
-from scipy.spatial import Delaunay, cKDTree
+import shapely
+from shapely.geometry import Polygon
+from scipy.spatial import Delaunay
+
+from mirror import build_both_halves
+from outline_store import load_polygons
+from solid_builder import boundary_loop_indices, solid_faces, solid_vertices
+from stl_writer import write_binary_stl
 
 def polygon_to_numpy(polygon: Polygon) -> np.ndarray:
     coords = np.array(polygon.exterior.coords)
@@ -9,20 +20,11 @@ def polygon_to_numpy(polygon: Polygon) -> np.ndarray:
         coords = coords[:-1]
     return coords
 
-def add_height(poly2d: np.ndarray, z: float) -> np.ndarray:
-    n = poly2d.shape[0]
-    return np.column_stack((poly2d, np.full(n, z)))
-
 def interpolate_edges(points: np.ndarray, steps: int = 10) -> np.ndarray:
-    interpolated = []
-    n = len(points)
-    for i in range(n):
-        p0 = points[i]
-        p1 = points[(i + 1) % n]
-        for t in np.linspace(0, 1, steps, endpoint=False):
-            interp = (1 - t) * p0 + t * p1
-            interpolated.append(interp)
-    return np.array(interpolated)
+    t = np.linspace(0, 1, steps, endpoint=False)[None, :, None]
+    p0 = points[:, None, :]
+    p1 = np.roll(points, -1, axis=0)[:, None, :]
+    return ((1 - t) * p0 + t * p1).reshape(-1, points.shape[1])
 
 def find_smallest_y(points: np.ndarray) -> float:
     return np.min(points[:, 1])
@@ -30,23 +32,17 @@ def find_smallest_y(points: np.ndarray) -> float:
 def find_biggest_y(points: np.ndarray) -> float:
     return np.max(points[:, 1])
 
-def calculate_point_z(y, z_max, z_min, y_threshold, y_smallest, curve_strength=1.0) -> float:
+def calculate_point_z(y, z_max, z_min, y_threshold, y_smallest, curve_strength=1.0):
+    """
+    Height of the palm rest top surface at y. Works on scalars and arrays.
+    """
     curve_strength = max(0.01, min(curve_strength, 10.0))
     ramp_range = y_threshold - y_smallest
-    if ramp_range <= 0 or y >= y_threshold:
-        return z_max
-    t = (y - y_smallest) / ramp_range
-    t = max(0.0, min(t, 1.0))
+    if ramp_range <= 0:
+        return np.full(np.shape(y), z_max, dtype=float)
+    t = np.clip((np.asarray(y, dtype=float) - y_smallest) / ramp_range, 0.0, 1.0)
     eased = 0.5 * (1 - np.cos(np.pi * (t ** curve_strength)))
-    return z_min + (z_max - z_min) * eased
-
-def adjust_z(points: np.ndarray, z_max, z_min, y_threshold, y_smallest, curve_strength=1.0) -> np.ndarray:
-    result = []
-    for pt in points:
-        x, y = pt
-        z = calculate_point_z(y, z_max, z_min, y_threshold, y_smallest, curve_strength)
-        result.append([x, y, z])
-    return np.array(result)
+    return np.where(y >= y_threshold, z_max, z_min + (z_max - z_min) * eased)
 
 def sample_points_in_polygon(polygon: Polygon, spacing: float) -> np.ndarray:
     """
@@ -55,84 +51,150 @@ def sample_points_in_polygon(polygon: Polygon, spacing: float) -> np.ndarray:
     minx, miny, maxx, maxy = polygon.bounds
     x_vals = np.arange(minx, maxx, spacing)
     y_vals = np.arange(miny, maxy, spacing)
-    points = np.array([[x, y] for x in x_vals for y in y_vals if polygon.contains(Point(x, y))])
-    return points
+    xs, ys = np.meshgrid(x_vals, y_vals, indexing='ij')
+    inside = shapely.contains_xy(polygon, xs, ys)
+    return np.column_stack((xs[inside], ys[inside]))
+
+def load_outline(dxf_path: str) -> Polygon:
+    # Largest polygon, parsed once and then read back from the outline cache
+    return load_polygons(dxf_path)[0]
+
+def outline_hash(polygon: Polygon) -> str:
+    coords = np.ascontiguousarray(polygon_to_numpy(polygon), dtype=np.float64)
+    return hashlib.sha1(coords.tobytes()).hexdigest()
+
+# 2D meshes already triangulated in this process, keyed by (outline hash, spacing, edge steps)
+_MESH_2D_CACHE = {}
+
+class PalmRestGenerator:
+    """
+    Palm rest built from a fixed outline.
+
+    The outline sampling, triangulation and (validated) solid faces only
+    depend on the outline and the sampling spacing, so they are computed
+    once and cached. Each parameter set then only re-evaluates the top Z array.
+    """
+
+    def __init__(self, outline: Polygon, spacing: float = 2.0, edge_steps: int = 50):
+        self.outline = outline
+        self.spacing = spacing
+        self.edge_steps = edge_steps
+        key = (outline_hash(outline), spacing, edge_steps)
+        if key not in _MESH_2D_CACHE:
+            _MESH_2D_CACHE[key] = self._triangulate()
+        self.points, self.faces = _MESH_2D_CACHE[key]
+        self.y_smallest = find_smallest_y(self.points)
+        self.y_largest = find_biggest_y(self.points)
+
+    @classmethod
+    def from_dxf(cls, dxf_path: str, **kwargs) -> "PalmRestGenerator":
+        return cls(load_outline(dxf_path), **kwargs)
+
+    def _triangulate(self):
+        # Interpolate boundary for smooth edge
+        poly_2d = interpolate_edges(polygon_to_numpy(self.outline), self.edge_steps)
+
+        # Sample interior points. Keeping them at least one boundary segment away from the
+        # boundary makes every boundary segment a Delaunay edge, so the walls close the caps.
+        shapely_poly = Polygon(poly_2d)
+        interior_points = sample_points_in_polygon(shapely_poly, spacing=self.spacing)
+        segment_lengths = np.linalg.norm(np.roll(poly_2d, -1, axis=0) - poly_2d, axis=1)
+        clearance = shapely.distance(shapely_poly.exterior, shapely.points(interior_points))
+        interior_points = interior_points[clearance > segment_lengths.max()]
+
+        # Combine boundary and interior
+        all_points = np.vstack((poly_2d, interior_points))
+
+        # Triangulate all points, keeping triangles whose centroid is inside the polygon.
+        # Slivers spanning collinear boundary points have their centroid on the boundary
+        # and can pass the containment test by rounding, so zero-area triangles are dropped.
+        triangles = Delaunay(all_points).simplices
+        corners = all_points[triangles]
+        centroids = corners.mean(axis=1)
+        edge_1 = corners[:, 1] - corners[:, 0]
+        edge_2 = corners[:, 2] - corners[:, 0]
+        areas = 0.5 * np.abs(edge_1[:, 0] * edge_2[:, 1] - edge_1[:, 1] * edge_2[:, 0])
+        inside = shapely.contains_xy(shapely_poly, centroids[:, 0], centroids[:, 1])
+        valid_faces = triangles[inside & (areas > 1e-9)]
+
+        boundary_indices = boundary_loop_indices(all_points, poly_2d)
+        return all_points, solid_faces(all_points, valid_faces, boundary_indices, [])
+
+    def top_z(self, z_max=10.0, z_min=3.0, y_threshold=None, curve_strength=1.0) -> np.ndarray:
+        """
+        Top surface heights. y_threshold defaults to 20mm below the back edge.
+        """
+        if y_threshold is None:
+            y_threshold = self.y_largest - 20
+        return calculate_point_z(self.points[:, 1], z_max, z_min, y_threshold, self.y_smallest, curve_strength)
+
+    def solid(self, **params):
+        """
+        Vertex and face arrays of the palm rest for the given top surface parameters.
+        """
+        return solid_vertices(self.points, self.top_z(**params)), self.faces
+
+    def mesh(self, **params) -> trimesh.Trimesh:
+        return palm_rest_mesh(*self.solid(**params))
+
+    def export(self, path: str, validate: bool = False, **params) -> None:
+        export_palm_rest(path, *self.solid(**params), validate=validate)
+
+def palm_rest_solid(outline: Polygon, **params):
+    """
+    Vertex and face arrays of a palm rest. Top-level so it can run in a worker process.
+    """
+    return PalmRestGenerator(outline).solid(**params)
+
+def palm_rest_mesh(vertices: np.ndarray, faces: np.ndarray) -> trimesh.Trimesh:
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=True)
 
-if __name__ == "__main__":
-    # Load DXF and extract polygon
-    dxf_path = "./ergogen/output/outlines/l_hand_rest_polygon.dxf"
-    entities = trimesh.load(dxf_path, force='2D')
-    shapely_poly = max(entities.polygons_full, key=lambda p: p.area)
-
-    # Interpolate boundary for smooth edge
-    poly_2d = polygon_to_numpy(shapely_poly)
-    poly_2d = interpolate_edges(poly_2d, 50)
-
-    # Sample interior points
-    shapely_poly = Polygon(poly_2d)
-    interior_points = sample_points_in_polygon(shapely_poly, spacing=2.0)
-
-    # Combine boundary and interior
-    all_points = np.vstack((poly_2d, interior_points))
-
-    # Triangulate all points
-    delaunay = Delaunay(all_points)
-    triangles = delaunay.simplices
-
-    # Filter triangles that are inside the polygon
-    valid_faces = []
-    for tri in triangles:
-        centroid = np.mean(all_points[tri], axis=0)
-        if shapely_poly.contains(Point(centroid)):
-            valid_faces.append(tri.tolist())
-
-    valid_faces = np.array(valid_faces)
-
-    # Z computation
-    y_smallest = find_smallest_y(all_points)
-    y_largest = find_biggest_y(all_points)
-    last_key_end = y_largest - 20
-
-    # Bottom (flat)
-    vertices_bottom = add_height(all_points, 0.0)
-
-    # Top (curved)
-    vertices_top = adjust_z(all_points, 10, 3, last_key_end, y_smallest, curve_strength=1)
-
-    # Combine
-    vertices = np.vstack((vertices_bottom, vertices_top))
-    offset = len(vertices_bottom)
-
-    # Build faces
-    final_faces = []
-
-    # Bottom cap
-    for f in valid_faces:
-        final_faces.append(f.tolist())
-
-    # Top cap (reverse winding)
-    for f in valid_faces:
-        final_faces.append([i + offset for i in f[::-1]])
-
-    # Side walls (using boundary)
-    tree = cKDTree(all_points)
-    boundary_indices = [tree.query(p)[1] for p in poly_2d]
-
-    for i in range(len(boundary_indices)):
-        a = boundary_indices[i]
-        b = boundary_indices[(i + 1) % len(boundary_indices)]
-        a_top = a + offset
-        b_top = b + offset
-        final_faces.append([a, b, a_top])
-        final_faces.append([b, b_top, a_top])
-
-    # Final mesh
-    mesh = trimesh.Trimesh(vertices=vertices, faces=final_faces, process=True)
-    
     # Add color (blue for palm rest)
     mesh.visual.vertex_colors = np.tile(
         [60, 60, 200, 255], (len(mesh.vertices), 1)
     )
-    
-    mesh.export("./filtered-output/palmrest/palm_rest.stl")
+    return mesh
+
+def export_palm_rest(path: str, vertices: np.ndarray, faces: np.ndarray, validate: bool = False) -> None:
+    """
+    Write the palm rest STL. The solid is written directly from its arrays;
+    validate=True goes through trimesh processing and reports the mesh checks.
+    """
+    if validate:
+        mesh = palm_rest_mesh(vertices, faces)
+        print(f"Watertight: {mesh.is_watertight}, winding consistent: {mesh.is_winding_consistent}")
+        mesh.export(path)
+    else:
+        write_binary_stl(path, vertices, faces)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create the palm rest STLs from the ergogen outlines')
+    parser.add_argument(
+        '--validate',
+        action='store_true',
+        help='Process the mesh with trimesh and report watertightness before exporting'
+    )
+    args = parser.parse_args()
+
+    params = dict(z_max=10, z_min=3, curve_strength=1)
+    left_dxf = "./ergogen/output/outlines/l_hand_rest_polygon.dxf"
+    right_dxf = "./ergogen/output/outlines/r_hand_rest_polygon.dxf"
+
+    generator = PalmRestGenerator.from_dxf(left_dxf)
+
+    if os.path.exists(right_dxf):
+        right_outline = load_outline(right_dxf)
+        left, right, mirrored = build_both_halves(
+            generator.outline,
+            right_outline,
+            lambda: generator.solid(**params),
+            partial(palm_rest_solid, right_outline, **params)
+        )
+        export_palm_rest("./filtered-output/palmrest/palm_rest_right.stl", *right, validate=args.validate)
+        print(f"Right palmrest STL file saved as 'palm_rest_right.stl' "
+              f"({'mirrored from the left one' if mirrored else 'generated from its own outline'})")
+    else:
+        left = generator.solid(**params)
+
+    export_palm_rest("./filtered-output/palmrest/palm_rest.stl", *left, validate=args.validate)
     print("Palmrest STL file saved as 'palm_rest.stl'")
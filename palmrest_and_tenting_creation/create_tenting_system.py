@@ -1,19 +1,26 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import trimesh
 import numpy as np
-from shapely.geometry import Polygon, Point, MultiPolygon
-from scipy.spatial import cKDTree
+from shapely.geometry import Polygon, MultiPolygon
+from shapely.ops import unary_union
 from trimesh.creation import triangulate_polygon
 
+from mesh_boolean import manifold_union
+from mirror import build_both_halves
+from outline_store import load_polygons
+from solid_builder import boundary_loop_indices, solid_faces, solid_vertices
+from stl_writer import write_binary_stl
+
 def polygon_to_numpy(polygon: Polygon) -> np.ndarray:
     coords = np.array(polygon.exterior.coords)
     if np.allclose(coords[0], coords[-1]):
         coords = coords[:-1]
     return coords
 
-def add_height(poly2d: np.ndarray, z: float) -> np.ndarray:
-    n = poly2d.shape[0]
-    return np.column_stack((poly2d, np.full(n, z)))
-
 def interpolate_edges(points: np.ndarray, steps: int = 10) -> np.ndarray:
     interpolated = []
     n = len(points)
@@ -25,19 +32,9 @@ def interpolate_edges(points: np.ndarray, steps: int = 10) -> np.ndarray:
             interpolated.append(interp)
     return np.array(interpolated)
 
-def find_smallest_x(points: np.ndarray) -> float:
-    return np.min(points[:, 0])
-
-def calculate_point_z(x, z_min, angle_rad, x_smallest) -> float:
-    return z_min + np.tan(angle_rad) * (x - x_smallest)
-
-def adjust_z(points: np.ndarray, z_min, angle_rad, x_smallest) -> np.ndarray:
-    result = []
-    for pt in points:
-        x, y = pt
-        z = calculate_point_z(x, z_min, angle_rad, x_smallest)
-        result.append([x, y, z])
-    return np.array(result)
+def calculate_point_z(x, z_min, angle_rad, x_smallest, direction=1):
+    # direction -1 slopes up towards smaller x, from the x_smallest reference (then the largest x)
+    return z_min + np.tan(angle_rad) * direction * (x - x_smallest)
 
 def create_shrunk_polygon(polygon: Polygon, offset: float) -> Polygon:
     """
@@ -48,17 +45,23 @@ def create_shrunk_polygon(polygon: Polygon, offset: float) -> Polygon:
         raise ValueError("Shrink offset too large, polygon vanished.")
     return shrunk
 
-def ensure_single_outer_polygon(geom) -> Polygon:
-    if isinstance(geom, MultiPolygon):
-        return max(geom.geoms, key=lambda p: p.area)
-    return geom
-
-def make_tented_solid(shapely_poly: Polygon,
-                      apply_hollow_removal: bool,
-                      hollow_offset: float,
-                      slope_angle_deg: float,
-                      z_min: float,
-                      global_x_smallest: float) -> trimesh.Trimesh:
+def union_outlines(polygons) -> list:
+    """
+    Merge overlapping outlines in 2D. Solids that share the slope plane can be
+    fused this way before extrusion, with no 3D boolean needed.
+    """
+    merged = unary_union(polygons)
+    if isinstance(merged, MultiPolygon):
+        return list(merged.geoms)
+    return [merged]
+
+def triangulate_tented_outline(shapely_poly: Polygon,
+                               apply_hollow_removal: bool,
+                               hollow_offset: float):
+    """
+    2D vertices and (validated) solid faces of a tented outline. They do not
+    depend on the slope, so one triangulation serves every angle.
+    """
     # Interpolate boundary for smooth edge
     outer_boundary = interpolate_edges(polygon_to_numpy(shapely_poly), 50)
 
@@ -78,114 +81,250 @@ def make_tented_solid(shapely_poly: Polygon,
     # ---- CONSTRAINED TRIANGULATION ----
     vertices_2d, faces_2d = triangulate_polygon(final_polygon)
 
-    # Bottom (flat)
-    vertices_bottom = add_height(vertices_2d, 0.0)
-
-    # Top (sloped) — use global X reference
-    vertices_top = adjust_z(
-        vertices_2d,
-        z_min,
-        np.deg2rad(slope_angle_deg),
-        global_x_smallest
-    )
+    # Bottom cap, reversed top cap and side walls (outer and inner boundary)
+    outer_indices = boundary_loop_indices(vertices_2d, outer_boundary)
+    inner_indices = [boundary_loop_indices(vertices_2d, hole) for hole in holes]
+    return vertices_2d, solid_faces(vertices_2d, faces_2d, outer_indices, inner_indices)
 
-    # Combine
-    vertices = np.vstack((vertices_bottom, vertices_top))
-    offset = len(vertices_bottom)
+def load_largest_polygon(dxf_path: str) -> Polygon:
+    # Largest polygon, parsed once and then read back from the outline cache
+    return load_polygons(dxf_path)[0]
 
-    # Build faces
-    final_faces = []
-
-    # Bottom cap
-    for f in faces_2d:
-        final_faces.append(f.tolist())
-
-    # Top cap (reverse winding)
-    for f in faces_2d:
-        final_faces.append([i + offset for i in f[::-1]])
-
-    # Side walls (outer boundary)
-    tree = cKDTree(vertices_2d)
-    boundary_indices = [tree.query(p)[1] for p in outer_boundary]
+class TentingGenerator:
+    """
+    Tenting system (keyboard base, plus the palm rest when given) for any slope.
 
-    for i in range(len(boundary_indices)):
-        a = boundary_indices[i]
-        b = boundary_indices[(i + 1) % len(boundary_indices)]
-        final_faces.append([a, b, a + offset])
-        final_faces.append([b, b + offset, a + offset])
+    The outlines are hollowed and triangulated once; every angle variant only
+    re-evaluates the top Z array, so N angles cost about N exports.
 
-    # Side walls (inner boundary)
-    if holes:
-        inner_indices = [tree.query(p)[1] for p in holes[0]]
+    Both solids share the same slope plane, so with merge_outlines the palm
+    rest and keyboard outlines are unioned in 2D and extruded as one shell.
+    Otherwise they are kept as separate, overlapping solids.
 
-        for i in range(len(inner_indices)):
-            a = inner_indices[i]
-            b = inner_indices[(i + 1) % len(inner_indices)]
-            final_faces.append([a, a + offset, b])
-            final_faces.append([b, a + offset, b + offset])
+    slope_direction 1 raises the base towards larger x (left half), -1
+    towards smaller x (right half), so both halves rise towards the middle.
+    """
 
-    # Final mesh
-    mesh = trimesh.Trimesh(vertices=vertices, faces=final_faces, process=False)
+    def __init__(self,
+                 keyboard_poly: Polygon,
+                 palm_poly: Polygon = None,
+                 apply_hollow_removal: bool = True,
+                 hollow_offset: float = 10.0,
+                 merge_outlines: bool = True,
+                 slope_direction: int = 1):
+        # Compute global X reference from the widest polygon, on the low side of the slope
+        keyboard_x = polygon_to_numpy(keyboard_poly)[:, 0]
+        self.slope_direction = slope_direction
+        self.global_x_smallest = np.min(keyboard_x) if slope_direction > 0 else np.max(keyboard_x)
+
+        polygons = [keyboard_poly] if palm_poly is None else [keyboard_poly, palm_poly]
+        if merge_outlines and len(polygons) > 1:
+            polygons = union_outlines(polygons)
+        self.parts = [
+            triangulate_tented_outline(polygon, apply_hollow_removal, hollow_offset)
+            for polygon in polygons
+        ]
+
+        # Merge tented solids (allow overlapping volumes); each part has a bottom and a top copy
+        offsets = np.cumsum([0] + [2 * len(vertices_2d) for vertices_2d, _ in self.parts[:-1]])
+        self.faces = np.concatenate([faces + offset for (_, faces), offset in zip(self.parts, offsets)])
+
+    def solid_parts(self, slope_angle_deg: float = 6.5, z_min: float = 3.0) -> list:
+        """
+        (vertices, faces) of each separate solid at the given slope.
+        """
+        angle_rad = np.deg2rad(slope_angle_deg)
+        return [
+            (solid_vertices(vertices_2d, calculate_point_z(
+                vertices_2d[:, 0], z_min, angle_rad, self.global_x_smallest, self.slope_direction)),
+             faces)
+            for vertices_2d, faces in self.parts
+        ]
+
+    def solid(self, slope_angle_deg: float = 6.5, z_min: float = 3.0):
+        """
+        Vertex and face arrays of the tenting system at the given slope.
+        """
+        parts = self.solid_parts(slope_angle_deg, z_min)
+        return np.concatenate([vertices for vertices, _ in parts]), self.faces
+
+    def export_angles(self, angles, output_dir: str, z_min: float = 3.0,
+                      prefix: str = 'tenting_system', workers: int = None, union: str = '2d') -> list:
+        """
+        Write one STL per slope angle, in parallel, joined as joined_solid
+        does for union. z_min is the height of the low end, as in solid().
+        Returns the written paths.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        def export(angle):
+            path = os.path.join(output_dir, f'{prefix}_{angle:g}deg.stl')
+            write_binary_stl(path, *joined_solid(self, union, angle, z_min))
+            return path
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(export, angles))
+
+def joined_solid(generator: TentingGenerator, union: str, slope_angle_deg: float, z_min: float):
+    """
+    Vertex and face arrays of the tenting system, with the separate solids
+    fused by manifold3d when union is 'manifold'. Each solid is hollowed
+    before that union, so the result is not the 2d union's solid: the
+    overlap keeps the walls of both parts.
+    """
+    if union == 'manifold' and len(generator.parts) > 1:
+        vertices, faces, report = manifold_union(generator.solid_parts(slope_angle_deg, z_min))
+        print(f"Manifold union: {report['triangles_before']} -> {report['triangles_after']} triangles "
+              f"in {report['seconds']:.2f}s")
+        return vertices, faces
+    return generator.solid(slope_angle_deg, z_min)
+
+def generate_tenting_system(keyboard_poly: Polygon,
+                            palm_poly: Polygon = None,
+                            apply_hollow_removal: bool = True,
+                            hollow_offset: float = 10.0,
+                            slope_angle_deg: float = 6.5,
+                            z_min: float = 3.0,
+                            union: str = '2d',
+                            slope_direction: int = 1):
+    """
+    Vertex and face arrays of the tented keyboard base, plus the palm rest
+    one when palm_poly is given. Top-level so it can run in a worker process.
+    """
+    generator = TentingGenerator(keyboard_poly, palm_poly, apply_hollow_removal, hollow_offset,
+                                 merge_outlines=union == '2d', slope_direction=slope_direction)
+    return joined_solid(generator, union, slope_angle_deg, z_min)
 
-    # Ensure correct orientation for slicing
-    mesh.fix_normals()
-    mesh.fill_holes()
+def tenting_mesh(vertices: np.ndarray, faces: np.ndarray) -> trimesh.Trimesh:
+    """
+    Process the arrays with trimesh (validation mode). Orientation and
+    watertightness are guaranteed by build_solid, so nothing is repaired here.
+    """
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=True)
 
+    # Add color (red for tenting system)
+    mesh.visual.vertex_colors = np.tile(
+        [200, 60, 60, 255], (len(mesh.vertices), 1)
+    )
     return mesh
 
+def export_tenting_system(path: str, vertices: np.ndarray, faces: np.ndarray, validate: bool = False) -> None:
+    if validate:
+        mesh = tenting_mesh(vertices, faces)
+        print(f"Watertight: {mesh.is_watertight}, winding consistent: {mesh.is_winding_consistent}")
+        mesh.export(path)
+    else:
+        write_binary_stl(path, vertices, faces)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create the tenting system STL from the ergogen outlines')
+    parser.add_argument(
+        '--validate',
+        action='store_true',
+        help='Process the mesh with trimesh and report watertightness before exporting'
+    )
+    parser.add_argument(
+        '--angles',
+        type=float,
+        nargs='+',
+        help='Also write one tenting_system_<angle>deg.stl per slope angle (e.g. --angles 10 15 30)'
+    )
+    parser.add_argument(
+        '--wedges',
+        type=float,
+        nargs='+',
+        help='Also write thin stackable wedges with these angles (e.g. --wedges 0.5 1)'
+    )
+    parser.add_argument(
+        '--wedge-thickness',
+        type=float,
+        default=1.0,
+        help='Thickness of the thin end of the stackable wedges in mm (default: 1.0)'
+    )
+    parser.add_argument(
+        '--union',
+        choices=['2d', 'manifold', 'none'],
+        default='2d',
+        help='How to join the palm rest and keyboard solids: union the outlines before extrusion and hollow the '
+             'union (2d, default), fuse the solids with manifold3d (manifold) or keep them overlapping (none). '
+             'manifold fuses solids that are each hollowed on their own, so where they overlap the walls of one '
+             'fill the hollow of the other: a different, heavier solid than 2d. It is also much slower '
+             '(about 25s and 3x the triangles on the real outlines)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of parallel exports for --angles/--wedges'
+    )
+    args = parser.parse_args()
+
     # ===== PARAMETERS =====
     APPLY_HOLLOW_REMOVAL = True
-    INCLUDE_PALM_REST = False
+    INCLUDE_PALM_REST = False # joined as set by --union
     HOLLOW_OFFSET = 10.0  # wall thickness
     SLOPE_ANGLE_DEG = 6.5
     Z_MIN = 3.0 # min height
     # ======================
 
+    outlines_dir = './ergogen/output/outlines'
+
     # Load keyboard base polygon
-    dxf_path = './ergogen/output/outlines/l_tenting_base_bottom_outline.dxf'
-    entities = trimesh.load(dxf_path, force='2D')
-    keyboard_poly = max(entities.polygons_full, key=lambda p: p.area)
+    keyboard_poly = load_largest_polygon(f'{outlines_dir}/l_tenting_base_bottom_outline.dxf')
 
-    # Compute global X reference from the widest polygon
-    keyboard_boundary = polygon_to_numpy(keyboard_poly)
-    global_x_smallest = find_smallest_x(keyboard_boundary)
+    palm_poly = None
+    if INCLUDE_PALM_REST:
+        palm_poly = load_largest_polygon(f"{outlines_dir}/l_hand_rest_polygon.dxf")
 
-    keyboard_mesh = make_tented_solid(
-        shapely_poly=keyboard_poly,
+    generator = TentingGenerator(
+        keyboard_poly,
+        palm_poly=palm_poly,
         apply_hollow_removal=APPLY_HOLLOW_REMOVAL,
         hollow_offset=HOLLOW_OFFSET,
-        slope_angle_deg=SLOPE_ANGLE_DEG,
-        z_min=Z_MIN,
-        global_x_smallest=global_x_smallest
+        merge_outlines=args.union == '2d'
     )
 
-    final_mesh = keyboard_mesh
-
-    # Optionally include palm rest as a separate tented solid
+    right_dxfs = [f'{outlines_dir}/r_tenting_base_bottom_outline.dxf']
     if INCLUDE_PALM_REST:
-        palm_rest_path = "./ergogen/output/outlines/l_hand_rest_polygon.dxf"
-        palm_entities = trimesh.load(palm_rest_path, force='2D')
-        palm_poly = max(palm_entities.polygons_full, key=lambda p: p.area)
-
-        palm_mesh = make_tented_solid(
-            shapely_poly=palm_poly,
-            apply_hollow_removal=APPLY_HOLLOW_REMOVAL,
-            hollow_offset=HOLLOW_OFFSET,
-            slope_angle_deg=SLOPE_ANGLE_DEG,
-            z_min=Z_MIN,
-            global_x_smallest=global_x_smallest
+        right_dxfs.append(f'{outlines_dir}/r_hand_rest_polygon.dxf')
+
+    if all(os.path.exists(path) for path in right_dxfs):
+        right_polys = [load_largest_polygon(path) for path in right_dxfs]
+        left, right, mirrored = build_both_halves(
+            unary_union([keyboard_poly] if palm_poly is None else [keyboard_poly, palm_poly]),
+            unary_union(right_polys),
+            lambda: joined_solid(generator, args.union, SLOPE_ANGLE_DEG, Z_MIN),
+            partial(
+                generate_tenting_system,
+                right_polys[0],
+                right_polys[1] if INCLUDE_PALM_REST else None,
+                APPLY_HOLLOW_REMOVAL,
+                HOLLOW_OFFSET,
+                SLOPE_ANGLE_DEG,
+                Z_MIN,
+                union=args.union,
+                slope_direction=-1
+            )
         )
+        export_tenting_system("./filtered-output/cases/tenting_system_right.stl", *right, validate=args.validate)
+        print(f"Right tenting system STL file saved as 'tenting_system_right.stl' "
+              f"({'mirrored from the left one' if mirrored else 'generated from its own outlines'})")
+    else:
+        left = joined_solid(generator, args.union, SLOPE_ANGLE_DEG, Z_MIN)
 
-        # Merge tented solids (allow overlapping volumes)
-        final_mesh = trimesh.util.concatenate(
-            [keyboard_mesh, palm_mesh]
-        )
-    
-    # Add color (red for tenting system)
-    final_mesh.visual.vertex_colors = np.tile(
-        [200, 60, 60, 255], (len(final_mesh.vertices), 1)
-    )
-    
-    final_mesh.export("./filtered-output/cases/tenting_system.stl")
+    export_tenting_system("./filtered-output/cases/tenting_system.stl", *left, validate=args.validate)
     print("Tenting system STL file saved as 'tenting_system.stl'")
+
+    if args.angles:
+        paths = generator.export_angles(
+            args.angles, "./filtered-output/cases", z_min=Z_MIN, workers=args.workers, union=args.union
+        )
+        print(f"Saved {len(paths)} tenting angle variants: {', '.join(os.path.basename(p) for p in paths)}")
+
+    if args.wedges:
+        # Wedges are the same base at a small slope, with their thin end as the low end height
+        paths = generator.export_angles(
+            args.wedges, "./filtered-output/cases", z_min=args.wedge_thickness, prefix='tenting_wedge',
+            workers=args.workers, union=args.union
+        )
+        print(f"Saved {len(paths)} stackable wedges: {', '.join(os.path.basename(p) for p in paths)}")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Fast reader for the DXF outlines ergogen writes.
+
+ergogen only emits LINE, ARC and CIRCLE entities (LWPOLYLINE with bulges is
+read as well), so the group codes are read directly instead of building a
+general trimesh Path2D. Arcs are tessellated to a chord tolerance, the loose
+segments are chained into closed rings and the rings are nested into
+polygons with holes.
+
+Usage (benchmark against trimesh.load(..., force='2D')):
+    python3 palmrest_and_tenting_creation/dxf_outline.py ./filtered-output/pcbs/outlines
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from shapely.geometry import Polygon
+
+# Max distance (mm) between a tessellated arc and the true arc
+CHORD_TOLERANCE = 0.01
+
+# Segment ends closer than this (mm) are the same point, ergogen arc ends can be ~1.5e-3 off
+MERGE_TOLERANCE = 0.01
+
+
+def read_entities(path: str) -> list:
+    """
+    (type, [(group code, value), ...]) of every entity in the ENTITIES section.
+    """
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+
+    entities = []
+    in_entities = False
+    current = None
+    for code, value in zip(lines[0::2], lines[1::2]):
+        if code == '0':
+            if current is not None:
+                entities.append(current)
+                current = None
+            if value == 'ENDSEC':
+                in_entities = False
+            elif in_entities:
+                current = (value, [])
+        elif code == '2' and value == 'ENTITIES':
+            in_entities = True
+        elif current is not None:
+            current[1].append((code, value))
+    return entities
+
+
+def arc_points(center, radius: float, start: float, sweep: float, tolerance: float = CHORD_TOLERANCE) -> np.ndarray:
+    """
+    Points along an arc (angles in radians, sweep signed, counter-clockwise
+    when positive), spaced so no chord strays more than tolerance from the arc.
+    """
+    step = 2 * np.arccos(max(1 - tolerance / radius, -1.0))
+    count = max(int(np.ceil(abs(sweep) / step)), 1)
+    t = start + np.linspace(0, sweep, count + 1)
+    return np.column_stack((center[0] + radius * np.cos(t), center[1] + radius * np.sin(t)))
+
+
+def bulge_points(p0: np.ndarray, p1: np.ndarray, bulge: float, tolerance: float = CHORD_TOLERANCE) -> np.ndarray:
+    """
+    Points of an LWPOLYLINE segment; bulge is tan(included angle / 4),
+    positive for counter-clockwise arcs.
+    """
+    if bulge == 0:
+        return np.array([p0, p1])
+    chord = p1 - p0
+    half = np.linalg.norm(chord) / 2
+    sagitta = bulge * half
+    radius = (half ** 2 + sagitta ** 2) / (2 * sagitta)
+    left = np.array([-chord[1], chord[0]]) / (2 * half)
+    center = (p0 + p1) / 2 + left * (radius - sagitta)
+    start = np.arctan2(p0[1] - center[1], p0[0] - center[0])
+    points = arc_points(center, abs(radius), start, 4 * np.arctan(bulge), tolerance)
+    points[[0, -1]] = p0, p1
+    return points
+
+
+def entity_pieces(kind: str, pairs: list, tolerance: float = CHORD_TOLERANCE):
+    """
+    (open pieces, closed rings) of one entity as point arrays.
+    """
+    def values(code):
+        return [float(value) for pair_code, value in pairs if pair_code == code]
+
+    if kind == 'LINE':
+        return [np.array([[values('10')[0], values('20')[0]], [values('11')[0], values('21')[0]]])], []
+
+    if kind == 'ARC':
+        start, end = np.deg2rad(values('50')[0]), np.deg2rad(values('51')[0])
+        sweep = (end - start) % (2 * np.pi) or 2 * np.pi
+        center = (values('10')[0], values('20')[0])
+        return [arc_points(center, values('40')[0], start, sweep, tolerance)], []
+
+    if kind == 'CIRCLE':
+        ring = arc_points((values('10')[0], values('20')[0]), values('40')[0], 0.0, 2 * np.pi, tolerance)
+        ring[-1] = ring[0]
+        return [], [ring]
+
+    if kind == 'LWPOLYLINE':
+        vertices = np.column_stack((values('10'), values('20')))
+        # A bulge (42) follows the 10/20 pair of its vertex and is only written when not zero
+        bulges = np.zeros(len(vertices))
+        vertex = -1
+        for code, value in pairs:
+            if code == '10':
+                vertex += 1
+            elif code == '42':
+                bulges[vertex] = float(value)
+        closed = int(values('70')[0]) & 1 if values('70') else 0
+        count = len(vertices) if closed else len(vertices) - 1
+        pieces = [
+            bulge_points(vertices[i], vertices[(i + 1) % len(vertices)], bulges[i], tolerance)
+            for i in range(count)
+        ]
+        polyline = np.concatenate([pieces[0]] + [piece[1:] for piece in pieces[1:]])
+        if closed:
+            polyline[-1] = polyline[0]
+            return [], [polyline]
+        return [polyline], []
+
+    # ergogen writes nothing else, other entities are not part of an outline
+    return [], []
+
+
+def chain_rings(pieces: list, merge_tolerance: float = MERGE_TOLERANCE) -> list:
+    """
+    Join open pieces end to end into closed rings. Pieces that never close
+    a loop are dropped.
+    """
+    if not pieces:
+        return []
+
+    # Cluster the piece ends, every end gets the id of the point it sits on
+    ends = np.array([[piece[0], piece[-1]] for piece in pieces]).reshape(-1, 2)
+    pairs = cKDTree(ends).query_pairs(merge_tolerance, output_type='ndarray')
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(ends), len(ends)))
+    _, node = connected_components(graph, directed=False)
+    node = node.reshape(-1, 2)
+
+    at_node = {}
+    for index, (start, end) in enumerate(node):
+        at_node.setdefault(start, []).append(index)
+        at_node.setdefault(end, []).append(index)
+
+    used = np.zeros(len(pieces), dtype=bool)
+    rings = []
+    for first in range(len(pieces)):
+        if used[first]:
+            continue
+        used[first] = True
+        start, current = node[first]
+        chain = [pieces[first]]
+        while current != start:
+            following = [index for index in at_node[current] if not used[index]]
+            if not following:
+                break
+            index = following[0]
+            used[index] = True
+            if node[index][0] == current:
+                chain.append(pieces[index][1:])
+                current = node[index][1]
+            else:
+                chain.append(pieces[index][::-1][1:])
+                current = node[index][0]
+        if current == start:
+            ring = np.concatenate(chain)
+            ring[-1] = ring[0]
+            if len(ring) > 3:
+                rings.append(ring)
+    return rings
+
+
+def read_rings(path: str, tolerance: float = CHORD_TOLERANCE) -> list:
+    """
+    Closed rings of a DXF file as (n, 2) arrays, first point repeated at the end.
+    """
+    pieces, rings = [], []
+    for kind, pairs in read_entities(path):
+        entity_open, entity_closed = entity_pieces(kind, pairs, tolerance)
+        pieces += entity_open
+        rings += entity_closed
+    return rings + chain_rings(pieces)
+
+
+def nest_rings(rings: list) -> list:
+    """
+    Polygons with holes from closed rings, largest first. A ring inside an
+    odd number of other rings is a hole of the smallest outer ring around
+    it. Hole rings with no outer ring around them (only possible with
+    overlapping rings) are skipped with a warning.
+    """
+    if not rings:
+        return []
+    shells = [Polygon(ring) for ring in rings]
+    areas = shapely.area(shells)
+    first_points = np.array([ring[0] for ring in rings])
+
+    # inside[i, j]: ring i lies inside ring j
+    inside = np.column_stack([shapely.contains_xy(shell, first_points[:, 0], first_points[:, 1]) for shell in shells])
+    np.fill_diagonal(inside, False)
+    depth = inside.sum(axis=1)
+
+    holes = {i: [] for i in np.flatnonzero(depth % 2 == 0)}
+    for i in np.flatnonzero(depth % 2 == 1):
+        parents = np.flatnonzero(inside[i] & (depth % 2 == 0))
+        if not len(parents):
+            print(f"  Warning: hole ring at {tuple(first_points[i])} is not inside an outer ring, skipping")
+            continue
+        holes[parents[np.argmin(areas[parents])]].append(rings[i])
+
+    polygons = [Polygon(rings[i], hole_rings) for i, hole_rings in holes.items()]
+    return sorted(polygons, key=lambda p: p.area, reverse=True)
+
+
+def read_polygons(path: str, tolerance: float = CHORD_TOLERANCE) -> list:
+    """
+    Closed polygons (with holes) of an ergogen DXF file, largest first.
+    """
+    return nest_rings(read_rings(path, tolerance))
+
+
+def benchmark(outlines_dir: str, tolerance: float = CHORD_TOLERANCE) -> None:
+    import trimesh
+
+    total_fast = total_trimesh = 0.0
+    for path in sorted(glob.glob(os.path.join(outlines_dir, '*.dxf'))):
+        start_time = time.perf_counter()
+        polygons = read_polygons(path, tolerance)
+        fast = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        reference = sorted(trimesh.load(path, force='2D').polygons_full, key=lambda p: p.area, reverse=True)
+        slow = time.perf_counter() - start_time
+
+        total_fast += fast
+        total_trimesh += slow
+        # Compare each polygon with the reference one whose centroid is closest
+        centroids = shapely.centroid(reference)
+        deviation = max(
+            (polygon.hausdorff_distance(reference[np.argmin(shapely.distance(polygon.centroid, centroids))])
+             for polygon in polygons),
+            default=0.0
+        )
+        print(f"  {os.path.basename(path)}: {len(polygons)}/{len(reference)} polygons, "
+              f"max deviation {deviation:.4f} mm, {fast * 1000:.1f} ms vs {slow * 1000:.1f} ms")
+    print(f"Total: {total_fast:.3f}s vs {total_trimesh:.3f}s with trimesh "
+          f"({total_trimesh / total_fast:.1f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the DXF outline reader against trimesh')
+    parser.add_argument(
+        'outlines_dir',
+        nargs='?',
+        default='./filtered-output/pcbs/outlines',
+        help='Directory with DXF outlines (default: ./filtered-output/pcbs/outlines)'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=CHORD_TOLERANCE,
+        help=f'Arc chord tolerance in mm (default: {CHORD_TOLERANCE})'
+    )
+    args = parser.parse_args()
+    benchmark(args.outlines_dir, args.tolerance)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+
+from solid_builder import validate_solid
+
+
+def compact_mesh(vertices: np.ndarray, faces: np.ndarray):
+    """
+    Drop the vertices no face references and renumber the faces.
+    """
+    used, faces = np.unique(faces, return_inverse=True)
+    return vertices[used], faces.reshape(-1, 3)
+
+
+def manifold_union(parts):
+    """
+    Fuse overlapping solids into a single watertight shell with manifold3d.
+
+    parts is a list of (vertices, faces) pairs, each one a closed solid.
+    Returns (vertices, faces, report) where report holds the triangle counts
+    before and after the union and the time it took.
+    """
+    try:
+        import manifold3d
+    except ImportError as e:
+        raise ImportError("The manifold union needs manifold3d, install it with 'uv pip install manifold3d'.") from e
+
+    start_time = time.perf_counter()
+
+    # Double precision meshes when this manifold3d version has them
+    if hasattr(manifold3d, 'Mesh64'):
+        mesh_type, float_type, index_type = manifold3d.Mesh64, np.float64, np.uint64
+    else:
+        mesh_type, float_type, index_type = manifold3d.Mesh, np.float32, np.uint32
+
+    solids = []
+    for vertices, faces in parts:
+        vertices, faces = compact_mesh(vertices, faces)
+        mesh = mesh_type(
+            vert_properties=np.ascontiguousarray(vertices, dtype=float_type),
+            tri_verts=np.ascontiguousarray(faces, dtype=index_type),
+        )
+        solids.append(manifold3d.Manifold(mesh))
+
+    result = manifold3d.Manifold.batch_boolean(solids, manifold3d.OpType.Add)
+    if result.status() != manifold3d.Error.NoError:
+        raise ValueError(f"Manifold union failed: {result.status()}")
+
+    mesh = result.to_mesh64() if mesh_type is not manifold3d.Mesh else result.to_mesh()
+    vertices = np.asarray(mesh.vert_properties[:, :3], dtype=np.float64)
+    faces = np.asarray(mesh.tri_verts, dtype=np.int64)
+    validate_solid(faces)
+
+    report = {
+        'triangles_before': int(sum(len(faces) for _, faces in parts)),
+        'triangles_after': len(faces),
+        'seconds': time.perf_counter() - start_time,
+    }
+    return vertices, faces, report
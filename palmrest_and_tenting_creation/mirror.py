@@ -0,0 +1,53 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from shapely.affinity import scale, translate
+from shapely.geometry import Polygon
+
+# Max Hausdorff distance (mm) for the right outline to count as the mirrored left one
+MIRROR_TOLERANCE = 0.05
+
+
+def mirror_offset(left: Polygon, right: Polygon, tolerance: float = MIRROR_TOLERANCE):
+    """
+    Translation (dx, dy) that places the left outline, reflected across x = 0,
+    onto the right outline. None when the right outline is not a mirror image
+    of the left one within tolerance.
+    """
+    reflected = scale(left, xfact=-1, yfact=1, origin=(0, 0))
+    dx = right.bounds[0] - reflected.bounds[0]
+    dy = right.bounds[1] - reflected.bounds[1]
+    if translate(reflected, dx, dy).hausdorff_distance(right) > tolerance:
+        return None
+    return dx, dy
+
+
+def mirror_solid(vertices: np.ndarray, faces: np.ndarray, offset):
+    """
+    Reflect a solid across x = 0 and move it by offset. The winding is reversed
+    so the normals still point outward.
+    """
+    mirrored = vertices * np.array([-1.0, 1.0, 1.0]) + np.array([offset[0], offset[1], 0.0])
+    return mirrored, faces[:, ::-1]
+
+
+def build_both_halves(left_outline: Polygon, right_outline: Polygon, build_left, build_right,
+                      tolerance: float = MIRROR_TOLERANCE):
+    """
+    Build the (vertices, faces) of both halves with as little work as possible.
+
+    build_left runs here. When the right outline mirrors the left one the
+    right half is the reflected left solid; otherwise build_right (a picklable
+    callable) runs in a second process at the same time as build_left.
+
+    Returns (left, right, mirrored).
+    """
+    offset = mirror_offset(left_outline, right_outline, tolerance)
+    if offset is not None:
+        left = build_left()
+        return left, mirror_solid(*left, offset), True
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        right_future = pool.submit(build_right)
+        left = build_left()
+        return left, right_future.result(), False
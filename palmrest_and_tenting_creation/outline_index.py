@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Spatial index over every ergogen outline for containment and clearance checks.
+
+All cached outlines of a directory go into one shapely STRtree, so questions
+like "which outlines contain this screw", "does the USB-C cutout clear the
+controller housing" or "how far is l_case_border from l_pcb_outline" are
+answered in batched queries instead of by eye in previews.
+
+Usage:
+    python3 palmrest_and_tenting_creation/outline_index.py                      # clearance report
+    python3 palmrest_and_tenting_creation/outline_index.py --max-distance 2 -o clearance.csv
+"""
+
+import argparse
+import csv
+import glob
+import os
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon
+
+from outline_store import OUTLINES_DIR, load_polygons
+
+REPORT_FIELDS = ['outline_a', 'outline_b', 'relation', 'distance', 'boundary_gap']
+
+
+class OutlineIndex:
+    """
+    STRtree over named outlines. A file with several polygons (e.g. the
+    screws) is one MultiPolygon. Query methods take arrays of points or
+    geometries and answer for all of them at once.
+    """
+
+    def __init__(self, outlines: dict):
+        self.names = np.array(list(outlines), dtype=object)
+        self.geometries = np.array(list(outlines.values()), dtype=object)
+        self.boundaries = shapely.boundary(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self.boundary_tree = shapely.STRtree(self.boundaries)
+
+    @classmethod
+    def from_dir(cls, outlines_dir: str = OUTLINES_DIR) -> "OutlineIndex":
+        outlines = {}
+        for path in sorted(glob.glob(os.path.join(outlines_dir, '*.dxf'))):
+            polygons = load_polygons(path)
+            if polygons:
+                outlines[os.path.splitext(os.path.basename(path))[0]] = (
+                    polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+                )
+        return cls(outlines)
+
+    def geometry(self, name: str):
+        return self.geometries[np.flatnonzero(self.names == name)[0]]
+
+    def _group(self, pairs: np.ndarray, count: int) -> list:
+        """Names per query from STRtree (query index, tree index) pairs."""
+        result = [[] for _ in range(count)]
+        for query, found in zip(*pairs):
+            result[query].append(self.names[found])
+        return result
+
+    def containing(self, points: np.ndarray) -> list:
+        """
+        Names of the outlines containing each of the (n, 2) points.
+        """
+        points = shapely.points(np.asarray(points, dtype=np.float64))
+        return self._group(self.tree.query(points, predicate='within'), len(points))
+
+    def contains(self, name: str, points: np.ndarray) -> np.ndarray:
+        """
+        Whether the outline contains each of the (n, 2) points.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        return shapely.contains_xy(self.geometry(name), points[:, 0], points[:, 1])
+
+    def intersecting(self, geometries) -> list:
+        """
+        Names of the outlines each geometry intersects.
+        """
+        geometries = np.asarray(geometries, dtype=object)
+        return self._group(self.tree.query(geometries, predicate='intersects'), len(geometries))
+
+    def distance(self, names_a, names_b, boundary: bool = False) -> np.ndarray:
+        """
+        Element-wise distance between the named outlines. With boundary=True
+        the distance between their outlines is measured even when one lies
+        inside the other (the clearance of a part inside its case).
+        """
+        index = {name: i for i, name in enumerate(self.names)}
+        a = np.array([index[name] for name in np.atleast_1d(names_a)])
+        b = np.array([index[name] for name in np.atleast_1d(names_b)])
+        geometries = self.boundaries if boundary else self.geometries
+        return shapely.distance(geometries[a], geometries[b])
+
+    def clearance_report(self, max_distance: float = None) -> list:
+        """
+        Relation, distance and boundary gap of every pair of outlines, closest
+        boundaries first. With max_distance only the pairs whose boundaries
+        come that close are reported.
+        """
+        if max_distance is None:
+            a, b = np.triu_indices(len(self.names), k=1)
+        else:
+            a, b = self.boundary_tree.query(self.boundaries, predicate='dwithin', distance=max_distance)
+            keep = a < b
+            a, b = a[keep], b[keep]
+
+        geometries_a, geometries_b = self.geometries[a], self.geometries[b]
+        relation = np.where(
+            shapely.contains(geometries_a, geometries_b), 'contains',
+            np.where(
+                shapely.within(geometries_a, geometries_b), 'within',
+                np.where(shapely.intersects(geometries_a, geometries_b), 'intersects', 'disjoint')
+            )
+        )
+        distance = shapely.distance(geometries_a, geometries_b)
+        gap = shapely.distance(self.boundaries[a], self.boundaries[b])
+
+        order = np.argsort(gap, kind='stable')
+        return [
+            {
+                'outline_a': self.names[a[i]],
+                'outline_b': self.names[b[i]],
+                'relation': str(relation[i]),
+                'distance': round(float(distance[i]), 4),
+                'boundary_gap': round(float(gap[i]), 4),
+            }
+            for i in order
+        ]
+
+
+def write_report(rows: list, path: str) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clearance report between every pair of ergogen outlines')
+    parser.add_argument(
+        '--outlines-dir', '-d',
+        default=OUTLINES_DIR,
+        help=f'Directory with the DXF outlines (default: {OUTLINES_DIR})'
+    )
+    parser.add_argument(
+        '--max-distance',
+        type=float,
+        default=None,
+        help='Only report pairs whose boundaries are closer than this (mm)'
+    )
+    parser.add_argument(
+        '--output', '-o',
+        help='Write the report to this CSV file instead of printing it'
+    )
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    index = OutlineIndex.from_dir(args.outlines_dir)
+    rows = index.clearance_report(args.max_distance)
+    runtime = time.perf_counter() - start_time
+
+    if args.output:
+        write_report(rows, args.output)
+        print(f"Clearance report saved to {args.output}")
+    else:
+        for row in rows:
+            print(f"  {row['outline_a']} / {row['outline_b']}: {row['relation']}, "
+                  f"distance {row['distance']:.3f}, boundary gap {row['boundary_gap']:.3f}")
+    print(f"{len(rows)} pairs of {len(index.names)} outlines in {runtime:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
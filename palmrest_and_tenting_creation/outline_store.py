@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Parsed ergogen outlines, cached next to the DXF files.
+
+Every DXF is parsed once into shapely polygons and saved as a compact .npz
+in a .outline_cache directory beside it, keyed by the file hash, the
+tessellation tolerance and CACHE_VERSION. Later loads (in this or any other process) only read
+the arrays back, so scripts start without parsing any DXF.
+
+Usage:
+    python3 palmrest_and_tenting_creation/outline_store.py            # warm the cache
+    python3 palmrest_and_tenting_creation/outline_store.py -d ./filtered-output/pcbs/outlines
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import time
+
+import numpy as np
+from shapely.geometry import Polygon
+
+from dxf_outline import CHORD_TOLERANCE, read_polygons
+
+OUTLINES_DIR = './ergogen/output/outlines'
+CACHE_DIR_NAME = '.outline_cache'
+
+# Bump when the parsing (dxf_outline) or the .npz layout changes, so older cache files are not read
+CACHE_VERSION = 2
+
+# Arc chord tolerance (mm) of the tessellated outlines
+DEFAULT_TOLERANCE = CHORD_TOLERANCE
+
+# Polygons already loaded in this process, keyed by (file hash, tolerance)
+_POLYGONS = {}
+
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def pack_polygons(polygons: list) -> dict:
+    """
+    Flatten polygons into arrays: all ring coordinates, where each ring
+    starts in them and where each polygon's rings start (exterior first).
+    """
+    rings = [
+        np.asarray(ring.coords, dtype=np.float64)[:, :2]
+        for polygon in polygons
+        for ring in [polygon.exterior, *polygon.interiors]
+    ]
+    ring_counts = [1 + len(polygon.interiors) for polygon in polygons]
+    return {
+        'coords': np.concatenate(rings) if rings else np.empty((0, 2)),
+        'ring_offsets': np.cumsum([0] + [len(ring) for ring in rings]),
+        'polygon_offsets': np.cumsum([0] + ring_counts),
+    }
+
+
+def unpack_polygons(coords: np.ndarray, ring_offsets: np.ndarray, polygon_offsets: np.ndarray) -> list:
+    rings = np.split(coords, ring_offsets[1:-1])
+    return [
+        Polygon(rings[start], rings[start + 1:end])
+        for start, end in zip(polygon_offsets[:-1], polygon_offsets[1:])
+    ]
+
+
+def cache_path(path: str, digest: str, tolerance: float) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(
+        os.path.dirname(path), CACHE_DIR_NAME, f'{stem}-{digest[:16]}-{tolerance:g}-v{CACHE_VERSION}.npz'
+    )
+
+
+def load_polygons(path: str, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """
+    Polygons of a DXF file, largest first. Parsed only when neither this
+    process nor the .npz cache has seen this exact file content before.
+    """
+    digest = file_hash(path)
+    key = (digest, tolerance)
+    if key in _POLYGONS:
+        return _POLYGONS[key]
+
+    npz_path = cache_path(path, digest, tolerance)
+    if os.path.exists(npz_path):
+        with np.load(npz_path) as data:
+            polygons = unpack_polygons(data['coords'], data['ring_offsets'], data['polygon_offsets'])
+    else:
+        polygons = read_polygons(path, tolerance)
+        os.makedirs(os.path.dirname(npz_path), exist_ok=True)
+        # Write then rename, so parallel builds never read a half written cache file
+        tmp_path = f'{npz_path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, **pack_polygons(polygons))
+        os.replace(tmp_path, npz_path)
+
+    _POLYGONS[key] = polygons
+    return polygons
+
+
+def outline_path(name: str, side: str = 'l', outlines_dir: str = OUTLINES_DIR) -> str:
+    """Path of an ergogen outline, e.g. ('hand_rest_polygon', 'r') -> .../r_hand_rest_polygon.dxf"""
+    if side not in ('l', 'r'):
+        raise ValueError(f"Side must be 'l' or 'r', got {side!r}.")
+    return os.path.join(outlines_dir, f'{side}_{name}.dxf')
+
+
+def get_outlines(name: str, side: str = 'l', tolerance: float = DEFAULT_TOLERANCE,
+                 outlines_dir: str = OUTLINES_DIR) -> list:
+    """
+    Every polygon of an ergogen outline, largest first.
+    """
+    return load_polygons(outline_path(name, side, outlines_dir), tolerance)
+
+
+def get_outline(name: str, side: str = 'l', tolerance: float = DEFAULT_TOLERANCE,
+                outlines_dir: str = OUTLINES_DIR) -> Polygon:
+    """
+    Largest polygon of an ergogen outline, e.g. get_outline('hand_rest_polygon', 'l').
+    """
+    polygons = get_outlines(name, side, tolerance, outlines_dir)
+    if not polygons:
+        raise ValueError(f"No closed outline in {outline_path(name, side, outlines_dir)}.")
+    return polygons[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse and cache every ergogen outline of a directory')
+    parser.add_argument(
+        '--outlines-dir', '-d',
+        default=OUTLINES_DIR,
+        help=f'Directory with the DXF outlines (default: {OUTLINES_DIR})'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='Tessellation tolerance in mm the outlines are cached for'
+    )
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.outlines_dir, '*.dxf')))
+    start_time = time.perf_counter()
+    for path in paths:
+        polygons = load_polygons(path, args.tolerance)
+        print(f"  {os.path.basename(path)}: {len(polygons)} polygons")
+    print(f"Loaded {len(paths)} outlines in {time.perf_counter() - start_time:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def boundary_loop_indices(vertices_2d: np.ndarray, loop_points: np.ndarray) -> np.ndarray:
+    """
+    Map the points of a boundary loop to their indices in vertices_2d.
+    All points are looked up in a single KD-tree query.
+    """
+    _, indices = cKDTree(vertices_2d).query(loop_points)
+    return np.asarray(indices, dtype=np.int64)
+
+
+def signed_area(points: np.ndarray) -> float:
+    """
+    Shoelace area of a closed 2D loop, positive when counter-clockwise.
+    """
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def orient_loop(vertices_2d: np.ndarray, loop: np.ndarray, ccw: bool) -> np.ndarray:
+    loop = np.asarray(loop, dtype=np.int64)
+    if (signed_area(vertices_2d[loop]) > 0) != ccw:
+        return loop[::-1]
+    return loop
+
+
+def orient_faces_ccw(vertices_2d: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """
+    Flip the 2D triangles that are wound clockwise.
+    """
+    faces = np.array(faces, dtype=np.int64)
+    a, b, c = (vertices_2d[faces[:, i]] for i in range(3))
+    cross = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    clockwise = cross < 0
+    faces[clockwise] = faces[clockwise][:, ::-1]
+    return faces
+
+
+def side_wall_faces(loop: np.ndarray, offset: int) -> np.ndarray:
+    """
+    Build the two triangles per boundary edge that join the bottom loop
+    (indices in loop) with its top copy (indices + offset).
+
+    The walls face right of the loop direction, so a counter-clockwise
+    outer loop and clockwise hole loops give outward normals.
+    """
+    a = np.asarray(loop, dtype=np.int64)
+    b = np.roll(a, -1)
+    first = np.column_stack((a, b, b + offset))
+    second = np.column_stack((a, b + offset, a + offset))
+    return np.concatenate((first, second))
+
+
+def validate_solid(faces: np.ndarray, expected_euler: int = None) -> None:
+    """
+    Check that a triangle mesh is a closed, consistently wound 2-manifold.
+
+    Every directed edge must appear exactly once and its reverse must appear
+    as well. When expected_euler is given, V - E + F must match it
+    (2 for a solid without holes, 0 for a solid with one hole, ...).
+    Raises ValueError describing the first problem found.
+    """
+    faces = np.asarray(faces, dtype=np.int64)
+    n = int(faces.max()) + 1
+    edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+
+    degenerate = edges[:, 0] == edges[:, 1]
+    if degenerate.any():
+        raise ValueError(f"Invalid solid: {int(degenerate.sum())} zero-length edges.")
+
+    keys = edges[:, 0] * n + edges[:, 1]
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    if (counts > 1).any():
+        raise ValueError(
+            f"Invalid solid: {int((counts > 1).sum())} edges are shared by faces with the same "
+            "winding (non-manifold or inconsistently oriented)."
+        )
+
+    reverse_keys = edges[:, 1] * n + edges[:, 0]
+    open_edges = ~np.isin(reverse_keys, unique_keys)
+    if open_edges.any():
+        raise ValueError(f"Invalid solid: {int(open_edges.sum())} open edges, the mesh is not watertight.")
+
+    if expected_euler is not None:
+        euler = len(np.unique(faces)) - len(unique_keys) // 2 + len(faces)
+        if euler != expected_euler:
+            raise ValueError(f"Invalid solid: Euler characteristic is {euler}, expected {expected_euler}.")
+
+
+def solid_faces(vertices_2d: np.ndarray,
+                cap_faces: np.ndarray,
+                outer_loop: np.ndarray,
+                hole_loops) -> np.ndarray:
+    """
+    Faces of a solid extruded from a 2D triangulation, with outward normals.
+
+    Vertex i of vertices_2d is vertex i of the bottom cap and vertex
+    i + len(vertices_2d) of the top cap (see solid_vertices). Caps are made
+    counter-clockwise, the outer loop counter-clockwise and the hole loops
+    clockwise before assembling, and the result is validated, so broken
+    input raises ValueError instead of being repaired.
+
+    The loops must follow edges of the cap triangulation; loop points the
+    caps do not use (e.g. collinear points dropped by earcut) are skipped.
+    """
+    vertices_2d = np.asarray(vertices_2d, dtype=np.float64)
+    n = len(vertices_2d)
+
+    # Point coincident vertices to a single index, so caps and loops agree
+    _, first, inverse = np.unique(vertices_2d, axis=0, return_index=True, return_inverse=True)
+    canonical = first[inverse.ravel()]
+    cap_faces = orient_faces_ccw(vertices_2d, canonical[np.asarray(cap_faces, dtype=np.int64)])
+
+    # Triangulators may drop collinear boundary points, walls only follow the vertices the caps use
+    used = np.zeros(n, dtype=bool)
+    used[cap_faces] = True
+
+    def cap_loop(loop, ccw):
+        loop = canonical[np.asarray(loop, dtype=np.int64)]
+        loop = loop[used[loop]]
+        loop = loop[loop != np.roll(loop, 1)]
+        return orient_loop(vertices_2d, loop, ccw)
+
+    outer_loop = cap_loop(outer_loop, ccw=True)
+    hole_loops = [cap_loop(hole, ccw=False) for hole in hole_loops]
+
+    faces = np.concatenate(
+        [cap_faces[:, ::-1], cap_faces + n, side_wall_faces(outer_loop, n)]
+        + [side_wall_faces(hole, n) for hole in hole_loops]
+    )
+
+    validate_solid(faces, expected_euler=2 - 2 * len(hole_loops))
+    return faces
+
+
+def solid_vertices(vertices_2d: np.ndarray, top_z: np.ndarray, bottom_z: float = 0.0) -> np.ndarray:
+    """
+    Bottom cap vertices at bottom_z followed by top cap vertices at top_z.
+    """
+    vertices_2d = np.asarray(vertices_2d, dtype=np.float64)
+    n = len(vertices_2d)
+    return np.concatenate((
+        np.column_stack((vertices_2d, np.full(n, bottom_z))),
+        np.column_stack((vertices_2d, np.broadcast_to(top_z, (n,)))),
+    ))
+
+
+def build_solid(vertices_2d: np.ndarray,
+                cap_faces: np.ndarray,
+                outer_loop: np.ndarray,
+                hole_loops,
+                top_z: np.ndarray,
+                bottom_z: float = 0.0):
+    """
+    Build the vertex and face arrays of a solid from a 2D triangulation.
+
+    The bottom cap sits at bottom_z, the top cap at top_z (one value per
+    2D vertex) and the side walls join both caps along the outer loop and
+    every hole loop. Loops are index arrays into vertices_2d. The top must
+    stay above the bottom for the normals to point outward.
+
+    Returns (vertices, faces) as numpy arrays.
+    """
+    faces = solid_faces(vertices_2d, cap_faces, outer_loop, hole_loops)
+    return solid_vertices(vertices_2d, top_z, bottom_z), faces
@@ -0,0 +1,33 @@
+import numpy as np
+
+# One binary STL facet: normal, 3 vertices and the attribute byte count (50 bytes)
+STL_FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attribute', '<u2'),
+])
+
+
+def face_normals(triangles: np.ndarray) -> np.ndarray:
+    """
+    Unit normals of an (n, 3, 3) triangle array. Degenerate faces get a zero normal.
+    """
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def write_binary_stl(path: str, vertices: np.ndarray, faces: np.ndarray, header: str = 'SweepyWay') -> None:
+    """
+    Write a binary STL straight from vertex and face arrays, without building a trimesh.
+    """
+    triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)]
+
+    facets = np.zeros(len(triangles), dtype=STL_FACET_DTYPE)
+    facets['normal'] = face_normals(triangles)
+    facets['vertices'] = triangles
+
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii')[:80].ljust(80, b'\0'))
+        f.write(np.array(len(facets), dtype='<u4').tobytes())
+        facets.tofile(f)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Generate palm rest or tenting variants for every combination of parameters.
+
+Each combination is written as its own STL and summarized in a CSV
+(volume, max height, triangle count, watertightness, runtime), so a set of
+angles or heights can be printed without editing the scripts by hand.
+
+Usage:
+    python3 palmrest_and_tenting_creation/sweep.py tenting --slope-angle 5 6.5 10 15
+    python3 palmrest_and_tenting_creation/sweep.py palmrest --z-max 8 10 12 --curve-strength 0.5 1 2
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import trimesh
+
+from create_palmrest import PalmRestGenerator
+from create_tenting_system import TentingGenerator, load_largest_polygon
+from stl_writer import write_binary_stl
+
+
+OUTLINES_DIR = './ergogen/output/outlines'
+PALM_REST_DXF = f'{OUTLINES_DIR}/l_hand_rest_polygon.dxf'
+TENTING_BASE_DXF = f'{OUTLINES_DIR}/l_tenting_base_bottom_outline.dxf'
+
+SUMMARY_FIELDS = ['file', 'volume', 'max_height', 'triangles', 'watertight', 'runtime_s']
+
+# Per-process state, loaded once by the pool initializer
+_worker = {}
+
+
+def _init_palmrest_worker():
+    _worker['palmrest'] = PalmRestGenerator.from_dxf(PALM_REST_DXF)
+
+
+def _init_tenting_worker(include_palm_rest: bool):
+    _worker['keyboard_poly'] = load_largest_polygon(TENTING_BASE_DXF)
+    _worker['palm_poly'] = load_largest_polygon(PALM_REST_DXF) if include_palm_rest else None
+    _worker['tenting'] = {}
+
+
+def variant_name(prefix: str, params: dict) -> str:
+    """File name of a variant, e.g. tenting_slope_angle_deg-6.5_z_min-3.0.stl"""
+    parts = [f'{key}-{value:g}' for key, value in params.items()]
+    return '_'.join([prefix] + parts) + '.stl'
+
+
+def summarize(vertices, faces, path: str, runtime: float) -> dict:
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    return {
+        'file': os.path.basename(path),
+        'volume': round(float(mesh.volume), 3),
+        'max_height': round(float(mesh.bounds[1][2]), 3),
+        'triangles': len(mesh.faces),
+        'watertight': bool(mesh.is_watertight),
+        'runtime_s': round(runtime, 4),
+    }
+
+
+def build_palmrest_variant(params: dict, output_dir: str) -> dict:
+    start_time = time.perf_counter()
+    path = os.path.join(output_dir, variant_name('palm_rest', params))
+    vertices, faces = _worker['palmrest'].solid(**params)
+    write_binary_stl(path, vertices, faces)
+    return summarize(vertices, faces, path, time.perf_counter() - start_time)
+
+
+def build_tenting_variant(params: dict, output_dir: str, apply_hollow_removal: bool) -> dict:
+    """
+    Write one tenting variant. Solid (not hollowed) variants have no
+    hollow_offset and are named tenting_system_solid_...
+    """
+    start_time = time.perf_counter()
+    prefix = 'tenting_system' if apply_hollow_removal else 'tenting_system_solid'
+    path = os.path.join(output_dir, variant_name(prefix, params))
+    # The triangulation only depends on the hollowing, reuse it across slopes and heights
+    hollow_offset = params.get('hollow_offset', 0.0)
+    key = (apply_hollow_removal, hollow_offset)
+    if key not in _worker['tenting']:
+        _worker['tenting'][key] = TentingGenerator(
+            _worker['keyboard_poly'],
+            palm_poly=_worker['palm_poly'],
+            apply_hollow_removal=apply_hollow_removal,
+            hollow_offset=hollow_offset
+        )
+    vertices, faces = _worker['tenting'][key].solid(params['slope_angle_deg'], params['z_min'])
+    write_binary_stl(path, vertices, faces)
+    return summarize(vertices, faces, path, time.perf_counter() - start_time)
+
+
+def parameter_grid(grid: dict) -> list:
+    """Every combination of the given parameter values, as a list of dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def run_sweep(build, initializer, initargs, combinations, output_dir, workers, extra_args=()) -> list:
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        futures = [pool.submit(build, params, output_dir, *extra_args) for params in combinations]
+        rows = []
+        for future in futures:
+            row = future.result()
+            print(f"  {row['file']}: {row['triangles']} triangles, "
+                  f"watertight={row['watertight']}, {row['runtime_s']:.2f}s")
+            rows.append(row)
+    return rows
+
+
+def write_summary(rows: list, output_dir: str) -> str:
+    summary_path = os.path.join(output_dir, 'summary.csv')
+    with open(summary_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return summary_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate palm rest or tenting variants over a parameter grid'
+    )
+    parser.add_argument(
+        '--output-dir', '-o',
+        default='./filtered-output/sweeps',
+        help='Directory for the STL files and summary.csv (default: ./filtered-output/sweeps)'
+    )
+    parser.add_argument(
+        '--workers', '-j',
+        type=int,
+        default=None,
+        help='Number of worker processes (default: one per CPU)'
+    )
+    subparsers = parser.add_subparsers(dest='part', required=True)
+
+    palmrest = subparsers.add_parser('palmrest', help='Sweep palm rest top surface parameters')
+    palmrest.add_argument('--z-max', type=float, nargs='+', default=[10.0])
+    palmrest.add_argument('--z-min', type=float, nargs='+', default=[3.0])
+    palmrest.add_argument('--curve-strength', type=float, nargs='+', default=[1.0])
+
+    tenting = subparsers.add_parser('tenting', help='Sweep tenting base parameters')
+    tenting.add_argument('--slope-angle', type=float, nargs='+', default=[6.5])
+    tenting.add_argument('--z-min', type=float, nargs='+', default=[3.0])
+    tenting.add_argument('--hollow-offset', type=float, nargs='+', default=[10.0])
+    tenting.add_argument('--no-hollow', action='store_true', help='Generate solid (not hollowed) bases')
+    tenting.add_argument('--include-palm-rest', action='store_true', help='Add the tented palm rest')
+
+    args = parser.parse_args()
+
+    if args.part == 'palmrest':
+        combinations = parameter_grid({
+            'z_max': args.z_max,
+            'z_min': args.z_min,
+            'curve_strength': args.curve_strength,
+        })
+        build, initializer, initargs, extra_args = (
+            build_palmrest_variant, _init_palmrest_worker, (), ()
+        )
+    else:
+        grid = {'slope_angle_deg': args.slope_angle, 'z_min': args.z_min}
+        # The hollow offset means nothing for solid bases, so it is neither swept nor in their names
+        if not args.no_hollow:
+            grid['hollow_offset'] = args.hollow_offset
+        combinations = parameter_grid(grid)
+        build, initializer, initargs, extra_args = (
+            build_tenting_variant, _init_tenting_worker, (args.include_palm_rest,), (not args.no_hollow,)
+        )
+
+    print(f'Generating {len(combinations)} {args.part} variants in {args.output_dir}...')
+    start_time = time.perf_counter()
+    rows = run_sweep(build, initializer, initargs, combinations, args.output_dir, args.workers, extra_args)
+    summary_path = write_summary(rows, args.output_dir)
+    print(f'Done in {time.perf_counter() - start_time:.2f}s. Summary saved to {summary_path}')
+
+
+if __name__ == '__main__':
+    main()
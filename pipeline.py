@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Build pipeline of the keyboard as a DAG of stages.
+
+Replaces the sequential loops of the justfile / build.sh: every step
+(ergogen, plate exports, DSN export, autorouting, SES import, board exports,
+3D previews, GLB fix, palm rest / tenting, scene merge) is a stage with its
+dependencies, and the stages of both boards run concurrently on a pool of
+workers. A stage starts as soon as the stages it needs are done, so the
+build takes as long as its critical path instead of the sum of all steps.
+
+Like build.sh, the *_manually_routed boards are kept across the ergogen
+run (which clears ergogen/output) and exported with boards.kibot.yaml.
+Every kibot stage writes into its own directory under .pipeline/staging,
+moved into place when the stage succeeds, so the kibot runs of different
+boards never write the same output directories at the same time.
+
+The output of every stage goes to .pipeline/logs/<stage>.log, the stage
+durations to .pipeline/timings.json (used by --dry-run to estimate the
+critical path before building).
+
+Stage outputs are cached by the hash of the stage inputs, command and tool
+image tags (see build_cache.py): a stage whose key was built before has its
+outputs restored instead of being run.
+
+With --kicad-workers, the kicad_auto steps (DSN export, SES import, kibot)
+are not run with a docker run each but sent to long-lived worker containers
+(kibot/kicad_worker.py) that keep pcbnew and kibot imported. The steps of a
+board always go to the same worker, so the DSN export and SES import find
+the board already loaded (kibot loads its board itself). A step running
+longer than --kicad-job-timeout is killed and fails.
+
+Usage:
+    uv run pipeline.py                      # everything, 4 stages at a time
+    uv run pipeline.py -j 8 scene           # the combined scene and what it needs
+    uv run pipeline.py --dry-run            # order, commands and estimated critical path
+    uv run pipeline.py --no-cache           # run every stage
+    uv run pipeline.py --kicad-workers 2    # one kicad_auto container per board for the whole build
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import networkx as nx
+
+from build_cache import BuildCache, output_hashes, stage_key
+
+BOARDS = ['left_pcb', 'right_pcb']
+PLATES = ['plate_left', 'plate_right']
+
+CONTAINER_CMD = 'docker'
+KICAD_AUTO_IMAGE = 'setsoft/kicad_auto:ki8'
+
+PCBS_DIR = 'ergogen/output/pcbs'
+STATE_DIR = '.pipeline'
+TIMINGS_FILE = os.path.join(STATE_DIR, 'timings.json')
+LOGS_DIR = os.path.join(STATE_DIR, 'logs')
+STAGING_DIR = os.path.join(STATE_DIR, 'staging')
+JOBS_DIR = os.path.join(STATE_DIR, 'jobs')
+
+# Seconds a KiCad worker job may run before the worker kills it
+KICAD_JOB_TIMEOUT = 1800
+# Extra seconds to wait for the result of a killed job before giving up on the worker
+RESULT_GRACE = 60
+
+
+class Stage:
+    """
+    One step of the build. command is an argument list run as a process.
+    inputs are files (or glob patterns) the stage reads: a stage whose plain
+    file inputs do not exist when it is due is skipped, like the
+    `if [ -e ... ]` checks of the shell scripts. outputs are the files and
+    directories it writes. job is the same step as a kicad_worker.py job,
+    for the stages a KiCad worker can run instead of the command. A stage
+    with a staging_dir writes there (as if it were the checkout) and its
+    files are moved into place once it succeeds.
+    """
+
+    def __init__(self, name, command, deps=(), inputs=(), outputs=(), job=None, staging_dir=None):
+        self.name = name
+        self.command = list(command)
+        self.job = job
+        self.staging_dir = staging_dir
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def missing_inputs(self):
+        return [path for path in self.inputs if not glob.has_magic(path) and not os.path.exists(path)]
+
+    def cache_key(self, produced=None):
+        """
+        Key of the stage in the build cache. produced ({path: hash}) holds the
+        outputs of earlier stages as they were when those stages finished.
+        """
+        # The checkout location and the interpreter path do not change what a stage builds
+        command = [
+            arg.replace(os.getcwd(), '.') if arg != sys.executable else 'python'
+            for arg in self.command
+        ]
+        return stage_key(self.name, command, self.inputs, known_hashes=produced)
+
+
+def container(image, *args, env=None, options=()):
+    """docker run of a tool image with the repository mounted on /board."""
+    command = [CONTAINER_CMD, 'run', '-w', '/board', '-v', f'{os.getcwd()}:/board', '--rm', *options]
+    for key, value in (env or {}).items():
+        command += ['-e', f'{key}={value}']
+    return command + [image, *args]
+
+
+ERGOGEN_SCRIPT = '; '.join([
+    'if ls ergogen/output/pcbs/*_manually_routed* >/dev/null 2>&1',
+    'then mkdir -p ergogen/tmp && mv ergogen/output/pcbs/*_manually_routed* ergogen/tmp',
+    'fi',
+    'npm run debug',
+    'status=$?',
+    'if ls ergogen/tmp/*_manually_routed* >/dev/null 2>&1',
+    'then mkdir -p ergogen/output/pcbs && mv ergogen/tmp/*_manually_routed* ergogen/output/pcbs && rm -r ergogen/tmp',
+    'fi',
+    'exit $status',
+])
+
+# Every kibot stage depends on all configs, they import each other
+KIBOT_CONFIGS = 'kibot/*.kibot.yaml'
+
+
+def kibot_stage(name, board_file, config, deps, outputs, inputs=(), env=None, targets=()):
+    """
+    A kibot run of all outputs of a config (or only the targets). kibot
+    writes into the stage's own staging directory (-d), so kibot runs of
+    different boards never write the same directories at the same time.
+    """
+    staging_dir = os.path.join(STAGING_DIR, name.replace(':', '_'))
+    config_file = f'kibot/{config}.kibot.yaml'
+    args = ['-b', board_file, '-c', config_file, '-d', staging_dir, *targets]
+    return Stage(
+        name, container(KICAD_AUTO_IMAGE, 'kibot', *args, env=env), deps,
+        inputs=[board_file, config_file, KIBOT_CONFIGS, *inputs], outputs=outputs,
+        job={'kind': 'kibot', 'args': args, 'env': env or {}}, staging_dir=staging_dir,
+    )
+
+
+def default_outputs(board_file):
+    """Files kibot/default.kibot.yaml writes for a board: gerbers, their zip and the top and bottom images."""
+    name = os.path.splitext(os.path.basename(board_file))[0]
+    return [
+        f'filtered-output/pcbs/gerbers/{name}',
+        f'filtered-output/pcbs/gerbers/{name}.zip',
+        f'filtered-output/pcbs/images/{name}-top.png',
+        f'filtered-output/pcbs/images/{name}-bottom.png',
+    ]
+
+
+# The outputs of kibot/3d_preview.kibot.yaml itself, without the ones it imports from default.kibot.yaml
+PREVIEW_TARGETS = ['3d_model_step', '3d_model_stl', '3d_model_glb', '3d_render_top', '3d_render_bottom']
+
+
+class KicadWorker:
+    """
+    A kicad_auto container running kibot/kicad_worker.py, fed through its
+    own directory under .pipeline/jobs. Jobs are killed after job_timeout
+    seconds.
+    """
+
+    def __init__(self, name, job_timeout=KICAD_JOB_TIMEOUT):
+        self.name = name
+        self.jobs_dir = os.path.join(JOBS_DIR, name)
+        self.job_timeout = job_timeout
+        self.process = None
+
+    def start(self):
+        shutil.rmtree(self.jobs_dir, ignore_errors=True)
+        os.makedirs(self.jobs_dir)
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        command = container(
+            KICAD_AUTO_IMAGE, 'python3', 'kibot/kicad_worker.py', self.jobs_dir, options=['--name', self.container_name]
+        )
+        with open(os.path.join(LOGS_DIR, f'{self.name}.log'), 'w') as log:
+            self.process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    @property
+    def container_name(self):
+        return f'pipeline-{os.getpid()}-{self.name}'
+
+    def put(self, job):
+        """Write a job file. Returns the job id."""
+        job_id = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+        path = os.path.join(self.jobs_dir, f'{job_id}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(job, f)
+        os.replace(f'{path}.tmp', path)
+        return job_id
+
+    def run(self, job, log_path):
+        """
+        Run a job, its output going to log_path. Returns the exit code. The
+        worker kills the job after job_timeout; -1 when the worker stops or
+        gives no result even after that.
+        """
+        result_path = os.path.join(
+            self.jobs_dir, f'{self.put(dict(job, log=log_path, timeout=self.job_timeout))}.result'
+        )
+        deadline = time.monotonic() + self.job_timeout + RESULT_GRACE
+        while not os.path.exists(result_path):
+            if self.process.poll() is not None:
+                with open(log_path, 'a') as log:
+                    log.write(f"Worker {self.name} exited with code {self.process.returncode}\n")
+                return -1
+            if time.monotonic() > deadline:
+                with open(log_path, 'a') as log:
+                    log.write(f"No result from worker {self.name} after {self.job_timeout + RESULT_GRACE:g}s\n")
+                return -1
+            time.sleep(0.02)
+        with open(result_path) as f:
+            return json.load(f)['returncode']
+
+    def stop(self, timeout=30):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.put({'kind': 'stop'})
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            subprocess.run([CONTAINER_CMD, 'kill', self.container_name], capture_output=True)
+            self.process.wait()
+
+
+class KicadWorkerPool:
+    """
+    Worker containers for the length of a build. The stages of a board go to
+    the same worker, so the board its DSN export loaded is still in memory
+    for its SES import.
+    """
+
+    def __init__(self, count, job_timeout=KICAD_JOB_TIMEOUT):
+        self.workers = [KicadWorker(f'worker-{i}', job_timeout) for i in range(count)]
+        self.assigned = {}
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for worker in self.workers:
+            worker.stop()
+
+    def worker_for(self, board):
+        with self.lock:
+            if board not in self.assigned:
+                self.assigned[board] = self.workers[len(self.assigned) % len(self.workers)]
+            return self.assigned[board]
+
+
+def build_stages(boards=BOARDS, plates=PLATES):
+    """The stages of the whole build, by name."""
+    python = sys.executable
+    stages = [
+        # npm run debug (as in the justfile) clears ergogen/output: the manually routed boards are kept aside meanwhile, like build.sh does
+        Stage(
+            'ergogen',
+            ['sh', '-c', ERGOGEN_SCRIPT],
+            inputs=['ergogen/config.yaml', 'ergogen/footprints', 'package.json'],
+            # Not the whole output directory: the DSN, SES and routed boards of later stages go there too
+            outputs=[
+                'ergogen/output/outlines', 'ergogen/output/cases', 'ergogen/output/points', 'ergogen/output/source',
+                *[f'{PCBS_DIR}/{name}.kicad_pcb' for name in [*plates, *boards]],
+            ],
+        ),
+    ]
+
+    for plate in plates:
+        board_file = f'{PCBS_DIR}/{plate}.kicad_pcb'
+        stages.append(kibot_stage(f'plate:{plate}', board_file, 'default', ['ergogen'], default_outputs(board_file)))
+
+    for board in boards:
+        board_file = f'{PCBS_DIR}/{board}.kicad_pcb'
+        dsn_file = f'{PCBS_DIR}/{board}.dsn'
+        ses_file = f'{PCBS_DIR}/{board}.ses'
+        routed_file = f'{PCBS_DIR}/{board}_autorouted.kicad_pcb'
+        manual_file = f'{PCBS_DIR}/{board}_manually_routed.kicad_pcb'
+        # kibot's fill_zones preflight saves the board it is given, so the stages
+        # opening the board file run one after the other: dsn, unrouted, 3d, ses
+        stages += [
+            Stage(
+                f'dsn:{board}',
+                container(KICAD_AUTO_IMAGE, 'kibot/export_dsn.py', '-b', board_file, '-o', dsn_file),
+                ['ergogen'], inputs=[board_file, 'kibot/export_dsn.py'], outputs=[dsn_file],
+                job={'kind': 'export_dsn', 'board': board_file, 'output': dsn_file},
+            ),
+            kibot_stage(f'unrouted:{board}', board_file, 'default', [f'dsn:{board}'], default_outputs(board_file)),
+            # autoroute.py keeps its own session cache, keyed by the normalized DSN
+            Stage(
+                f'autoroute:{board}', [python, 'autoroute.py', dsn_file, ses_file], [f'dsn:{board}'],
+                inputs=[dsn_file, 'autoroute.py'], outputs=[ses_file],
+            ),
+            Stage(
+                f'ses:{board}',
+                container(KICAD_AUTO_IMAGE, 'kibot/import_ses.py', '-b', board_file, '-s', ses_file, '-o', routed_file),
+                [f'autoroute:{board}', f'3d:{board}'], inputs=[board_file, ses_file, 'kibot/import_ses.py'],
+                outputs=[routed_file],
+                job={'kind': 'import_ses', 'board': board_file, 'session': ses_file, 'output': routed_file},
+            ),
+            kibot_stage(
+                f'exports:{board}', routed_file, 'boards', [f'ses:{board}'],
+                [*default_outputs(routed_file), f'kibot/drc/{board}_autorouted-drc*'],
+            ),
+            # Skipped when there is no manually routed board, like the `if [ -e ... ]` of build.sh
+            kibot_stage(
+                f'manual:{board}', manual_file, 'boards', ['ergogen'],
+                [*default_outputs(manual_file), f'kibot/drc/{board}_manually_routed-drc*'],
+            ),
+            kibot_stage(
+                f'3d:{board}', board_file, '3d_preview', [f'unrouted:{board}'],
+                [
+                    f'filtered-output/pcbs/3d/{board}-3d.step',
+                    f'filtered-output/pcbs/3d/{board}-3d.stl',
+                    f'filtered-output/pcbs/3d/{board}-3d-misscaled.glb',
+                    f'filtered-output/pcbs/images/{board}-3d-top.png',
+                    f'filtered-output/pcbs/images/{board}-3d-bottom.png',
+                ],
+                inputs=['component_3d_models'],
+                env={
+                    'PATH_TO_SWEEPYWAY_COMPONENT_MODELS': '/board/component_3d_models',
+                    'KICAD9_3DMODEL_DIR': '/board/component_3d_models',
+                },
+                targets=PREVIEW_TARGETS,
+            ),
+        ]
+
+    # fix_glb_scale.py takes the board names without the _pcb suffix
+    glb_boards = [board[:-len('_pcb')] if board.endswith('_pcb') else board for board in boards]
+    stages += [
+        Stage(
+            'fix-glb', [python, 'fix_glb_scale.py', '--boards', *glb_boards], [f'3d:{board}' for board in boards],
+            inputs=['fix_glb_scale.py', *[f'filtered-output/pcbs/3d/{board}-3d-misscaled.glb' for board in boards]],
+            outputs=[f'filtered-output/pcbs/3d/{board}-3d.glb' for board in boards],
+        ),
+        Stage(
+            'palmrest', [python, 'palmrest_and_tenting_creation/create_palmrest.py'], ['ergogen'],
+            inputs=[
+                'palmrest_and_tenting_creation/*.py', 'ergogen/output/outlines/l_hand_rest_polygon.dxf',
+                'ergogen/output/outlines/r_hand_rest_polygon.dxf*'
+            ],
+            outputs=['filtered-output/palmrest/palm_rest.stl', 'filtered-output/palmrest/palm_rest_right.stl'],
+        ),
+        Stage(
+            'tenting', [python, 'palmrest_and_tenting_creation/create_tenting_system.py'], ['ergogen'],
+            inputs=['palmrest_and_tenting_creation/*.py', 'ergogen/output/outlines/*.dxf'],
+            outputs=['filtered-output/cases/tenting_system.stl', 'filtered-output/cases/tenting_system_right.stl'],
+        ),
+        Stage(
+            'scene', [python, 'create_full_3d_visual.py'], ['fix-glb', 'palmrest', 'tenting'],
+            inputs=[
+                'create_full_3d_visual.py', 'filtered-output/cases/*.stl', 'filtered-output/palmrest/*.stl',
+                'filtered-output/pcbs/3d/*-3d.glb'
+            ],
+            outputs=['filtered-output/combined_scene.glb'],
+        ),
+    ]
+    return {stage.name: stage for stage in stages}
+
+
+def stage_graph(stages, targets=None):
+    """
+    Dependency graph of the stages (edges from a stage to the ones needing
+    it), reduced to the targets and everything they need.
+    """
+    graph = nx.DiGraph()
+    for stage in stages.values():
+        graph.add_node(stage.name)
+        for dep in stage.deps:
+            if dep not in stages:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+            graph.add_edge(dep, stage.name)
+    if not nx.is_directed_acyclic_graph(graph):
+        raise ValueError(f"The stages have a dependency cycle: {nx.find_cycle(graph)}")
+    if targets:
+        unknown = [target for target in targets if target not in stages]
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+        needed = set(targets).union(*(nx.ancestors(graph, target) for target in targets))
+        graph = graph.subgraph(needed).copy()
+    return graph
+
+
+def critical_path(graph, durations):
+    """(stage names, total seconds) of the longest chain of dependent stages."""
+    finish, previous = {}, {}
+    for name in nx.topological_sort(graph):
+        before = max(graph.predecessors(name), key=lambda dep: finish[dep], default=None)
+        previous[name] = before
+        finish[name] = durations.get(name, 0.0) + (finish[before] if before else 0.0)
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], total
+
+
+def load_timings():
+    if os.path.exists(TIMINGS_FILE):
+        with open(TIMINGS_FILE) as f:
+            return json.load(f)
+    return {}
+
+
+def save_timings(durations):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    timings = load_timings()
+    timings.update(durations)
+    with open(TIMINGS_FILE, 'w') as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+
+
+def publish(staging_dir):
+    """Move the files written under a staging directory to the same paths in the checkout."""
+    for root, _, names in os.walk(staging_dir):
+        target_dir = os.path.relpath(root, staging_dir)
+        os.makedirs(target_dir, exist_ok=True)
+        for name in names:
+            os.replace(os.path.join(root, name), os.path.join(target_dir, name))
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def run_stage(stage, cache=None, workers=None, produced=None):
+    """
+    Run a stage (on a KiCad worker when it has a job and workers are given),
+    its output going to its log file, or restore its outputs from the cache.
+    Returns (status, seconds).
+
+    With a cache, the hashes of the stage's outputs are added to produced
+    once it is done. Later stages are keyed on those instead of the files as
+    they are then: kibot's fill_zones preflight saves the board it exports
+    in place, so the board from ergogen would otherwise have a different
+    hash depending on whether an earlier kibot stage ran or was restored.
+    """
+    missing = stage.missing_inputs()
+    if missing:
+        return f"skipped (missing {', '.join(missing)})", 0.0
+    if cache is not None:
+        key = stage.cache_key(produced)
+        restored = cache.restore(key)
+        if restored is not None:
+            if produced is not None:
+                produced.update(output_hashes(stage.outputs))
+            return f'cached ({restored} files restored)', 0.0
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    log_path = os.path.join(LOGS_DIR, stage.name.replace(':', '_') + '.log')
+    if stage.staging_dir:
+        shutil.rmtree(stage.staging_dir, ignore_errors=True)
+    start_time = time.perf_counter()
+    if stage.job is not None and workers is not None:
+        returncode = workers.worker_for(stage.name.split(':')[-1]).run(stage.job, log_path)
+    else:
+        with open(log_path, 'w') as log:
+            returncode = subprocess.run(stage.command, stdout=log, stderr=subprocess.STDOUT).returncode
+    runtime = time.perf_counter() - start_time
+    if returncode != 0:
+        return f"failed (exit code {returncode}, see {log_path})", runtime
+    if stage.staging_dir:
+        publish(stage.staging_dir)
+    if cache is not None:
+        cache.store(key, stage.outputs)
+        if produced is not None:
+            produced.update(output_hashes(stage.outputs))
+    return 'done', runtime
+
+
+def run_pipeline(stages, graph, jobs=4, cache=None, workers=None):
+    """
+    Run the stages of the graph, up to jobs at a time, each as soon as
+    everything it depends on is done. Stages after a failed one are not run.
+    Returns ({stage: status}, {stage: seconds}).
+    """
+    pending = {name: set(graph.predecessors(name)) for name in graph}
+    status, durations = {}, {}
+    running = {}
+    # Hashes of the stage outputs as they were when their stage finished
+    produced = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for name in [name for name, deps in pending.items() if not deps]:
+                del pending[name]
+                print(f"→ {name}")
+                running[executor.submit(run_stage, stages[name], cache, workers, produced)] = name
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                status[name], runtime = future.result()
+                if status[name] == 'done':
+                    durations[name] = runtime
+                    print(f"✓ {name} ({runtime:.1f}s)")
+                elif status[name].startswith('cached'):
+                    print(f"✓ {name}: {status[name]}")
+                else:
+                    print(f"✗ {name}: {status[name]}")
+                if status[name].startswith('failed'):
+                    for blocked in nx.descendants(graph, name):
+                        if blocked in pending:
+                            del pending[blocked]
+                            status[blocked] = f'not run ({name} failed)'
+                else:
+                    for successor in graph.successors(name):
+                        if successor in pending:
+                            pending[successor].discard(name)
+    return status, durations
+
+
+def print_plan(stages, graph, timings):
+    for level, names in enumerate(nx.topological_generations(graph)):
+        for name in sorted(names):
+            estimate = f"~{timings[name]:.0f}s" if name in timings else "?"
+            print(f"  [{level}] {name} ({estimate}): {' '.join(stages[name].command)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the keyboard, running independent stages in parallel')
+    parser.add_argument('targets', nargs='*', help='Stages to build with what they need (default: all)')
+    parser.add_argument('--jobs', '-j', type=int, default=4, help='Stages running at the same time (default: 4)')
+    parser.add_argument('--boards', nargs='+', default=BOARDS, help=f"Boards to build (default: {' '.join(BOARDS)})")
+    parser.add_argument('--plates', nargs='*', default=PLATES, help=f"Plates to export (default: {' '.join(PLATES)})")
+    parser.add_argument('--no-cache', action='store_true', help='Run every stage, without restoring cached outputs')
+    parser.add_argument(
+        '--kicad-workers',
+        type=int,
+        default=0,
+        help='Long-lived kicad_auto containers running the KiCad steps (default: 0, a docker run per step)'
+    )
+    parser.add_argument(
+        '--kicad-job-timeout',
+        type=float,
+        default=KICAD_JOB_TIMEOUT,
+        help=f'With --kicad-workers, kill a KiCad step after this many seconds (default: {KICAD_JOB_TIMEOUT})'
+    )
+    parser.add_argument('--dry-run', '-n', action='store_true', help='Only show the stages, commands and critical path')
+    args = parser.parse_args()
+
+    stages = build_stages(args.boards, args.plates)
+    try:
+        graph = stage_graph(stages, args.targets)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    if args.dry_run:
+        timings = load_timings()
+        print_plan(stages, graph, timings)
+        if timings:
+            path, total = critical_path(graph, timings)
+            print(f"Estimated critical path ({total:.0f}s, from the last timings): {' → '.join(path)}")
+        return
+
+    start_time = time.perf_counter()
+    cache = None if args.no_cache else BuildCache()
+    needs_workers = args.kicad_workers > 0 and any(stages[name].job is not None for name in graph)
+    if needs_workers:
+        with KicadWorkerPool(args.kicad_workers, args.kicad_job_timeout) as workers:
+            status, durations = run_pipeline(stages, graph, args.jobs, cache, workers)
+    else:
+        status, durations = run_pipeline(stages, graph, args.jobs, cache)
+    wall_time = time.perf_counter() - start_time
+    save_timings(durations)
+
+    path, total = critical_path(graph, durations)
+    print(f"\nCritical path ({total:.1f}s): {' → '.join(path)}")
+    print(f"Wall time {wall_time:.1f}s, sum of stages {sum(durations.values()):.1f}s")
+    failed = [name for name, result in status.items() if result.startswith(('failed', 'not run'))]
+    if failed:
+        print(f"Not built: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Routing analysis of Specctra DSN / SES files, without KiCad.
+
+The DSN that kibot/export_dsn.py writes gives the pads of every net
+(component placements plus the pin offsets of their images), the SES that
+Freerouting returns gives the wires and vias. Both are tokenized and only
+the sections needed are built. Wiring only connects on its own copper
+layer: layers are joined by vias and by the pads of padstacks with shapes
+on several layers (through-hole pads), not by wire ends that happen to
+share a position. Per net the analysis reports:
+
+    wire length, via count, ratsnest length (minimum spanning tree over the
+    pads, a lower bound for the wire length), unrouted connections (pad
+    groups the wiring leaves apart) and their remaining ratsnest length.
+
+The board score (unrouted connections, vias, wire length) ranks sessions,
+lower is better in that order. A JSON report of a good session can be kept
+as a baseline to fail CI when a new session routes worse.
+
+Usage:
+    python specctra.py ergogen/output/pcbs/left_pcb.dsn ergogen/output/pcbs/left_pcb.ses
+    python specctra.py left_pcb.dsn candidates/*.ses --nets
+    python specctra.py left_pcb.dsn left_pcb.ses -o report.json --baseline routing_baseline.json
+"""
+
+import argparse
+import itertools
+import json
+import re
+import sys
+import time
+
+import numpy as np
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from scipy.spatial import Delaunay, cKDTree
+
+# Parentheses, bare atoms and quoted strings (Specctra strings have no escapes)
+TOKEN_PATTERN = re.compile(r'[()]|[^\s()"]+|"[^"]*"')
+
+# (string_quote ") declares the quote character and would open a string
+STRING_QUOTE_PATTERN = re.compile(r'\(string_quote\s+"\s*\)')
+
+# Millimeters per Specctra unit
+UNIT_MM = {'um': 0.001, 'mm': 1.0, 'mil': 0.0254, 'inch': 25.4, 'cm': 10.0}
+
+# Pads of unknown size connect to wire ends this close (mm)
+DEFAULT_PAD_RADIUS = 0.25
+
+# Wire ends closer than this (mm) are joined
+JOIN_TOLERANCE = 0.001
+
+REPORT_FIELDS = ['net', 'pads', 'wire_length', 'vias', 'ratsnest_length', 'unrouted', 'unrouted_length']
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(STRING_QUOTE_PATTERN.sub('', text))
+
+
+def build(tokens, index):
+    """Nested lists of the expression starting at tokens[index] (an opening parenthesis)."""
+    stack = [[]]
+    while True:
+        token = tokens[index]
+        index += 1
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            expression = stack.pop()
+            stack[-1].append(expression)
+            if len(stack) == 1:
+                return expression, index
+        else:
+            stack[-1].append(token[1:-1] if token.startswith('"') else token)
+
+
+def read_sections(path, names):
+    """
+    {name: [expression, ...]} of the expressions with those names anywhere
+    in the file (the first found of a name is not searched inside for more).
+    Everything else is only counted through.
+    """
+    with open(path, encoding='utf-8') as f:
+        tokens = tokenize(f.read())
+    sections = {name: [] for name in names}
+    index = 0
+    count = len(tokens) - 1
+    while index < count:
+        if tokens[index] == '(' and tokens[index + 1] in sections:
+            expression, index = build(tokens, index)
+            sections[expression[0]].append(expression)
+        else:
+            index += 1
+    return sections
+
+
+def children(expression, name):
+    return [child for child in expression if isinstance(child, list) and child and child[0] == name]
+
+
+def child(expression, name, default=None):
+    found = children(expression, name)
+    return found[0] if found else default
+
+
+def unit_scale(expression, default='um'):
+    """mm per coordinate unit of a (resolution unit value) or (unit name) expression."""
+    if expression is None:
+        return UNIT_MM[default]
+    if expression[0] == 'resolution':
+        return UNIT_MM[expression[1].lower()] / float(expression[2])
+    return UNIT_MM[expression[1].lower()]
+
+
+def padstack_layers(padstack):
+    """Names of the layers a padstack has shapes on ('signal' or a '*' pattern stands for all of them)."""
+    return sorted({
+        kind[1] for shape in children(padstack, 'shape') for kind in shape[1:] if isinstance(kind, list) and len(kind) > 1
+    })
+
+
+def layer_mask(names, layers):
+    """Boolean mask over layers of the layer names; a wildcard name covers every layer."""
+    if any(name == 'signal' or '*' in name for name in names):
+        return np.ones(len(layers), dtype=bool)
+    return np.isin(np.array(layers, dtype=object), list(names))
+
+
+def padstack_radius(padstack, scale):
+    """Radius (mm) within which a wire end touches a pad of this padstack."""
+    radii = []
+    for shape in children(padstack, 'shape'):
+        for kind in shape[1:]:
+            if not isinstance(kind, list):
+                continue
+            values = [float(value) for value in kind[2:] if not isinstance(value, list)]
+            if kind[0] == 'circle' and values:
+                radii.append(values[0] / 2 * scale)
+            elif kind[0] == 'rect' and len(values) >= 4:
+                radii.append(min(abs(values[2] - values[0]), abs(values[3] - values[1])) / 2 * scale)
+    return max(radii, default=DEFAULT_PAD_RADIUS)
+
+
+class Design:
+    """
+    Pads of a DSN file: positions (n, 2) in mm, the net of each pad, the
+    radius within which a wire end connects to it and the copper layers it
+    is on (n, layers) as a mask over the layer names in stackup order.
+    padstacks maps the padstack names (vias among them) to their layers.
+    """
+
+    def __init__(self, nets, positions, radii, pad_layers, layers, padstacks):
+        self.nets = nets
+        self.positions = positions
+        self.radii = radii
+        self.pad_layers = pad_layers
+        self.layers = layers
+        self.padstacks = padstacks
+
+    @classmethod
+    def read(cls, path):
+        sections = read_sections(path, ['unit', 'resolution', 'structure', 'placement', 'library', 'network'])
+        scale = unit_scale((sections['unit'] or sections['resolution'] or [None])[0])
+        layers = [layer[1] for structure in sections['structure'] for layer in children(structure, 'layer')]
+
+        placements = {}
+        for placement in sections['placement']:
+            for component in children(placement, 'component'):
+                for place in children(component, 'place'):
+                    # (place ref x y side rotation)
+                    placements[place[1]] = (component[1], float(place[2]), float(place[3]), place[4], float(place[5]))
+
+        images, radii_by_padstack, padstacks = {}, {}, {}
+        for library in sections['library']:
+            for padstack in children(library, 'padstack'):
+                radii_by_padstack[padstack[1]] = padstack_radius(padstack, scale)
+                padstacks[padstack[1]] = padstack_layers(padstack)
+            for image in children(library, 'image'):
+                pins = {}
+                for pin in children(image, 'pin'):
+                    # (pin padstack [(rotate r)] id x y)
+                    values = [value for value in pin[2:] if not isinstance(value, list)]
+                    pins[values[0]] = (pin[1], float(values[1]), float(values[2]))
+                images[image[1]] = pins
+
+        nets, positions, radii, pad_layers = [], [], [], []
+        for network in sections['network']:
+            for net in children(network, 'net'):
+                for pins in children(net, 'pins'):
+                    for pad in pins[1:]:
+                        ref, _, pin_id = pad.rpartition('-')
+                        if ref not in placements:
+                            continue
+                        image, x, y, side, rotation = placements[ref]
+                        padstack, px, py = images[image][pin_id]
+                        # Images are mirrored around their y axis on the back, then rotated
+                        if side == 'back':
+                            px = -px
+                        angle = np.deg2rad(rotation)
+                        nets.append(net[1])
+                        positions.append((
+                            (x + px * np.cos(angle) - py * np.sin(angle)) * scale,
+                            (y + px * np.sin(angle) + py * np.cos(angle)) * scale,
+                        ))
+                        radii.append(radii_by_padstack.get(padstack, DEFAULT_PAD_RADIUS))
+                        mask = layer_mask(padstacks.get(padstack, ['signal']), layers)
+                        # The layers of a part on the back are mirrored through the stackup too
+                        pad_layers.append(mask[::-1] if side == 'back' else mask)
+        return cls(
+            np.array(nets, dtype=object),
+            np.array(positions, dtype=np.float64).reshape(-1, 2),
+            np.array(radii, dtype=np.float64),
+            np.array(pad_layers, dtype=bool).reshape(-1, len(layers)),
+            layers,
+            padstacks,
+        )
+
+
+class Session:
+    """
+    Wiring of a SES file: wire segments (n, 2, 2) in mm with their net and
+    layer name, and via positions (m, 2) with their net and padstack name.
+    padstacks maps the padstacks of the session's library to their layers.
+    """
+
+    def __init__(self, segment_nets, segments, segment_layers, via_nets, vias, via_padstacks, padstacks):
+        self.segment_nets = segment_nets
+        self.segments = segments
+        self.segment_layers = segment_layers
+        self.via_nets = via_nets
+        self.vias = vias
+        self.via_padstacks = via_padstacks
+        self.padstacks = padstacks
+
+    @classmethod
+    def read(cls, path):
+        sections = read_sections(path, ['routes'])
+        segment_nets, segments, segment_layers, via_nets, vias, via_padstacks = [], [], [], [], [], []
+        padstacks = {}
+        for routes in sections['routes']:
+            scale = unit_scale(child(routes, 'resolution'))
+            for library in children(routes, 'library_out'):
+                for padstack in children(library, 'padstack'):
+                    padstacks[padstack[1]] = padstack_layers(padstack)
+            for network in children(routes, 'network_out'):
+                for net in children(network, 'net'):
+                    for wire in children(net, 'wire'):
+                        for path_expression in children(wire, 'path'):
+                            # (path layer width x y x y ...)
+                            points = np.array(path_expression[3:], dtype=np.float64).reshape(-1, 2) * scale
+                            segments.append(np.stack([points[:-1], points[1:]], axis=1))
+                            segment_nets += [net[1]] * (len(points) - 1)
+                            segment_layers += [path_expression[1]] * (len(points) - 1)
+                    for via in children(net, 'via'):
+                        vias.append((float(via[2]) * scale, float(via[3]) * scale))
+                        via_nets.append(net[1])
+                        via_padstacks.append(via[1])
+        return cls(
+            np.array(segment_nets, dtype=object),
+            np.concatenate(segments) if segments else np.empty((0, 2, 2)),
+            np.array(segment_layers, dtype=object),
+            np.array(via_nets, dtype=object),
+            np.array(vias, dtype=np.float64).reshape(-1, 2),
+            np.array(via_padstacks, dtype=object),
+            padstacks,
+        )
+
+
+def ratsnest_length(positions, group=None):
+    """
+    Length of the minimum spanning tree over the pads. Pads of the same
+    group (already connected) are joined at no cost, so the result is what
+    is left to route. The tree only needs the Delaunay edges (plus the free
+    edges inside the groups), not every pair of pads.
+    """
+    count = len(positions)
+    if count < 2:
+        return 0.0
+    if count < 4:
+        pairs = np.array(list(itertools.combinations(range(count), 2)))
+    else:
+        # Joggled, so collinear and repeated pads triangulate too
+        simplices = Delaunay(positions, qhull_options='QJ').simplices
+        pairs = np.concatenate([simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]])
+    weights = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1)
+    if group is not None:
+        weights[group[pairs[:, 0]] == group[pairs[:, 1]]] = 0.0
+        order = np.argsort(group, kind='stable')
+        same = group[order[1:]] == group[order[:-1]]
+        pairs = np.concatenate([pairs, np.column_stack([order[:-1][same], order[1:][same]])])
+        weights = np.concatenate([weights, np.zeros(same.sum())])
+
+    # One entry per edge (the lightest), the sparse matrix would add up repeated ones
+    pairs = np.sort(pairs, axis=1)
+    order = np.lexsort((weights, pairs[:, 1], pairs[:, 0]))
+    pairs, weights = pairs[order], weights[order]
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = np.any(pairs[1:] != pairs[:-1], axis=1)
+    # Zero weight edges vanish from the sparse graph, a tiny weight keeps them
+    graph = coo_matrix(
+        (np.maximum(weights[first], 1e-12), (pairs[first, 0], pairs[first, 1])), shape=(count, count)
+    )
+    return float(minimum_spanning_tree(graph).sum())
+
+
+def analyze_net(pads, radii, pad_layers, segments, segment_layers, vias, via_layers):
+    """
+    Statistics of one net: pad positions, radii and layer masks, its wire
+    segments with their layer index, and its vias with their layer masks.
+    On each layer, wire ends join each other, vias and the segments they end
+    on, and pads join the wiring within their radius. A pad or via on
+    several layers is one node, which is what joins the layers.
+    """
+    wire_length = float(np.linalg.norm(segments[:, 1] - segments[:, 0], axis=1).sum()) if len(segments) else 0.0
+    pad_count = len(pads)
+    layer_count = pad_layers.shape[1]
+
+    # Nodes: pads, then the two ends of every segment, then vias; each on some layers
+    nodes = np.concatenate([pads, segments.reshape(-1, 2), vias])
+    on_layer = np.concatenate([
+        pad_layers,
+        np.repeat(np.arange(layer_count)[None] == segment_layers[:, None], 2, axis=0),
+        via_layers,
+    ]).reshape(-1, layer_count)
+    tolerance = np.concatenate([radii, np.full(len(nodes) - pad_count, 0.0)]) + JOIN_TOLERANCE
+    is_wiring = np.arange(len(nodes)) >= pad_count
+    edges = [np.column_stack([pad_count + 2 * np.arange(len(segments)), pad_count + 2 * np.arange(len(segments)) + 1])]
+
+    for layer in range(layer_count):
+        on = np.flatnonzero(on_layer[:, layer])
+        wiring = on[is_wiring[on]]
+        if len(wiring):
+            # Wire ends and vias at the same place, pads touching them
+            tree = cKDTree(nodes[wiring])
+            edges.append(wiring[tree.query_pairs(JOIN_TOLERANCE, output_type='ndarray')].reshape(-1, 2))
+            layer_pads = on[~is_wiring[on]]
+            near = tree.query_ball_point(nodes[layer_pads], tolerance[layer_pads]) if len(layer_pads) else []
+            counts = np.array([len(found) for found in near], dtype=np.int64)
+            if counts.sum():
+                found = np.fromiter(itertools.chain.from_iterable(near), np.int64, counts.sum())
+                edges.append(np.column_stack([np.repeat(layer_pads, counts), wiring[found]]))
+        layer_segments = np.flatnonzero(segment_layers == layer)
+        if len(layer_segments):
+            # Wire ends, vias and pads lying on a segment (T junctions, pads passed through)
+            tree = shapely.STRtree(shapely.linestrings(segments[layer_segments]))
+            node, segment = tree.query(shapely.points(nodes[on]), predicate='dwithin', distance=tolerance[on])
+            edges.append(np.column_stack([on[node], pad_count + 2 * layer_segments[segment]]))
+
+    edges = np.concatenate(edges).astype(np.int64)
+    graph = coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(len(nodes), len(nodes)))
+    _, component = connected_components(graph, directed=False)
+    pad_groups = component[:pad_count]
+    unrouted = len(np.unique(pad_groups)) - 1 if pad_count else 0
+    return {
+        'pads': pad_count,
+        'wire_length': round(wire_length, 3),
+        'vias': len(vias),
+        'ratsnest_length': round(ratsnest_length(pads), 3),
+        'unrouted': unrouted,
+        'unrouted_length': round(ratsnest_length(pads, pad_groups), 3) if unrouted else 0.0,
+    }
+
+
+def analyze(design, session):
+    """Per net statistics (sorted by net name) and the board totals."""
+    # Layers the session uses that the design does not declare come after the design's own
+    layers = design.layers + sorted(set(session.segment_layers) - set(design.layers))
+    pad_layers = np.zeros((len(design.nets), len(layers)), dtype=bool)
+    # Without a layer list in the DSN there is nothing to tell the pad layers apart
+    pad_layers[:, :len(design.layers)] = design.pad_layers if design.layers else True
+    layer_index = {name: index for index, name in enumerate(layers)}
+    segment_layers = np.array([layer_index[name] for name in session.segment_layers], dtype=np.int64)
+    padstacks = {**design.padstacks, **session.padstacks}
+    via_layers = np.array(
+        [layer_mask(padstacks.get(padstack, ['signal']), layers) for padstack in session.via_padstacks], dtype=bool
+    ).reshape(-1, len(layers))
+
+    nets = []
+    for name in sorted(set(design.nets) | set(session.segment_nets) | set(session.via_nets)):
+        pads = design.nets == name
+        wires = session.segment_nets == name
+        vias = session.via_nets == name
+        nets.append({'net': name, **analyze_net(
+            design.positions[pads], design.radii[pads], pad_layers[pads],
+            session.segments[wires], segment_layers[wires], session.vias[vias], via_layers[vias]
+        )})
+    connections = sum(max(net['pads'] - 1, 0) for net in nets)
+    unrouted = sum(net['unrouted'] for net in nets)
+    totals = {
+        'nets': len(nets),
+        'connections': connections,
+        'unrouted': unrouted,
+        'completion': round(100.0 * (connections - unrouted) / connections, 2) if connections else 100.0,
+        'vias': sum(net['vias'] for net in nets),
+        'wire_length': round(sum(net['wire_length'] for net in nets), 3),
+        'ratsnest_length': round(sum(net['ratsnest_length'] for net in nets), 3),
+        'unrouted_length': round(sum(net['unrouted_length'] for net in nets), 3),
+    }
+    return nets, totals
+
+
+def score(totals):
+    """Ranking key of a session: unrouted connections, then vias, then wire length (lower is better)."""
+    return totals['unrouted'], totals['vias'], totals['wire_length']
+
+
+def analyze_files(dsn_path, ses_path, design=None):
+    """(nets, totals) of a session; pass the Design to reuse it for many sessions."""
+    return analyze(design or Design.read(dsn_path), Session.read(ses_path))
+
+
+def regressions(totals, baseline, length_tolerance=0.05):
+    """What got worse than the baseline totals (more unrouted, more vias, longer wires)."""
+    problems = []
+    if totals['unrouted'] > baseline['unrouted']:
+        problems.append(f"unrouted connections {baseline['unrouted']} -> {totals['unrouted']}")
+    if totals['vias'] > baseline['vias']:
+        problems.append(f"vias {baseline['vias']} -> {totals['vias']}")
+    if totals['wire_length'] > baseline['wire_length'] * (1 + length_tolerance):
+        problems.append(f"wire length {baseline['wire_length']:.1f} -> {totals['wire_length']:.1f} mm")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze and rank Specctra sessions of a DSN')
+    parser.add_argument('dsn', help='Specctra DSN file')
+    parser.add_argument('sessions', nargs='+', help='SES files to analyze')
+    parser.add_argument('--nets', action='store_true', help='Show the statistics of every net')
+    parser.add_argument('--output', '-o', help='Write the report of the best session to this JSON file')
+    parser.add_argument('--baseline', help='JSON report to compare the best session with; exit 1 when it is worse')
+    parser.add_argument('--max-unrouted', type=int, default=None, help='Exit 1 when more connections are unrouted')
+    args = parser.parse_args()
+
+    design = Design.read(args.dsn)
+    reports = []
+    for path in args.sessions:
+        start_time = time.perf_counter()
+        nets, totals = analyze_files(args.dsn, path, design)
+        runtime = time.perf_counter() - start_time
+        reports.append({'session': path, 'totals': totals, 'nets': nets})
+        print(f"  {path}: {totals['unrouted']}/{totals['connections']} unrouted ({totals['completion']:.1f}% routed), "
+              f"{totals['vias']} vias, {totals['wire_length']:.1f} mm of wire "
+              f"(ratsnest {totals['ratsnest_length']:.1f} mm) in {runtime * 1000:.0f} ms")
+        if args.nets:
+            for net in nets:
+                print(f"    {net['net']}: " + ', '.join(f"{field} {net[field]}" for field in REPORT_FIELDS[1:]))
+
+    best = min(reports, key=lambda report: score(report['totals']))
+    if len(reports) > 1:
+        print(f"✓ Best: {best['session']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(best, f, indent=2)
+        print(f"Report saved to {args.output}")
+
+    failed = False
+    if args.max_unrouted is not None and best['totals']['unrouted'] > args.max_unrouted:
+        print(f"✗ {best['totals']['unrouted']} unrouted connections, at most {args.max_unrouted} allowed")
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for problem in regressions(best['totals'], baseline['totals']):
+            print(f"✗ Worse than {args.baseline}: {problem}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
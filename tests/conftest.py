@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their siblings by module name, like when run from their directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ['', 'kibot', 'palmrest_and_tenting_creation']:
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from autoroute import FREEROUTING_CLI_IMAGE, RouterConfig
+
+
+def test_docker_command_uses_paths_inside_the_mount(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    work_dir = tmp_path / '.pipeline' / 'routes' / 'tmp-abc'
+    config = RouterConfig('docker', 40, 'freerouting/freerouting.rules')
+
+    command = config.command(str(tmp_path / 'board.dsn'), str(work_dir / 'docker-mp40-freerouting.ses'))
+
+    assert command[:7] == ['docker', 'run', '-w', '/board', '-v', f'{tmp_path}:/board', '--rm']
+    assert command[7] == FREEROUTING_CLI_IMAGE
+    assert command[-8:] == [
+        '-de', 'board.dsn',
+        '-do', '.pipeline/routes/tmp-abc/docker-mp40-freerouting.ses',
+        '-mp', '40',
+        '-dr', 'freerouting/freerouting.rules',
+    ]
+    assert not any(arg.startswith(str(tmp_path)) for arg in command[8:])
+
+
+def test_docker_command_rejects_paths_outside_the_mount(tmp_path, monkeypatch):
+    checkout = tmp_path / 'checkout'
+    checkout.mkdir()
+    monkeypatch.chdir(checkout)
+    with pytest.raises(ValueError):
+        RouterConfig('docker').command(str(tmp_path / 'board.dsn'), 'board.ses')
+
+
+def test_jar_command_keeps_host_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dsn_path = os.path.join(tmp_path, 'board.dsn')
+    command = RouterConfig('freerouting/freerouting-1.9.0.jar', 20).command(dsn_path, '/tmp/out.ses')
+    assert command == [
+        'java', '-Djava.awt.headless=true', '-jar', 'freerouting/freerouting-1.9.0.jar',
+        '-de', dsn_path, '-do', '/tmp/out.ses', '-mp', '20',
+    ]
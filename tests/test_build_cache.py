@@ -0,0 +1,47 @@
+import os
+
+from build_cache import BuildCache, file_hash, stage_key
+
+
+def test_store_and_restore(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('out/images')
+    with open('out/board.zip', 'wb') as f:
+        f.write(b'zip')
+    with open('out/images/board-top.png', 'wb') as f:
+        f.write(b'png')
+    cache = BuildCache('cache')
+
+    assert cache.store('key', ['out']) == 2
+    assert cache.size()[:1] == (2,)
+
+    os.remove('out/board.zip')
+    with open('out/images/board-top.png', 'wb') as f:
+        f.write(b'changed')
+    assert cache.restore('key') == 2
+    with open('out/board.zip', 'rb') as f:
+        assert f.read() == b'zip'
+    with open('out/images/board-top.png', 'rb') as f:
+        assert f.read() == b'png'
+    assert cache.restore('other') is None
+
+
+def test_stored_objects_match_their_hash(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('a.txt', 'w') as f:
+        f.write('a')
+    cache = BuildCache('cache')
+    cache.store('key', ['a.txt'])
+    for root, _, names in os.walk('cache/objects'):
+        for name in names:
+            assert file_hash(os.path.join(root, name)) == name
+
+
+def test_stage_key_follows_the_input_content(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('in.txt', 'w') as f:
+        f.write('1')
+    before = stage_key('stage', ['cmd'], ['in.txt'])
+    with open('in.txt', 'w') as f:
+        f.write('22')
+    assert stage_key('stage', ['cmd'], ['in.txt']) != before
@@ -0,0 +1,33 @@
+import numpy as np
+from shapely.geometry import Polygon
+
+from create_tenting_system import TentingGenerator, joined_solid
+from stl_writer import write_binary_stl
+
+
+def read_binary_stl(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    count = int(np.frombuffer(data, '<u4', 1, 80)[0])
+    triangles = np.frombuffer(data, np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attr', '<u2')]),
+                              count, 84)
+    return triangles['vertices']
+
+
+def generator():
+    keyboard = Polygon([(0, 0), (100, 0), (100, 60), (0, 60)])
+    palm = Polygon([(20, -40), (80, -40), (80, 10), (20, 10)])
+    return TentingGenerator(keyboard, palm, hollow_offset=5.0, merge_outlines=False)
+
+
+def test_export_angles_uses_the_union_backend_and_z_min(tmp_path):
+    tenting = generator()
+    paths = tenting.export_angles([1.5], str(tmp_path), z_min=2.0, prefix='wedge', union='manifold')
+
+    expected = tmp_path / 'expected.stl'
+    write_binary_stl(str(expected), *joined_solid(tenting, 'manifold', 1.5, 2.0))
+    assert np.array_equal(read_binary_stl(paths[0]), read_binary_stl(str(expected)))
+    # Not the two overlapping solids
+    assert len(read_binary_stl(paths[0])) != len(tenting.solid(1.5, 2.0)[1])
+    # The high end is z_min plus the slope over the width
+    assert np.isclose(read_binary_stl(paths[0])[..., 2].max() - 2.0, np.tan(np.deg2rad(1.5)) * 100, atol=1e-3)
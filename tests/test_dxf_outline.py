@@ -0,0 +1,20 @@
+from dxf_outline import nest_rings
+
+
+def square(x, y, size):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size)]
+
+
+def test_holes_go_to_the_smallest_outer_ring():
+    polygons = nest_rings([square(0, 0, 100), square(10, 10, 80), square(20, 20, 60), square(30, 30, 10)])
+    assert [len(polygon.interiors) for polygon in polygons] == [1, 1]
+    assert polygons[0].area == 100 ** 2 - 80 ** 2
+    assert polygons[1].area == 60 ** 2 - 10 ** 2
+
+
+def test_orphan_hole_rings_are_skipped(capsys):
+    # B overlaps A, so it counts as a hole of A; D lies only inside B, a hole, and has no outer ring
+    polygons = nest_rings([square(0, 0, 10), square(5, 5, 10), square(12, 12, 1)])
+    assert len(polygons) == 1
+    assert polygons[0].exterior.coords[0] == (0, 0)
+    assert 'Warning' in capsys.readouterr().out
@@ -0,0 +1,36 @@
+import pytest
+
+from fix_pos_package_name import process_pos_file
+
+POS = """### Footprint positions - created on 2026-02-01T18:28:28-0300 ###
+## Unit = mm, Angle = deg.
+## Side : bottom
+# Ref     Val                Package                 PosX       PosY       Rot  Side
+S1                           switch_choc_v1_v2    35.0000  -133.0000  180.0000  bottom
+D1        diode_tht_sod123   diode_tht_sod123     40.0000  -120.0000   90.0000  bottom
+U1        switch_choc_v1_v2  other_package        50.0000  -100.0000    0.0000  bottom
+## End
+"""
+
+REPLACEMENTS = {'switch_choc_v1_v2': 'CPG135001S30', 'diode_tht_sod123': 'C81598'}
+
+
+def test_only_the_package_column_is_replaced(tmp_path):
+    path = tmp_path / 'board.pos'
+    path.write_text(POS)
+    counts = process_pos_file(path, replacements=REPLACEMENTS)
+
+    lines = path.read_text().splitlines()
+    assert lines[4] == 'S1                           CPG135001S30    35.0000  -133.0000  180.0000  bottom'
+    # The value equals a package name and stays
+    assert lines[5] == 'D1        diode_tht_sod123   C81598     40.0000  -120.0000   90.0000  bottom'
+    assert lines[6] == 'U1        switch_choc_v1_v2  other_package        50.0000  -100.0000    0.0000  bottom'
+    assert lines[:4] == POS.splitlines()[:4]
+    assert counts == {'switch_choc_v1_v2': 1, 'diode_tht_sod123': 1}
+
+
+def test_placements_need_a_header(tmp_path):
+    path = tmp_path / 'board.pos'
+    path.write_text('S1  x  switch_choc_v1_v2  1.0  2.0  0.0  top\n')
+    with pytest.raises(ValueError):
+        process_pos_file(path, tmp_path / 'out.pos', replacements=REPLACEMENTS)
@@ -0,0 +1,30 @@
+import pytest
+
+from jlc_assembly import group_boards, output_dirs
+
+
+def test_output_dirs_default_to_the_board_directory():
+    boards = {('a', 'left_pcb'): [], ('b', 'left_pcb'): []}
+    assert output_dirs(boards) == {('a', 'left_pcb'): 'a', ('b', 'left_pcb'): 'b'}
+
+
+def test_same_board_name_in_one_output_dir_is_an_error():
+    boards = {('a', 'left_pcb'): [], ('b', 'left_pcb'): [], ('a', 'right_pcb'): []}
+    with pytest.raises(ValueError, match='left_pcb'):
+        output_dirs(boards, 'out')
+    assert output_dirs({('a', 'left_pcb'): [], ('a', 'right_pcb'): []}, 'out') == {
+        ('a', 'left_pcb'): 'out', ('a', 'right_pcb'): 'out'
+    }
+
+
+def test_pos_files_are_preferred_over_the_board_file_next_to_them(tmp_path):
+    for name in ['left_pcb.kicad_pcb', 'left_pcb-top.pos', 'left_pcb-bottom.pos', 'right_pcb.kicad_pcb']:
+        (tmp_path / name).write_text('')
+    boards = group_boards([str(tmp_path)])
+    assert boards == {
+        (str(tmp_path), 'left_pcb'): [str(tmp_path / 'left_pcb-bottom.pos'), str(tmp_path / 'left_pcb-top.pos')],
+        (str(tmp_path), 'right_pcb'): [str(tmp_path / 'right_pcb.kicad_pcb')],
+    }
+    # Also when both are given as files
+    boards = group_boards([str(tmp_path / 'left_pcb.kicad_pcb'), str(tmp_path / 'left_pcb-top.pos')])
+    assert boards == {(str(tmp_path), 'left_pcb'): [str(tmp_path / 'left_pcb-top.pos')]}
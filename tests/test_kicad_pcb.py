@@ -0,0 +1,37 @@
+from kicad_pcb import KicadBoard
+
+BOARD = '''(kicad_pcb (version 20240108) (generator "pcbnew")
+  (net 0 "")
+  {footprints}
+)
+'''
+
+FOOTPRINT = '''(footprint "lib:{package}" (layer "{layer}") (at 10 -20 90)
+    (property "Reference" "{ref}") (property "Value" "v")
+    {attr})
+'''
+
+
+def read_board(tmp_path, footprints):
+    path = tmp_path / 'board.kicad_pcb'
+    path.write_text(BOARD.format(footprints='\n'.join(
+        FOOTPRINT.format(package=package, layer=layer, ref=ref, attr=attr)
+        for ref, package, layer, attr in footprints
+    )))
+    return KicadBoard.read(str(path))
+
+
+def test_placements_keep_only_placed_smd_footprints(tmp_path):
+    board = read_board(tmp_path, [
+        ('D1', 'SOD-123', 'F.Cu', '(attr smd)'),
+        ('D2', 'SOD-123', 'B.Cu', '(attr smd allow_soldermask_bridges)'),
+        ('J1', 'PinHeader', 'F.Cu', '(attr through_hole)'),
+        ('S1', 'Switch', 'F.Cu', '(attr allow_soldermask_bridges)'),
+        ('D3', 'SOD-123', 'F.Cu', '(attr smd dnp)'),
+        ('H1', 'Hole', 'F.Cu', '(attr smd exclude_from_pos_files)'),
+    ])
+    placements = board.placements()
+    assert placements['ref'].tolist() == ['D1', 'D2']
+    assert placements['side'].tolist() == ['top', 'bottom']
+    assert placements[['x', 'y', 'rot']].iloc[0].tolist() == [10.0, 20.0, 90.0]
+    assert board.placements(only_smd=False)['ref'].tolist() == ['D1', 'D2', 'J1', 'S1']
@@ -0,0 +1,8 @@
+import outline_store
+
+
+def test_cache_files_are_keyed_by_version(monkeypatch):
+    path = outline_store.cache_path('outlines/l_base.dxf', 'ab' * 20, 0.01)
+    assert path.endswith(f'-v{outline_store.CACHE_VERSION}.npz')
+    monkeypatch.setattr(outline_store, 'CACHE_VERSION', outline_store.CACHE_VERSION + 1)
+    assert outline_store.cache_path('outlines/l_base.dxf', 'ab' * 20, 0.01) != path
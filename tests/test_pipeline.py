@@ -0,0 +1,96 @@
+import fnmatch
+import itertools
+import json
+import os
+import sys
+
+import pipeline
+from build_cache import BuildCache
+from pipeline import KicadWorker, Stage, build_stages, publish, run_pipeline, stage_graph
+
+
+def overlaps(a, b):
+    """Whether two output paths or patterns can name the same file."""
+    return (
+        fnmatch.fnmatch(a, b) or fnmatch.fnmatch(b, a)
+        or a.startswith(b + '/') or b.startswith(a + '/')
+    )
+
+
+def test_no_two_stages_share_an_output():
+    stages = build_stages().values()
+    outputs = [(stage.name, output) for stage in stages for output in stage.outputs]
+    shared = [
+        (first, second) for first, second in itertools.combinations(outputs, 2)
+        if first[0] != second[0] and overlaps(first[1], second[1])
+    ]
+    assert shared == []
+
+
+def test_kibot_stages_write_to_their_own_staging_dir():
+    stages = [stage for stage in build_stages().values() if stage.job and stage.job['kind'] == 'kibot']
+    staging_dirs = [stage.staging_dir for stage in stages]
+    assert len(set(staging_dirs)) == len(stages)
+    for stage in stages:
+        assert stage.job['args'][stage.job['args'].index('-d') + 1] == stage.staging_dir
+
+
+def test_publish_moves_staged_files_into_place(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    staged = tmp_path / 'staging' / 'filtered-output' / 'pcbs' / 'images'
+    staged.mkdir(parents=True)
+    (staged / 'left_pcb-top.png').write_bytes(b'new')
+    (tmp_path / 'filtered-output' / 'pcbs' / 'images').mkdir(parents=True)
+    (tmp_path / 'filtered-output' / 'pcbs' / 'images' / 'right_pcb-top.png').write_bytes(b'other')
+
+    publish('staging')
+
+    assert (tmp_path / 'filtered-output' / 'pcbs' / 'images' / 'left_pcb-top.png').read_bytes() == b'new'
+    assert (tmp_path / 'filtered-output' / 'pcbs' / 'images' / 'right_pcb-top.png').read_bytes() == b'other'
+    assert not (tmp_path / 'staging').exists()
+
+
+class RunningProcess:
+    returncode = None
+
+    def poll(self):
+        return None
+
+
+def test_worker_jobs_carry_their_timeout_and_the_wait_gives_up(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, 'RESULT_GRACE', 0)
+    worker = KicadWorker('worker-0', job_timeout=0.1)
+    os.makedirs(worker.jobs_dir)
+    worker.process = RunningProcess()
+
+    assert worker.run({'kind': 'kibot', 'args': []}, str(tmp_path / 'job.log')) == -1
+    [job_file] = os.listdir(worker.jobs_dir)
+    with open(os.path.join(worker.jobs_dir, job_file)) as f:
+        assert json.load(f)['timeout'] == 0.1
+    assert 'No result' in (tmp_path / 'job.log').read_text()
+
+
+def python_stage(name, code, deps=(), inputs=(), outputs=()):
+    return Stage(name, [sys.executable, '-c', code], deps, inputs=inputs, outputs=outputs)
+
+
+def test_stages_are_keyed_on_the_board_as_produced(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stages = {stage.name: stage for stage in [
+        python_stage('ergogen', "open('board', 'w').write('board')", outputs=['board']),
+        # Like kibot's fill_zones preflight, saves the board it exports in place
+        python_stage(
+            'unrouted', "open('board', 'a').write(' filled'); open('images', 'w').write('x')",
+            ['ergogen'], inputs=['board'], outputs=['images'],
+        ),
+        python_stage('3d', "open('step', 'w').write(open('board').read())", ['unrouted'], inputs=['board'],
+                     outputs=['step']),
+    ]}
+    graph = stage_graph(stages, [])
+    cache = BuildCache(str(tmp_path / 'cache'))
+
+    first, _ = run_pipeline(stages, graph, cache=cache)
+    assert set(first.values()) == {'done'}
+    second, _ = run_pipeline(stages, graph, cache=cache)
+    assert all(status.startswith('cached') for status in second.values()), second
@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+
+from pos_diff import diff_placements, match_by_position, read_placements
+from pos_table import read_pos
+
+MANUAL_POS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'manualboms', 'left_pcb-top.pos')
+
+
+def placements(rows, board='left_pcb'):
+    return pd.DataFrame(rows, columns=['ref', 'val', 'package', 'x', 'y', 'rot', 'side']).assign(board=board)
+
+
+def test_next_nearest_candidate_is_used_when_the_nearest_is_taken():
+    # old A's nearest is new X, but old B is even closer to X; A must then take Y
+    old = placements([
+        ['A', '', 'pkg', 0.0, 0.0, 0.0, 'top'],
+        ['B', '', 'pkg', 0.3, 0.0, 0.0, 'top'],
+    ])
+    new = placements([
+        ['X', '', 'pkg', 0.25, 0.0, 0.0, 'top'],
+        ['Y', '', 'pkg', -0.3, 0.0, 0.0, 'top'],
+    ])
+    old_index, new_index = match_by_position(old, new, max_distance=0.5)
+    assert sorted(zip(old_index.tolist(), new_index.tolist())) == [(0, 1), (1, 0)]
+
+    pairs, added, removed = diff_placements(old, new, max_distance=0.5)
+    assert added.empty and removed.empty
+    assert pairs['renamed'].all()
+    assert pairs.set_index('ref_old')['ref_new'].to_dict() == {'A': 'Y', 'B': 'X'}
+
+
+def test_only_same_package_and_side_within_the_distance():
+    old = placements([
+        ['A', '', 'pkg', 0.0, 0.0, 0.0, 'top'],
+        ['B', '', 'pkg', 10.0, 0.0, 0.0, 'top'],
+        ['C', '', 'pkg', 20.0, 0.0, 0.0, 'top'],
+    ])
+    new = placements([
+        ['X', '', 'other', 0.0, 0.0, 0.0, 'top'],
+        ['Y', '', 'pkg', 10.0, 0.0, 0.0, 'bottom'],
+        ['Z', '', 'pkg', 21.0, 0.0, 0.0, 'top'],
+    ])
+    old_index, new_index = match_by_position(old, new, max_distance=0.5)
+    assert len(old_index) == len(new_index) == 0
+
+
+def test_boards_sharing_refs_are_compared_separately(tmp_path):
+    table = read_pos(MANUAL_POS)
+    for directory in ['old', 'new']:
+        (tmp_path / directory).mkdir()
+        table.write(tmp_path / directory / 'left_pcb-top.pos')
+    # right_pcb has the same refs; only its D1 moves
+    table.write(tmp_path / 'old' / 'right_pcb-top.pos')
+    moved = table.copy()
+    moved.data.loc[moved.data['ref'] == 'D1', 'x'] += 0.2
+    moved.write(tmp_path / 'new' / 'right_pcb-top.pos')
+
+    old = read_placements([str(tmp_path / 'old')])
+    new = read_placements([str(tmp_path / 'new')])
+    assert len(old) == len(new) == 2 * len(table.data)
+
+    pairs, added, removed = diff_placements(old, new)
+    assert added.empty and removed.empty
+    assert len(pairs) == len(old)
+    assert pairs.loc[pairs['moved'], ['board_new', 'ref_new']].values.tolist() == [['right_pcb', 'D1']]
@@ -0,0 +1,34 @@
+import glob
+import os
+
+import pytest
+
+from pos_table import map_packages, read_pos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POS_FILES = sorted(glob.glob(os.path.join(ROOT, '**', '*.pos'), recursive=True))
+
+
+@pytest.mark.parametrize('path', POS_FILES, ids=lambda path: os.path.relpath(path, ROOT))
+def test_round_trip(path):
+    with open(path, encoding='utf-8') as f:
+        assert read_pos(path).to_text() == f.read()
+
+
+def test_round_trip_of_rows_narrower_than_the_header():
+    path = os.path.join(ROOT, 'manualboms', 'manualpos 2026-02-01', 'left_pcb-bottom-jlcpcb.pos')
+    assert path in POS_FILES
+    table = read_pos(path)
+    assert table.widths['package'] == len('CPG135001S30')
+    with open(path, encoding='utf-8') as f:
+        assert table.to_text() == f.read()
+
+
+def test_longer_packages_widen_the_header():
+    path = os.path.join(ROOT, 'manualboms', 'manualpos 2026-02-01', 'left_pcb-bottom.pos')
+    table = read_pos(path)
+    longer = 'a_much_longer_package_name_than_before'
+    lines = table.copy(map_packages(table.data, {'switch_choc_v1_v2': longer})).to_text().splitlines()
+    header = next(line for line in lines if line.startswith('# '))
+    row = next(line for line in lines if longer in line)
+    assert header.index('PosX') + len('PosX') == row.index(' 35.0000') + len(' 35.0000')
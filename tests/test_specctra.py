@@ -0,0 +1,137 @@
+import numpy as np
+
+from specctra import Design, Session, analyze, ratsnest_length
+
+# Two pads 10 mm apart (SMD on the component side) and two through-hole ones
+DSN = """(pcb board.dsn
+  (resolution um 10)
+  (unit um)
+  (structure
+    (layer F.Cu (type signal))
+    (layer B.Cu (type signal))
+    (via "Via[0-1]_600:300_um")
+  )
+  (placement
+    (component smd (place S1 0 0 {side} 0))
+    (component tht (place T1 0 -20000 front 0))
+  )
+  (library
+    (image smd (pin Smd_1000_um 1 0 0) (pin Smd_1000_um 2 10000 0))
+    (image tht (pin Tht_1000_um 1 0 0) (pin Tht_1000_um 2 10000 0))
+    (padstack Smd_1000_um (shape (circle F.Cu 1000)))
+    (padstack Tht_1000_um (shape (circle F.Cu 1000)) (shape (circle B.Cu 1000)))
+    (padstack "Via[0-1]_600:300_um" (shape (circle F.Cu 600)) (shape (circle B.Cu 600)))
+  )
+  (network
+    (net smd (pins S1-1 S1-2))
+    (net tht (pins T1-1 T1-2))
+  )
+)
+"""
+
+
+def session(tmp_path, wiring):
+    path = tmp_path / 'board.ses'
+    path.write_text(f"""(session board.ses
+  (routes
+    (resolution um 10)
+    (network_out
+      {wiring}
+    )
+  )
+)
+""")
+    return Session.read(str(path))
+
+
+def design(tmp_path, side='front'):
+    path = tmp_path / 'board.dsn'
+    path.write_text(DSN.format(side=side))
+    return Design.read(str(path))
+
+
+def unrouted(tmp_path, wiring, side='front'):
+    nets, _ = analyze(design(tmp_path, side), session(tmp_path, wiring))
+    return {net['net']: net['unrouted'] for net in nets}
+
+
+def test_pad_layers(tmp_path):
+    board = design(tmp_path, side='back')
+    assert board.layers == ['F.Cu', 'B.Cu']
+    np.testing.assert_array_equal(board.pad_layers, [[0, 1], [0, 1], [1, 1], [1, 1]])
+
+
+def test_wires_on_different_layers_need_a_via(tmp_path):
+    wires = """(net tht
+        (wire (path F.Cu 250 0 -200000 50000 -200000))
+        (wire (path B.Cu 250 50000 -200000 100000 -200000))
+      )"""
+    assert unrouted(tmp_path, wires)['tht'] == 1
+    with_via = wires[:-1] + '(via "Via[0-1]_600:300_um" 50000 -200000))'
+    assert unrouted(tmp_path, with_via)['tht'] == 0
+
+
+def test_smd_pads_only_connect_on_their_layer(tmp_path):
+    wire = '(net smd (wire (path {layer} 250 0 0 100000 0)))'
+    assert unrouted(tmp_path, wire.format(layer='F.Cu'))['smd'] == 0
+    assert unrouted(tmp_path, wire.format(layer='B.Cu'))['smd'] == 1
+
+
+def test_smd_pads_of_parts_on_the_back(tmp_path):
+    # Mirrored: the second pad is at x = -10 mm, on B.Cu
+    wire = '(net smd (wire (path {layer} 250 0 0 -100000 0)))'
+    assert unrouted(tmp_path, wire.format(layer='B.Cu'), side='back')['smd'] == 0
+    assert unrouted(tmp_path, wire.format(layer='F.Cu'), side='back')['smd'] == 1
+
+
+def test_through_hole_pads_join_the_layers(tmp_path):
+    wires = """(net tht
+        (wire (path F.Cu 250 0 -200000 0 -250000 50000 -250000))
+        (wire (path B.Cu 250 50000 -250000 100000 -250000 100000 -200000))
+      )"""
+    # The two wires meet at (5, -25) without a via
+    assert unrouted(tmp_path, wires)['tht'] == 1
+    through_pads = """(net tht
+        (wire (path F.Cu 250 0 -200000 0 -250000 100000 -250000 100000 -200000))
+      )"""
+    assert unrouted(tmp_path, through_pads)['tht'] == 0
+    on_back = through_pads.replace('F.Cu', 'B.Cu')
+    assert unrouted(tmp_path, on_back)['tht'] == 0
+
+
+def test_wire_ending_on_another_segment(tmp_path):
+    wires = """(net tht
+        (wire (path F.Cu 250 0 -200000 100000 -200000))
+        (wire (path F.Cu 250 50000 -200000 50000 -300000))
+      )"""
+    nets, totals = analyze(design(tmp_path), session(tmp_path, wires))
+    assert totals['unrouted'] == 1  # the smd net has no wiring
+    assert {net['net']: net['wire_length'] for net in nets}['tht'] == 20.0
+
+
+def prim_length(positions, group):
+    distance = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+    distance[group[:, None] == group[None]] = 0.0
+    inside = np.zeros(len(positions), dtype=bool)
+    inside[0] = True
+    best = distance[0].copy()
+    total = 0.0
+    for _ in range(len(positions) - 1):
+        candidates = np.where(inside, np.inf, best)
+        nearest = candidates.argmin()
+        total += candidates[nearest]
+        inside[nearest] = True
+        best = np.minimum(best, distance[nearest])
+    return total
+
+
+def test_ratsnest_length_matches_the_full_spanning_tree():
+    rng = np.random.default_rng(0)
+    for count in [2, 3, 4, 50, 300]:
+        positions = rng.uniform(0, 100, (count, 2))
+        collinear = np.column_stack([positions[:, 0], 2 * positions[:, 0]])
+        repeated = np.concatenate([positions[:count // 2], positions[:count - count // 2]])
+        for points in [positions, collinear, repeated]:
+            group = rng.integers(0, max(count // 3, 1), count)
+            assert abs(ratsnest_length(points) - prim_length(points, np.arange(count))) < 1e-6
+            assert abs(ratsnest_length(points, group) - prim_length(points, group)) < 1e-6
@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+
+from stl2ascii import convert_batch, write_binary_stl
+
+
+def write_triangle(path):
+    normals = np.array([[0, 0, 1]], dtype=np.float32)
+    vertices = np.array([[[0, 0, 0], [1, 0, 0], [0, 1, 0]]], dtype=np.float32)
+    write_binary_stl(str(path), normals, vertices)
+
+
+def test_batch_reports_bad_files_and_converts_the_rest(tmp_path):
+    write_triangle(tmp_path / 'good.stl')
+    (tmp_path / 'truncated.stl').write_bytes(b'\0' * 80 + (5).to_bytes(4, 'little') + b'\0' * 20)
+    # Its output path is a directory, so writing it fails with an OSError
+    write_triangle(tmp_path / 'blocked.stl')
+    (tmp_path / 'blocked-ascii.stl').mkdir()
+    os.utime(tmp_path / 'blocked-ascii.stl', (0, 0))
+
+    failures = convert_batch([str(tmp_path / '*.stl')], workers=1)
+    assert failures == 2
+    assert (tmp_path / 'good-ascii.stl').read_text().startswith('solid')
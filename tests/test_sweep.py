@@ -0,0 +1,20 @@
+from shapely.geometry import Polygon
+
+import sweep
+
+
+def test_solid_tenting_variants_are_named_apart_from_hollow_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(sweep, '_worker', {
+        'keyboard_poly': Polygon([(0, 0), (100, 0), (100, 60), (0, 60)]),
+        'palm_poly': None,
+        'tenting': {},
+    })
+    hollow = sweep.build_tenting_variant(
+        {'slope_angle_deg': 6.5, 'z_min': 3.0, 'hollow_offset': 10.0}, str(tmp_path), True
+    )
+    solid = sweep.build_tenting_variant({'slope_angle_deg': 6.5, 'z_min': 3.0}, str(tmp_path), False)
+
+    assert hollow['file'] == 'tenting_system_slope_angle_deg-6.5_z_min-3_hollow_offset-10.stl'
+    assert solid['file'] == 'tenting_system_solid_slope_angle_deg-6.5_z_min-3.stl'
+    assert solid['volume'] > hollow['volume']
+    assert (tmp_path / hollow['file']).exists() and (tmp_path / solid['file']).exists()